@@ -1,5 +1,6 @@
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,11 +32,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'store.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'store.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'store.middleware.CartMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,11 +68,51 @@ WSGI_APPLICATION = 'ecommerce.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#SQLite by default; DATABASE_ENGINE=postgresql plus the POSTGRES_* variables for PostgreSQL
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'ecommerce'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Keep connections open between requests and check them before reuse
+            'CONN_MAX_AGE': int(os.environ.get('POSTGRES_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
+    POSTGRES_POOL_SIZE = int(os.environ.get('POSTGRES_POOL_SIZE', 0))  # Connections per process; 0 disables the pool
+    if POSTGRES_POOL_SIZE:
+        # psycopg's pool replaces persistent connections (needs psycopg[pool])
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': 1,
+            'max_size': POSTGRES_POOL_SIZE,
+            'timeout': 10,  # Seconds a request waits for a free connection
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            # Take the write lock at BEGIN so concurrent checkouts queue instead of deadlocking
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        }
+    }
+
+#SQLite tuning, applied to every new connection (store.signals); {} keeps SQLite's defaults
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # Readers no longer block the writer, nor the writer them
+    'synchronous': 'NORMAL',  # fsync at checkpoints only; safe with WAL, a power cut may lose the last commits
+    'busy_timeout': 5000,  # Milliseconds a writer waits for the lock before "database is locked"
+    'mmap_size': 256 * 1024 * 1024,  # Bytes of the file read through memory mapping
+    'cache_size': -20000,  # Page cache per connection, in KiB when negative
+    'temp_store': 'MEMORY',  # Sorts and temporary indexes stay off disk
 }
 
 
@@ -89,10 +133,86 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
+#catalog listing
+CATALOG_PAGE_SIZE = 24  # Products per page on the shop listing
+CATALOG_MAX_PAGE_SIZE = 96  # Upper bound for ?page_size=
+CATALOG_CACHE_TIMEOUT = 300  # Seconds a cached listing page lives; saves invalidate sooner
+CATALOG_VERSION_CACHE = 'catalog'  # CACHES alias holding listing versions; see #caches below
+PAGE_CACHE_TIMEOUT = 3600  # Seconds rendered homepage and product detail fragments are kept
+PRICE_BANDS = (10_000, 50_000, 100_000, 200_000)  # KES upper bounds of the price filter bands; run rebuild_facets after changing
+
+#product import
+IMPORT_BATCH_SIZE = 1000  # Rows upserted per transaction by import_products and the admin upload
+
+#order history
+ORDER_HISTORY_PAGE_SIZE = 20  # Orders per page on the profile
+ORDER_TRANSITION_CHUNK_SIZE = 1000  # Orders per transaction when admin actions or update_order_status change statuses
+
+#search
+SEARCH_RESULTS = 20  # Most results a search or typeahead request returns
+SEARCH_CANDIDATES = 1000  # Newest matches scored per query; bounds latency on very common words
+
+#product images
+IMAGE_WIDTHS = (320, 640, 1280)  # Derivative widths in px, WebP plus a JPEG/PNG fallback; never upscaled
+IMAGE_QUALITY = 80  # Encoder quality for derivatives
+
+#reports
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched per round trip when streaming CSV/NDJSON exports
+REPORT_PDF_CACHE_TIMEOUT = 86400  # Seconds a rendered report PDF is kept; a new order replaces it sooner
+
+#background jobs
+BACKGROUND_WORKERS = 2  # In-process worker threads; 0 runs jobs inline
+RECEIPT_STALE_AFTER = 600  # Seconds before a stuck receipt render is retried
+RECEIPT_MAX_ATTEMPTS = 4  # Render attempts before a receipt is marked Failed
+RECEIPT_RETRY_DELAY = 30  # Seconds before the first re-render; doubles after each failure
+
+#caches: 'default' lives in each process's own memory. The other aliases hold state every process must see
+#alike (login buckets, listing versions, cached carts), so they default to files in the temp directory, shared by the
+#processes of one host; set <ALIAS>_CACHE_BACKEND/LOCATION to Redis or Memcached when several hosts serve the site
+FILE_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+def _shared_cache(alias, max_entries):
+    backend = os.environ.get(f'{alias.upper()}_CACHE_BACKEND', FILE_CACHE)
+    return {
+        'BACKEND': backend,
+        'LOCATION': os.environ.get(
+            f'{alias.upper()}_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), f'smart_computers_{alias}')
+        ),
+        # Culling only applies to the file cache, which lists its directory on every write
+        'OPTIONS': {'MAX_ENTRIES': max_entries} if backend == FILE_CACHE else {},
+    }
+
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'throttle': _shared_cache('throttle', 10000),  # Culling resets buckets, so keep well above the addresses seen per burst window
+    'catalog': _shared_cache('catalog', 1000),  # One version per category plus a few scopes
+    'cart': _shared_cache('cart', 10000),  # One entry per live cart; only CacheCartStore writes here
+}
+
+#throttling: token buckets of (attempts per minute, burst) per client IP and per email address
+THROTTLE_CACHE = 'throttle'  # CACHES alias holding the buckets; see #caches above
+THROTTLE_RATES = {
+    'login': {'ip': (10, 20), 'email': (5, 10)},
+    'signup': {'ip': (5, 10), 'email': (2, 5)},
+}
+
+#metrics
+METRICS_ENABLED = True  # Per-view timings at /metrics/ and in Server-Timing; False removes the middleware
+
 #sessions
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_AGE = 1209600  # Sessions last for 2 weeks
 
+#cart storage for anonymous visitors: SessionCartStore, CacheCartStore or SignedCookieCartStore
+#(logged-in customers always keep their cart in CartLine rows)
+CART_STORAGE = 'store.services.cart.SignedCookieCartStore'
+CART_MAX_AGE = SESSION_COOKIE_AGE  # Seconds an untouched cart is kept
+#CacheCartStore needs a backend every process shares, or a visitor's cart depends on which worker answers;
+#the file default culls carts past its MAX_ENTRIES, so point CART_CACHE_BACKEND at Redis or Memcached for real traffic
+CART_CACHE = 'cart'  # CACHES alias holding CacheCartStore carts; see #caches above
+
 
 
 # Internationalization
@@ -115,6 +235,16 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'store','static'),]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')  
 
+#static files: collectstatic content-hashes and precompresses them; StaticFilesMiddleware serves them when DEBUG is off
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'store.services.static.CompressedManifestStaticFilesStorage',
+    },
+}
+STATIC_MAX_AGE = 60  # Seconds browsers keep static files without a content hash in their name
+
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -131,4 +261,11 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'anthonynyasente@gmail.com'  # Replace with your Gmail
 EMAIL_HOST_PASSWORD = '@Tony2002'     # Replace with your App Password
 DEFAULT_FROM_EMAIL = 'your-real-email@gmail.com'
-CONTACT_EMAIL = 'nyanumbaanthony@gmail.com'  # Company email to receive messages
\ No newline at end of file
+CONTACT_EMAIL = 'nyanumbaanthony@gmail.com'  # Company email to receive messages
+EMAIL_TIMEOUT = 30  # Seconds before a stalled SMTP connection is given up
+
+#email outbox
+EMAIL_OUTBOX_BATCH_SIZE = 50  # Emails sent per SMTP connection
+EMAIL_OUTBOX_MAX_ATTEMPTS = 6  # Attempts before an email is marked Failed
+EMAIL_OUTBOX_RETRY_DELAY = 30  # Seconds before the first retry; doubles after each failure
+EMAIL_OUTBOX_STALE_AFTER = 600  # Seconds before an email stuck in Sending is retried
\ No newline at end of file
@@ -1,15 +1,27 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
 from django.db import models  # Added for F() in restock_products
+from django.db.models import Q
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 from .models.product import Product
 from .models.order import Order
 from .models.category import Category
 from .models.customer import Customer
+from .services import catalog, facets, imports, orders, search
+
+class ProductImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV with a header row, or JSONL (one JSON object per line). Products are matched on sku.")
+    create_categories = forms.BooleanField(required=False, help_text="Create categories the file names that do not exist yet")
 
 # Register Product model
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'category', 'brand', 'quantity')
-    search_fields = ('name', 'brand')
+    list_display = ('name', 'sku', 'price', 'category', 'brand', 'quantity')
+    search_fields = ('name', 'brand', 'sku')
     list_filter = ('category',)
     list_editable = ('price', 'quantity')
     ordering = ('name',)
@@ -17,10 +29,57 @@ class ProductAdmin(admin.ModelAdmin):
 
     def restock_products(self, request, queryset):
         """Increase stock quantity by 10 for selected products."""
-        updated = queryset.update(quantity=models.F('quantity') + 10)
+        # updated_at versions the cached product pages; update() leaves auto_now alone
+        updated = queryset.update(quantity=models.F('quantity') + 10, updated_at=timezone.now())
+        # update() also skips the save signals that refresh facet counts
+        category_ids = set(queryset.values_list('category_id', flat=True))
+        facets.rebuild(category_ids)
+        catalog.invalidate_products(*category_ids)
         self.message_user(request, f"{updated} product(s) restocked with 10 additional units.")
     restock_products.short_description = "Restock selected products (+10 units)"
 
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_products), name='store_product_import'),
+        ] + super().get_urls()
+
+    def import_products(self, request):
+        """Upload a CSV or JSONL file and upsert its products, like the import_products command."""
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+        form = ProductImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                # Large uploads are already spooled to a temporary file; it is read in batches from there
+                stats = imports.import_file(
+                    upload.file, imports.detect_format(upload.name), form.cleaned_data['create_categories']
+                )
+            except imports.ImportFormatError as e:
+                form.add_error('file', str(e))
+            else:
+                self.message_user(request, f"Imported {stats}")
+                for error in stats.errors[:10]:
+                    self.message_user(request, error, messages.WARNING)
+                return redirect('admin:store_product_changelist')
+        return TemplateResponse(request, 'admin/store/product/import_products.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': "Import products",
+        })
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Answer admin searches from the full-text index instead of LIKE scans where it exists.
+
+        The index has no SKUs, so a term that is the start of a SKU matches as well.
+        """
+        if not search.terms(search_term):
+            return super().get_search_results(request, queryset, search_term)
+        term = search_term.strip()
+        return queryset.filter(Q(sku__istartswith=term) | search.matches(search_term)), False
+
 # Register Category model
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -38,20 +97,43 @@ class OrderAdmin(admin.ModelAdmin):
     actions = ['mark_as_shipped', 'mark_as_delivered', 'mark_as_cancelled']
     ordering = ('-date_ordered',)
 
+    def transition(self, request, queryset, status):
+        """Apply a status change through the order state machine, which restocks cancelled orders."""
+        result = orders.transition(queryset, status)
+        message = f"{result['changed']} order(s) marked as {status}."
+        if result['restocked']:
+            message += f" {result['restocked']} unit(s) returned to stock."
+        self.message_user(request, message)
+        if result['skipped']:
+            self.message_user(
+                request,
+                f"{result['skipped']} order(s) skipped: only {' or '.join(orders.sources(status))} orders can become {status}.",
+                messages.WARNING
+            )
+
     def mark_as_shipped(self, request, queryset):
-        queryset.update(status='Shipped')
-        self.message_user(request, "Selected orders marked as Shipped.")
+        self.transition(request, queryset, Order.SHIPPED)
     mark_as_shipped.short_description = "Mark selected orders as Shipped"
 
     def mark_as_delivered(self, request, queryset):
-        queryset.update(status='Delivered')
-        self.message_user(request, "Selected orders marked as Delivered.")
+        self.transition(request, queryset, Order.DELIVERED)
     mark_as_delivered.short_description = "Mark selected orders as Delivered"
 
     def mark_as_cancelled(self, request, queryset):
-        queryset.update(status='Cancelled')
-        self.message_user(request, "Selected orders marked as Cancelled.")
-    mark_as_cancelled.short_description = "Mark selected orders as Cancelled"
+        self.transition(request, queryset, Order.CANCELLED)
+    mark_as_cancelled.short_description = "Mark selected orders as Cancelled and return their units to stock"
+
+    def save_model(self, request, obj, form, change):
+        """Status edits, on the form or the list, go through the state machine too."""
+        status = obj.status
+        if change and 'status' in form.changed_data:
+            obj.status = form.initial['status']
+        super().save_model(request, obj, form, change)
+        if status != obj.status:
+            if orders.transition(Order.objects.filter(pk=obj.pk), status)['changed']:
+                obj.status = status
+            else:
+                self.message_user(request, f"Order {obj.pk} cannot change from {obj.status} to {status}.", messages.ERROR)
 
 # Register Customer model
 @admin.register(Customer)
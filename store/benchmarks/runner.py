@@ -0,0 +1,424 @@
+import asyncio
+import http.client
+import math
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import Client
+from store.benchmarks.scenarios import SCENARIOS, Context, login
+from store.services import throttle
+
+# Written by MetricsMiddleware; both transports read query counts from it
+QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+
+
+def _query_count(server_timing):
+    match = QUERY_COUNT.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+class ClientSession:
+    """Drives the views in process through django.test.Client, without sockets."""
+
+    def __init__(self, transport):
+        self.client = Client()
+
+    def request(self, method, path, data=None, address=None):
+        extra = {'REMOTE_ADDR': address} if address else {}
+        response = getattr(self.client, method)(path, data or {}, **extra)
+        return response.status_code, _query_count(response.get('Server-Timing'))
+
+
+class ClientTransport:
+    name = 'client'
+    is_async = False
+
+    def session(self):
+        return ClientSession(self)
+
+    def close(self):
+        pass
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class _BrowserSession:
+    """Cookies and the CSRF header a browser would send; the full handler stack checks both."""
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.cookies = SimpleCookie()
+
+    def headers(self, method, address=None):
+        headers = {'Host': 'testserver'}
+        if address:
+            headers['X-Benchmark-Client'] = address
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f"{key}={morsel.value}" for key, morsel in self.cookies.items())
+        if method == 'post':
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            if 'csrftoken' in self.cookies:
+                headers['X-CSRFToken'] = self.cookies['csrftoken'].value
+        return headers
+
+    def store_cookies(self, set_cookie_headers):
+        for header in set_cookie_headers:
+            self.cookies.load(header)
+
+
+class ServerSession(_BrowserSession):
+    """Drives the views over HTTP with its own cookies and CSRF token, like a browser."""
+
+    def __init__(self, transport):
+        super().__init__(transport)
+        # Any page with a form sets the CSRF cookie that POSTs must echo back
+        self.request('get', '/login/')
+
+    def request(self, method, path, data=None, address=None):
+        body = urlencode(data or {}) if method == 'post' else None
+        connection = http.client.HTTPConnection(*self.transport.address)
+        try:
+            connection.request(method.upper(), path, body=body, headers=self.headers(method, address))
+            response = connection.getresponse()
+            response.read()
+            self.store_cookies(response.headers.get_all('Set-Cookie') or [])
+            return response.status, _query_count(response.getheader('Server-Timing'))
+        finally:
+            connection.close()
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def _client_address(application):
+    """
+    Take REMOTE_ADDR from the session's X-Benchmark-Client header, the way a
+    proxy in front of the site would pass on the real client address; every
+    benchmark connection comes from 127.0.0.1 otherwise.
+    """
+
+    def wrapped(environ, start_response):
+        address = environ.pop('HTTP_X_BENCHMARK_CLIENT', None)
+        if address:
+            environ['REMOTE_ADDR'] = address
+        return application(environ, start_response)
+
+    return wrapped
+
+
+class ServerTransport:
+    """
+    Serves the project from a wsgiref server on a free local port, in a
+    background thread, with a thread per connection like a threaded WSGI server.
+    """
+
+    name = 'wsgi'
+    is_async = False
+
+    def __init__(self):
+        self.server = make_server(
+            '127.0.0.1', 0, _client_address(WSGIHandler()), server_class=_ThreadingWSGIServer, handler_class=_QuietHandler
+        )
+        self.address = self.server.server_address
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def session(self):
+        return ServerSession(self)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class AsgiSession(_BrowserSession):
+    """
+    Drives the project's ASGI application with raw ASGI messages, as an ASGI
+    server would, so each request gets the handler's own thread-sensitive
+    context and sync views pay their real thread hops.
+    """
+
+    async def arequest(self, method, path, data=None, address=None):
+        if method == 'post' and 'csrftoken' not in self.cookies:
+            # Any page with a form sets the CSRF cookie that POSTs must echo back
+            await self.arequest('get', '/login/')
+        path, _, query = path.partition('?')
+        body = urlencode(data or {}).encode() if method == 'post' else b''
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method.upper(),
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'headers': [(key.lower().encode(), value.encode()) for key, value in self.headers(method).items()],
+            'client': (address or '127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+        incoming = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        started = {}
+
+        async def receive():
+            if incoming:
+                return incoming.pop()
+            # The client never disconnects; the handler cancels this wait once it has answered
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                started.update(message)
+
+        await self.transport.application(scope, receive, send)
+        headers = [(key.decode().lower(), value.decode()) for key, value in started.get('headers', [])]
+        self.store_cookies(value for key, value in headers if key == 'set-cookie')
+        server_timing = next((value for key, value in headers if key == 'server-timing'), None)
+        return started.get('status', 500), _query_count(server_timing)
+
+
+class AsgiTransport:
+    """Calls an in-process ASGIHandler directly; no ASGI server package is needed."""
+
+    name = 'asgi'
+    is_async = True
+
+    def __init__(self):
+        self.application = ASGIHandler()
+
+    def session(self):
+        return AsgiSession(self)
+
+    def close(self):
+        pass
+
+
+TRANSPORTS = {'client': ClientTransport, 'wsgi': ServerTransport, 'asgi': AsgiTransport}
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(latencies, queries, statuses, wall=None):
+    """Latency percentiles and query counts; ``rps`` is requests per second of ``wall`` time."""
+    ordered = sorted(latencies)
+    counted = [q for q in queries if q is not None]
+    wall = wall if wall is not None else sum(ordered)
+    return {
+        'requests': len(latencies),
+        'errors': sum(1 for status in statuses if status >= 400),
+        'throttled': sum(1 for status in statuses if status == 429),
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'rps': round(len(ordered) / wall, 2) if wall else None,
+        'queries_mean': round(statistics.fmean(counted), 2) if counted else None,
+        'queries_max': max(counted) if counted else None,
+    }
+
+
+def _shares(iterations, concurrency):
+    """Split ``iterations`` over at most ``concurrency`` workers as evenly as possible."""
+    workers = max(1, min(concurrency, iterations))
+    return [iterations // workers + (i < iterations % workers) for i in range(workers)]
+
+
+def _check_login(status, worker):
+    # A refused login would leave the worker measuring an anonymous visitor
+    if not 300 <= status < 400:
+        raise RuntimeError(f"benchmark login for worker {worker} was refused with status {status}")
+
+
+def _run_worker(scenario, transport, context, iterations, warmup, worker=0):
+    session = transport.session()
+    if scenario.login:
+        _check_login(session.request(*login(context, worker))[0], worker)
+    samples = []
+    for i in range(warmup + iterations):
+        if scenario.prepare:
+            session.request(*scenario.prepare(context))
+        request = scenario.request(context)
+        start = time.perf_counter()
+        status, query_count = session.request(*request)
+        if i >= warmup:
+            samples.append((start, time.perf_counter(), status, query_count))
+    return samples
+
+
+async def _arun_worker(scenario, transport, context, iterations, warmup, worker=0):
+    session = transport.session()
+    if scenario.login:
+        _check_login((await session.arequest(*login(context, worker)))[0], worker)
+    samples = []
+    for i in range(warmup + iterations):
+        if scenario.prepare:
+            await session.arequest(*scenario.prepare(context))
+        request = scenario.request(context)
+        start = time.perf_counter()
+        status, query_count = await session.arequest(*request)
+        if i >= warmup:
+            samples.append((start, time.perf_counter(), status, query_count))
+    return samples
+
+
+def _run_background(scenario, transport, context, stop, worker):
+    """Send ``scenario`` requests back to back until ``stop`` is set, at least one; nothing is warmed up."""
+    session = transport.session()
+    if scenario.login:
+        _check_login(session.request(*login(context, worker))[0], worker)
+    samples = []
+    while not samples or not stop.is_set():
+        request = scenario.request(context)
+        start = time.perf_counter()
+        status, query_count = session.request(*request)
+        samples.append((start, time.perf_counter(), status, query_count))
+    return samples
+
+
+async def _arun_background(scenario, transport, context, stop, worker):
+    session = transport.session()
+    if scenario.login:
+        _check_login((await session.arequest(*login(context, worker)))[0], worker)
+    samples = []
+    while not samples or not stop.is_set():
+        request = scenario.request(context)
+        start = time.perf_counter()
+        status, query_count = await session.arequest(*request)
+        samples.append((start, time.perf_counter(), status, query_count))
+    return samples
+
+
+async def _gather(scenario, transport, context, shares, warmup, alongside=None):
+    stop = asyncio.Event()
+    background = alongside and asyncio.create_task(
+        _arun_background(alongside, transport, context, stop, len(shares))
+    )
+    try:
+        batches = await asyncio.gather(*(
+            _arun_worker(scenario, transport, context, share, warmup, worker) for worker, share in enumerate(shares)
+        ))
+    finally:
+        stop.set()
+    return batches, (await background) if background else None
+
+
+def _summarize_samples(samples):
+    wall = max(end for _, end, _, _ in samples) - min(start for start, _, _, _ in samples)
+    return summarize(
+        [end - start for start, end, _, _ in samples],
+        [query_count for _, _, _, query_count in samples],
+        [status for _, _, status, _ in samples],
+        wall,
+    )
+
+
+def run_scenario(scenario, transport, context, iterations=50, warmup=5, concurrency=1, alongside=None):
+    """
+    Replay one scenario and summarise the timed requests.
+
+    The iterations are shared among ``concurrency`` workers, each with its
+    own session and warmup: threads for the sync transports, tasks on one
+    event loop for asgi. With an ``alongside`` scenario one more client
+    replays it nonstop while they run, and ``(summary, its summary)`` is
+    returned instead.
+
+    A scenario that logs in first clears the throttle cache, since every
+    such scenario signs in the same accounts from the same addresses; a
+    login that is still refused (anything but a redirect) raises
+    RuntimeError rather than measuring an anonymous visitor.
+    """
+    if scenario.login:
+        throttle.cache().clear()
+    shares = _shares(iterations, concurrency)
+    background = None
+    if transport.is_async:
+        batches, background = asyncio.run(_gather(scenario, transport, context, shares, warmup, alongside))
+    elif len(shares) == 1 and not alongside:
+        batches = [_run_worker(scenario, transport, context, shares[0], warmup)]
+    else:
+        stop = threading.Event()
+        with ThreadPoolExecutor(len(shares) + 1) as pool:
+            flood = alongside and pool.submit(_run_background, alongside, transport, context, stop, len(shares))
+            try:
+                batches = list(pool.map(
+                    lambda worker: _run_worker(scenario, transport, context, shares[worker], warmup, worker),
+                    range(len(shares))
+                ))
+            finally:
+                stop.set()
+            background = flood.result() if flood else None
+    summary = _summarize_samples([sample for batch in batches for sample in batch])
+    if alongside:
+        return summary, _summarize_samples(background)
+    return summary
+
+
+def run(scenarios=None, transports=('client',), iterations=50, warmup=5, rng_seed=0, concurrency=1, alongside=None):
+    """
+    Run the named scenarios (all by default) over each transport.
+
+    Returns ``{transport: {scenario: summary}}``. With ``concurrency`` 1
+    requests run one at a time, so ``rps`` is single-client throughput;
+    otherwise it is the throughput of that many clients together. When an
+    ``alongside`` scenario is named it runs in the background of each of the
+    others, and its traffic during ``name`` is reported as ``name:alongside``.
+    """
+    background = SCENARIOS[alongside] if alongside else None
+    results = {}
+    for transport_name in transports:
+        transport = TRANSPORTS[transport_name]()
+        try:
+            context = Context(rng_seed)
+            rows = results[transport_name] = {}
+            for name in (scenarios or SCENARIOS):
+                if name == alongside:
+                    continue
+                summary = run_scenario(SCENARIOS[name], transport, context, iterations, warmup, concurrency, background)
+                if background:
+                    rows[name], rows[f"{name}:{alongside}"] = summary
+                else:
+                    rows[name] = summary
+        finally:
+            transport.close()
+    return results
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    List regressions of ``results`` against a baseline of the same shape.
+
+    A scenario regresses when its p95 latency grows by more than ``tolerance``
+    (a fraction) or when it issues more queries on average than before.
+    """
+    regressions = []
+    for transport, scenarios in results.items():
+        for name, current in scenarios.items():
+            previous = baseline.get(transport, {}).get(name)
+            if not previous:
+                continue
+            if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                regressions.append(
+                    f"{transport}/{name}: p95 {current['p95_ms']}ms vs baseline {previous['p95_ms']}ms"
+                )
+            if (current['queries_mean'] or 0) > (previous['queries_mean'] or 0):
+                regressions.append(
+                    f"{transport}/{name}: {current['queries_mean']} queries vs baseline {previous['queries_mean']}"
+                )
+    return regressions
@@ -0,0 +1,113 @@
+"""
+Benchmark scenarios: one user flow each, replayed against a seeded database.
+
+A scenario gets a fresh session per worker, logged in first when ``login``
+is set. ``prepare`` builds an untimed request sent before every timed one
+(for example to fill the cart a checkout will empty), and ``request`` builds
+the timed request. Both return ``(method, path, data)`` so the sync and the
+async transports can send them alike, optionally followed by the client IP
+address the request should appear to come from.
+
+The ``async_`` scenarios hit the async variants of the storefront views; run
+them next to their sync twins on the asgi transport to compare the two.
+
+``login`` signs in real customers from many addresses, and ``login_flood``
+guesses passwords from one; run the first with ``--alongside login_flood``
+to see whether the throttle keeps honest logins fast during an attack.
+"""
+import random
+from urllib.parse import urlencode
+
+from django.urls import reverse
+from store.models.category import Category
+from store.models.customer import Customer
+from store.models.product import Product
+from store.benchmarks.seed import PASSWORD
+
+
+class Scenario:
+    def __init__(self, name, request, login=False, prepare=None):
+        self.name = name
+        self.request = request
+        self.login = login
+        self.prepare = prepare
+
+
+class Context:
+    """Ids the scenarios pick from, loaded once per run."""
+
+    def __init__(self, rng_seed=0):
+        self.rng = random.Random(rng_seed)
+        self.product_ids = list(Product.objects.values_list('id', flat=True))
+        self.category_ids = list(Category.objects.values_list('id', flat=True))
+        # Concurrent workers log in as different customers so their carts stay apart
+        self.emails = list(Customer.objects.order_by('id').values_list('email', flat=True)[:64])
+        self.all_emails = list(Customer.objects.values_list('email', flat=True))
+
+    def product(self):
+        return self.rng.choice(self.product_ids)
+
+    def category(self):
+        return self.rng.choice(self.category_ids)
+
+    def search_prefix(self):
+        # Seeded products are named "Product <n>"; type the first digits of one
+        return f"product {str(self.product())[:self.rng.randint(1, 3)]}"
+
+    def address(self):
+        return f"10.{self.rng.randint(0, 254)}.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}"
+
+
+# Where the password guessing comes from; worker addresses never collide with it
+FLOOD_ADDRESS = '10.255.255.254'
+
+
+def worker_address(worker):
+    return f"10.255.{worker // 250}.{worker % 250 + 1}"
+
+
+def login(context, worker=0):
+    return (
+        'post', reverse('login'),
+        {'email': context.emails[worker % len(context.emails)], 'password': PASSWORD},
+        worker_address(worker),
+    )
+
+
+def _customer_login(context):
+    return ('post', reverse('login'), {'email': context.rng.choice(context.all_emails), 'password': PASSWORD}, context.address())
+
+
+def _password_guess(context):
+    email = f"victim{context.rng.randint(1, 10 ** 6)}@example.com"
+    return ('post', reverse('login'), {'email': email, 'password': 'guess'}, FLOOD_ADDRESS)
+
+
+def _fill_cart(context):
+    return ('post', reverse('add_to_cart'), {'product': context.product(), 'quantity': 2})
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario('index', lambda ctx: ('get', f"{reverse('index')}?category={ctx.category()}", None)),
+        Scenario('product_display', lambda ctx: ('get', reverse('product_display', args=[ctx.product()]), None)),
+        Scenario('search', lambda ctx: ('get', f"{reverse('search')}?{urlencode({'q': ctx.search_prefix(), 'format': 'json'})}", None)),
+        Scenario('add_to_cart', lambda ctx: ('post', reverse('add_to_cart'), {'product': ctx.product()})),
+        Scenario('cart', lambda ctx: ('get', reverse('cart'), None), login=True),
+        Scenario(
+            'checkout',
+            lambda ctx: ('post', reverse('checkout'), {'destination': 'Nairobi', 'mpesa_number': '0712345678'}),
+            login=True,
+            prepare=_fill_cart,
+        ),
+        Scenario('sales_report', lambda ctx: ('get', reverse('sales_report'), None)),
+        Scenario('profile', lambda ctx: ('get', reverse('profile'), None), login=True),
+        Scenario('async_index', lambda ctx: ('get', f"{reverse('async_index')}?category={ctx.category()}", None)),
+        Scenario('async_product_display', lambda ctx: ('get', reverse('async_product_display', args=[ctx.product()]), None)),
+        Scenario('async_add_to_cart', lambda ctx: ('post', reverse('async_add_to_cart'), {'product': ctx.product()})),
+        Scenario('async_cart', lambda ctx: ('get', reverse('async_cart'), None), login=True),
+        Scenario('login', _customer_login),
+        Scenario('login_flood', _password_guess),
+    ]
+}
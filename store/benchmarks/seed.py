@@ -0,0 +1,101 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from store.models.category import Category
+from store.models.customer import Customer
+from store.models.order import Order
+from store.models.product import Product
+from store.models.report import ReportOrder, ReportProduct, OrderItem
+from store.services import facets, sales
+
+PASSWORD = 'bench-password'
+BATCH_SIZE = 500
+
+
+@transaction.atomic
+def seed(categories=20, products=2000, customers=100, orders=1000, days=90, rng_seed=0):
+    """
+    Fill an empty database with a synthetic catalog and order history.
+
+    Everything is written with bulk_create, then the sales rollups are rebuilt
+    once. The same ``rng_seed`` always yields the same data, so runs compare.
+    Every customer's password is ``PASSWORD``.
+    """
+    rng = random.Random(rng_seed)
+    now = timezone.now()
+
+    category_rows = Category.objects.bulk_create([Category(name=f"Category {i}") for i in range(categories)])
+    product_rows = Product.objects.bulk_create([
+        Product(
+            name=f"Product {i}",
+            brand=f"Brand {i % 40}",
+            price=rng.randrange(500, 250000, 50),
+            category=rng.choice(category_rows),
+            description=f"Synthetic product {i}",
+            image='uploads/products/benchmark.jpg',
+            # Enough stock that checkout scenarios never run dry
+            quantity=rng.randrange(10_000, 20_000),
+        )
+        for i in range(products)
+    ], batch_size=BATCH_SIZE)
+
+    password = make_password(PASSWORD)
+    customer_rows = Customer.objects.bulk_create([
+        Customer(
+            first_name='Bench', last_name=f"Customer {i}", phone='0712345678',
+            email=f"bench{i}@example.com", password=password
+        )
+        for i in range(customers)
+    ], batch_size=BATCH_SIZE)
+
+    report_products = {
+        product.id: ReportProduct(name=product.name, price=product.price, stock=product.quantity)
+        for product in product_rows
+    }
+    ReportProduct.objects.bulk_create(list(report_products.values()), batch_size=BATCH_SIZE)
+
+    baskets = [
+        [(rng.choice(product_rows), rng.randint(1, 3)) for _ in range(rng.randint(1, 4))]
+        for _ in range(orders)
+    ]
+    report_orders = ReportOrder.objects.bulk_create([
+        ReportOrder(
+            is_completed=True,
+            total=Decimal(sum(product.price * qty for product, qty in basket)).quantize(Decimal('0.01'))
+        )
+        for basket in baskets
+    ], batch_size=BATCH_SIZE)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=report_products[product.id], quantity=qty, price=product.price)
+        for order, basket in zip(report_orders, baskets)
+        for product, qty in basket
+    ], batch_size=BATCH_SIZE)
+    Order.objects.bulk_create([
+        Order(
+            customer=rng.choice(customer_rows), product=product, quantity=qty,
+            price=product.price * qty, address='Nairobi', phone='0712345678',
+            status=rng.choice(['Pending', 'Shipped', 'Delivered', 'Cancelled'])
+        )
+        for basket in baskets
+        for product, qty in basket
+    ], batch_size=BATCH_SIZE)
+
+    # auto_now_add stamps every row with now; spread the history over ``days``
+    by_day = {}
+    for order in report_orders:
+        by_day.setdefault(rng.randrange(days), []).append(order.id)
+    for day, ids in by_day.items():
+        ReportOrder.objects.filter(id__in=ids).update(created_at=now - timedelta(days=day))
+    sales.rebuild()
+    facets.rebuild()
+
+    return {
+        'categories': len(category_rows),
+        'products': len(product_rows),
+        'customers': len(customer_rows),
+        'orders': len(report_orders),
+    }
@@ -0,0 +1,121 @@
+import json
+import os
+import platform
+import tempfile
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from store.benchmarks import runner
+from store.benchmarks.scenarios import SCENARIOS
+from store.benchmarks.seed import seed
+from store.services import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with a synthetic catalog and time the browse, cart, "
+        "checkout, report, profile and login flows, sync and async views alike. Results are printed and can be saved as JSON "
+        "and compared against a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help="Scenario to run; repeat for several (default: all)")
+        parser.add_argument('--transport', action='append', choices=sorted(runner.TRANSPORTS), help="client (in process), wsgi (local HTTP server) or asgi (in-process ASGI handler); default: all")
+        parser.add_argument('--iterations', type=int, default=50, help="Timed requests per scenario")
+        parser.add_argument('--warmup', type=int, default=5, help="Untimed requests per client before timing starts")
+        parser.add_argument('--concurrency', type=int, default=1, help="Clients sending requests at the same time")
+        parser.add_argument(
+            '--alongside', choices=sorted(SCENARIOS),
+            help="Scenario one extra client replays nonstop while each measured scenario runs, e.g. login_flood"
+        )
+        parser.add_argument('--products', type=int, default=2000, help="Synthetic products to seed")
+        parser.add_argument('--customers', type=int, default=100, help="Synthetic customers to seed")
+        parser.add_argument('--orders', type=int, default=1000, help="Historical orders to seed")
+        parser.add_argument(
+            '--sqlite-mode', choices=['tuned', 'stock'], default='tuned',
+            help="tuned applies SQLITE_PRAGMAS (WAL, synchronous=NORMAL, ...); stock leaves SQLite's defaults"
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the data and the request mix")
+        parser.add_argument('--output', help="Write the results to this JSON file")
+        parser.add_argument('--baseline', help="Compare against a JSON file written by --output; exit non-zero on regressions")
+        parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed p95 slowdown against the baseline, as a fraction")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        with tempfile.TemporaryDirectory() as scratch:
+            # Never touch the real database: seed and measure a test copy, then drop it.
+            # A file keeps SQLite honest; the shared in-memory default locks whole tables.
+            if connection.vendor == 'sqlite':
+                connection.settings_dict['TEST']['NAME'] = os.path.join(scratch, 'benchmark.sqlite3')
+            setup_test_environment(debug=False)
+            # Applied before the test database exists, so its first connection is already tuned (or not)
+            pragmas = settings.SQLITE_PRAGMAS if options['sqlite_mode'] == 'tuned' else {}
+            # Every transport runs in this process, so login buckets, listing versions and carts can stay out of the live shared caches;
+            # the runner clears the buckets before each logged-in scenario
+            with override_settings(
+                METRICS_ENABLED=True, MEDIA_ROOT=scratch, SQLITE_PRAGMAS=pragmas,
+                THROTTLE_CACHE='default', CATALOG_VERSION_CACHE='default', CART_CACHE='default',
+            ):
+                old_name = connection.settings_dict['NAME']
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                try:
+                    cache.clear()
+                    seeded = seed(
+                        products=options['products'], customers=options['customers'],
+                        orders=options['orders'], rng_seed=options['seed']
+                    )
+                    self.stdout.write(f"Seeded {seeded}")
+                    results = runner.run(
+                        options['scenario'], options['transport'] or sorted(runner.TRANSPORTS),
+                        options['iterations'], options['warmup'], options['seed'], options['concurrency'], options['alongside']
+                    )
+                    # Let queued receipt renders finish before their database goes away
+                    jobs.shutdown()
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+                    teardown_test_environment()
+
+        self.print_results(results)
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'sqlite_mode': options['sqlite_mode'] if connection.vendor == 'sqlite' else None,
+                'seeded': seeded,
+                'iterations': options['iterations'],
+                'concurrency': options['concurrency'],
+                'alongside': options['alongside'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if baseline is not None:
+            regressions = runner.compare(results, baseline['results'], options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against baseline:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
+
+    def print_results(self, results):
+        header = f"{'transport':<9} {'scenario':<34} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>8} {'queries':>8} {'errors':>6} {'429s':>6}"
+        self.stdout.write(header)
+        for transport, scenarios in results.items():
+            for name, row in scenarios.items():
+                self.stdout.write(
+                    f"{transport:<9} {name:<34} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+                    f"{row['rps'] or 0:>8.1f} {row['queries_mean'] or 0:>8.1f} {row['errors']:>6} {row['throttled']:>6}"
+                )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from store.models.product import Product
+from store.services import images
+
+
+class Command(BaseCommand):
+    help = "Generate missing thumbnail and WebP derivatives for every product image."
+
+    def handle(self, *args, **options):
+        names = Product.objects.exclude(image='').values_list('image', flat=True).distinct()
+        generated = missing = 0
+        for name in names.iterator():
+            if images.generate(name) is None:
+                missing += 1
+            else:
+                generated += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked derivatives for {generated} image(s); {missing} source(s) missing or unreadable"
+        ))
@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from store.services import imports
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products from a CSV or JSONL file, matched on sku. Columns: sku, name, brand, price, "
+        "category (by name), description, quantity, image; only sku is required for existing products. "
+        "The file is streamed in batches and never held in memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - for standard input")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="File format (default: from the file extension, else csv)")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows per transaction (default: IMPORT_BATCH_SIZE)")
+        parser.add_argument('--create-categories', action='store_true', help="Create categories the file names but the shop does not have")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or imports.detect_format(options['path'])
+        try:
+            binary = sys.stdin.buffer if options['path'] == '-' else open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(f"Cannot open {options['path']}: {e}")
+
+        def progress(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {stats.rows} rows, {stats.rows_per_second:,.0f} rows/s")
+
+        with binary:
+            try:
+                stats = imports.import_file(
+                    binary, fmt, options['create_categories'], options['batch_size'], progress
+                )
+            except imports.ImportFormatError as e:
+                raise CommandError(str(e))
+
+        for error in stats.errors:
+            self.stderr.write(error)
+        if stats.failed > len(stats.errors):
+            self.stderr.write(f"... and {stats.failed - len(stats.errors)} more rejected row(s)")
+        if stats.categories_created:
+            self.stdout.write(f"Created {stats.categories_created} category(ies)")
+        self.stdout.write(self.style.SUCCESS(f"Imported {stats}"))
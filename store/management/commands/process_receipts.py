@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from store.services import receipts
+
+
+class Command(BaseCommand):
+    help = "Render queued checkout receipts. Use --loop to run as a standalone worker process."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep polling the queue instead of exiting when it is empty")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep between polls of an empty queue")
+        parser.add_argument('--limit', type=int, default=100, help="Maximum receipts to render per poll")
+
+    def handle(self, *args, **options):
+        while True:
+            rendered = receipts.process_pending(options['limit'])
+            if rendered:
+                self.stdout.write(f"Rendered {rendered} receipt(s)")
+            if not options['loop']:
+                break
+            if not rendered:
+                time.sleep(options['interval'])
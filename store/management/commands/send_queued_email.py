@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from store.services import outbox
+
+
+class Command(BaseCommand):
+    help = "Send due emails from the outbox, retrying failures with backoff. Use --loop to run as a standalone worker process."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox instead of exiting when nothing is due")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep between polls of an empty outbox")
+        parser.add_argument('--limit', type=int, default=None, help="Maximum emails per batch (default: EMAIL_OUTBOX_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        while True:
+            sent = outbox.send_pending(options['limit'])
+            if sent:
+                self.stdout.write(f"Sent {sent} email(s)")
+            if not options['loop']:
+                break
+            if not sent:
+                time.sleep(options['interval'])
@@ -0,0 +1,41 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from store.models.order import Order
+from store.services import orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the selected orders to a new status through the order state machine, in chunks. "
+        "Cancelling returns the orders' units to stock."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('status', choices=list(orders.TRANSITIONS), help="Status to move the orders to")
+        parser.add_argument('--id', type=int, action='append', dest='ids', help="Order id; repeat for several")
+        parser.add_argument('--from', action='append', dest='from_statuses', choices=list(orders.TRANSITIONS), help="Only orders in this status; repeat for several")
+        parser.add_argument('--customer', type=int, help="Only this customer's orders")
+        parser.add_argument('--placed-before', type=datetime.date.fromisoformat, help="Only orders placed before this date (YYYY-MM-DD)")
+        parser.add_argument('--chunk-size', type=int, default=None, help="Orders per transaction (default: ORDER_TRANSITION_CHUNK_SIZE)")
+
+    def handle(self, *args, **options):
+        if not any(options[name] for name in ('ids', 'from_statuses', 'customer', 'placed_before')):
+            raise CommandError("Select orders with --id, --from, --customer or --placed-before")
+        selected = Order.objects.all()
+        if options['ids']:
+            selected = selected.filter(id__in=options['ids'])
+        if options['from_statuses']:
+            selected = selected.filter(status__in=options['from_statuses'])
+        if options['customer']:
+            selected = selected.filter(customer_id=options['customer'])
+        if options['placed_before']:
+            midnight = datetime.datetime.combine(options['placed_before'], datetime.time.min)
+            selected = selected.filter(date_ordered__lt=timezone.make_aware(midnight))
+
+        result = orders.transition(selected, options['status'], options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['changed']} order(s) marked as {options['status']}, {result['skipped']} skipped, "
+            f"{result['restocked']} unit(s) returned to stock"
+        ))
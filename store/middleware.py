@@ -0,0 +1,137 @@
+import time
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from store.services import metrics, static
+from store.services.cart import CartService
+
+
+def _hook(timer):
+    connection.execute_wrappers.append(timer)
+
+
+def _unhook(timer):
+    connection.execute_wrappers.remove(timer)
+
+
+class MetricsMiddleware:
+    """
+    Records wall time, query count and DB time per URL name, and reports them
+    in a Server-Timing header.
+
+    Put it first in MIDDLEWARE so the session and auth queries are counted too.
+    With METRICS_ENABLED off Django drops it from the stack at startup, so it
+    costs nothing. Rows a StreamingHttpResponse fetches after the view returns
+    are not counted. Works under WSGI and ASGI without adapting the stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = metrics.QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        return self.record(request, response, timer, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        timer = metrics.QueryTimer()
+        start = time.perf_counter()
+        # Connections are per thread and the async ORM runs this request's
+        # queries on one worker thread, so the hook goes on that thread's connection
+        await sync_to_async(_hook)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_unhook)(timer)
+        return self.record(request, response, timer, time.perf_counter() - start)
+
+    def record(self, request, response, timer, duration):
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else 'unmatched'
+        metrics.observe(view, duration, timer.count, timer.duration)
+        response['Server-Timing'] = (
+            f'app;dur={duration * 1000:.1f}, db;dur={timer.duration * 1000:.1f};desc="{timer.count} queries"'
+        )
+        return response
+
+
+class CartMiddleware:
+    """Writes the request's cart to its storage backend once, if a view changed it."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        cart = getattr(request, '_cart', None)
+        if isinstance(cart, CartService):
+            cart.save(response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        cart = getattr(request, '_cart', None)
+        if isinstance(cart, CartService):
+            await cart.asave(response)
+        return response
+
+
+class StaticFilesMiddleware:
+    """
+    Serves collected files from STATIC_ROOT before the rest of the stack
+    runs, so a deployment needs no separate web server for them.
+
+    Off under DEBUG, where django.contrib.staticfiles serves the source
+    files instead. Put it right after SecurityMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.DEBUG or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = urlsplit(settings.STATIC_URL).path
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def asset(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return None
+        return static.find(request.path_info[len(self.prefix):])
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        asset = self.asset(request)
+        if asset is not None:
+            return static.serve(request, asset)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        asset = self.asset(request)
+        if asset is not None:
+            return static.serve(request, asset)
+        return await self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_reportproduct_reportorder_orderitem'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportproduct',
+            name='name',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_reportproduct_unique_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Receipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Rendering', 'Rendering'), ('Ready', 'Ready'), ('Failed', 'Failed')], default='Pending', help_text='Rendering state of the receipt', max_length=20)),
+                ('payload', models.JSONField(help_text='Snapshot of the order details printed on the receipt')),
+                ('file', models.FileField(blank=True, help_text='The rendered PDF', upload_to='receipts/')),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Number of times rendering was started')),
+                ('error', models.TextField(blank=True, default='', help_text='Last rendering error, if any')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.ForeignKey(help_text='The customer allowed to download the receipt', on_delete=django.db.models.deletion.CASCADE, to='store.customer')),
+                ('order', models.OneToOneField(help_text='The checkout this receipt belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='receipt', to='store.reportorder')),
+            ],
+            options={
+                'verbose_name': 'Receipt',
+                'verbose_name_plural': 'Receipts',
+                'indexes': [models.Index(fields=['status', 'id'], name='store_recei_status_2c29b4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    """Seed the rollups from existing orders; same logic as rebuild_sales_rollups."""
+    ReportOrder = apps.get_model('store', 'ReportOrder')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    DailySales = apps.get_model('store', 'DailySales')
+    ProductSales = apps.get_model('store', 'ProductSales')
+
+    days = ReportOrder.objects.filter(is_completed=True).annotate(
+        day=TruncDate('created_at')
+    ).values('day').annotate(count=Count('id'), amount=Sum('total')).order_by()
+    DailySales.objects.bulk_create(
+        [DailySales(date=row['day'], orders=row['count'], revenue=row['amount']) for row in days],
+        batch_size=1000
+    )
+    products = OrderItem.objects.filter(order__is_completed=True, product__isnull=False).values('product').annotate(
+        units=Sum('quantity'),
+        amount=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    ).order_by()
+    ProductSales.objects.bulk_create(
+        [ProductSales(product_id=row['product'], quantity=row['units'], revenue=row['amount']) for row in products],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_receipt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='store.reportproduct')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-quantity'], name='store_produ_quantit_0ffe88_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_sales_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reportorder',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['created_at'], name='store_reportorder_completed_at'),
+        ),
+    ]
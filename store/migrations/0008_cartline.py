@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_reportorder_completed_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1, help_text='Number of units in the cart')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.ForeignKey(help_text='The customer owning the cart', on_delete=django.db.models.deletion.CASCADE, related_name='cart_lines', to='store.customer')),
+                ('product', models.ForeignKey(help_text='The product in the cart', on_delete=django.db.models.deletion.CASCADE, to='store.product')),
+            ],
+            options={
+                'verbose_name': 'Cart line',
+                'verbose_name_plural': 'Cart lines',
+                'constraints': [models.UniqueConstraint(fields=('customer', 'product'), name='store_cartline_customer_product')],
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# External-content FTS5 index over store_product, kept in step by triggers so
+# every insert, delete and edit (ORM, admin, raw SQL or bulk) is reflected.
+# The prefix indexes make 2-4 character typeahead lookups index seeks.
+FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE store_product_fts USING fts5(
+        name, brand, description,
+        content='store_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER store_product_fts_insert AFTER INSERT ON store_product BEGIN
+        INSERT INTO store_product_fts(rowid, name, brand, description)
+        VALUES (new.id, new.name, new.brand, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER store_product_fts_delete AFTER DELETE ON store_product BEGIN
+        INSERT INTO store_product_fts(store_product_fts, rowid, name, brand, description)
+        VALUES ('delete', old.id, old.name, old.brand, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER store_product_fts_update AFTER UPDATE OF name, brand, description ON store_product BEGIN
+        INSERT INTO store_product_fts(store_product_fts, rowid, name, brand, description)
+        VALUES ('delete', old.id, old.name, old.brand, old.description);
+        INSERT INTO store_product_fts(rowid, name, brand, description)
+        VALUES (new.id, new.name, new.brand, new.description);
+    END
+    """,
+    "INSERT INTO store_product_fts(store_product_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS store_product_fts_insert",
+    "DROP TRIGGER IF EXISTS store_product_fts_delete",
+    "DROP TRIGGER IF EXISTS store_product_fts_update",
+    "DROP TABLE IF EXISTS store_product_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    """SQLite only; other databases fall back to LIKE matching in services.search."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_cartline'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
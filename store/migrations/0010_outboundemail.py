@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.TextField(help_text='Subject line')),
+                ('body', models.TextField(help_text='Plain text body')),
+                ('from_email', models.CharField(help_text='Sender address', max_length=254)),
+                ('to', models.JSONField(help_text='List of recipient addresses')),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Sending', 'Sending'), ('Sent', 'Sent'), ('Failed', 'Failed')], default='Pending', help_text='Delivery state of the email', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Number of times sending was started')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Earliest time the worker may try to send it')),
+                ('error', models.TextField(blank=True, default='', help_text='Last sending error, if any')),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Outbound email',
+                'verbose_name_plural': 'Outbound emails',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='store_outbo_status_57162a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:53
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_emails(apps, schema_editor):
+    # Merging customers means merging their orders, so leave it to a person
+    Customer = apps.get_model('store', 'Customer')
+    duplicates = list(
+        Customer.objects.values('email').annotate(n=Count('id')).filter(n__gt=1).values_list('email', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Cannot make Customer.email unique; these addresses belong to several customers: "
+            + ", ".join(duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_outboundemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='customer',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-date_ordered'], name='store_order_customer_date'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'date_ordered'], name='store_order_status_date'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'name'], name='store_product_category_name'),
+        ),
+    ]
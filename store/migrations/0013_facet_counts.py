@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import BooleanField, Case, Count, IntegerField, Value, When
+
+
+def backfill_facets(apps, schema_editor):
+    """Count existing products; same logic as rebuild_facets."""
+    Product = apps.get_model('store', 'Product')
+    FacetCount = apps.get_model('store', 'FacetCount')
+
+    grouped = Product.objects.annotate(
+        band=Case(
+            *[When(price__lt=upper, then=Value(index)) for index, upper in enumerate(settings.PRICE_BANDS)],
+            default=Value(len(settings.PRICE_BANDS)),
+            output_field=IntegerField(),
+        ),
+        stocked=Case(When(quantity__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField()),
+    ).values_list('category_id', 'brand', 'band', 'stocked').annotate(n=Count('id')).order_by()
+    counts = {}
+    for category_id, brand, price_band, in_stock, n in grouped:
+        key = (category_id, brand or '', price_band, in_stock)
+        counts[key] = counts.get(key, 0) + n
+    FacetCount.objects.bulk_create(
+        [
+            FacetCount(category_id=category_id, brand=brand, price_band=price_band, in_stock=in_stock, products=n)
+            for (category_id, brand, price_band, in_stock), n in counts.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_order_history_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('brand', models.CharField(blank=True, help_text='Product brand; empty for unbranded products', max_length=60)),
+                ('price_band', models.PositiveSmallIntegerField(help_text='Index into settings.PRICE_BANDS')),
+                ('in_stock', models.BooleanField()),
+                ('products', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Facet count',
+                'verbose_name_plural': 'Facet counts',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'brand', 'id'], name='store_product_category_brand'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price', 'id'], name='store_product_category_price'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('quantity__gt', 0)), fields=['category', 'id'], name='store_product_category_stocked'),
+        ),
+        migrations.AddField(
+            model_name='facetcount',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facet_counts', to='store.category'),
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(fields=('category', 'brand', 'price_band', 'in_stock'), name='store_facetcount_unique'),
+        ),
+        migrations.RunPython(backfill_facets, migrations.RunPython.noop),
+    ]
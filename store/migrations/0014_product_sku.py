@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+# Adding (or dropping) a unique column makes SQLite rebuild store_product,
+# which drops the full-text index triggers from 0009_product_search.
+TRIGGER_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS store_product_fts_insert AFTER INSERT ON store_product BEGIN
+        INSERT INTO store_product_fts(rowid, name, brand, description)
+        VALUES (new.id, new.name, new.brand, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS store_product_fts_delete AFTER DELETE ON store_product BEGIN
+        INSERT INTO store_product_fts(store_product_fts, rowid, name, brand, description)
+        VALUES ('delete', old.id, old.name, old.brand, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS store_product_fts_update AFTER UPDATE OF name, brand, description ON store_product BEGIN
+        INSERT INTO store_product_fts(store_product_fts, rowid, name, brand, description)
+        VALUES ('delete', old.id, old.name, old.brand, old.description);
+        INSERT INTO store_product_fts(rowid, name, brand, description)
+        VALUES (new.id, new.name, new.brand, new.description);
+    END
+    """,
+]
+
+
+def restore_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in TRIGGER_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_facet_counts'),
+    ]
+
+    operations = [
+        # Runs last when migrating backwards, after RemoveField's rebuild
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Supplier stock keeping unit; bulk imports match products on it', max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_product_sku'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='receipt',
+            name='store_recei_status_2c29b4_idx',
+        ),
+        migrations.AddField(
+            model_name='receipt',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Earliest time the worker may try to render it'),
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='store_recei_status_96c858_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:11
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Adding a NOT NULL column makes SQLite rebuild store_product, like 0014_product_sku did
+restore_search_triggers = import_module('store.migrations.0014_product_sku').restore_search_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_receipt_retry_backoff'),
+    ]
+
+    operations = [
+        # Runs last when migrating backwards, after RemoveField's rebuild
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Last change to anything the product page shows; bulk update() calls must set it too'),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import models
+from .customer import Customer
+from .product import Product
+
+class CartLine(models.Model):
+    """One product in a logged-in customer's persistent cart."""
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='cart_lines', help_text="The customer owning the cart")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, help_text="The product in the cart")
+    quantity = models.PositiveIntegerField(default=1, help_text="Number of units in the cart")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for customer {self.customer_id}"
+
+    class Meta:
+        verbose_name = "Cart line"
+        verbose_name_plural = "Cart lines"
+        # Also the index for cart reads and the conflict target for merges
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'product'], name='store_cartline_customer_product')
+        ]
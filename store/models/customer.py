@@ -4,7 +4,7 @@ class Customer(models.Model):
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50)
     phone = models.CharField(max_length=10)
-    email = models.EmailField()
+    email = models.EmailField(unique=True)  # Login and signup look customers up by email
     password = models.CharField(max_length=100)
 
     def register(self):
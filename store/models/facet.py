@@ -0,0 +1,29 @@
+from django.db import models
+from .category import Category
+
+class FacetCount(models.Model):
+    """
+    Number of products sharing one combination of listing filters.
+
+    Kept current by Product saves and stock changes (store.services.facets),
+    so the listing can show counts next to every filter option without
+    counting products.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='facet_counts')
+    brand = models.CharField(max_length=60, blank=True, help_text="Product brand; empty for unbranded products")
+    price_band = models.PositiveSmallIntegerField(help_text="Index into settings.PRICE_BANDS")
+    in_stock = models.BooleanField()
+    products = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.category_id}/{self.brand or '-'}/{self.price_band}/{'in' if self.in_stock else 'out'}: {self.products}"
+
+    class Meta:
+        verbose_name = "Facet count"
+        verbose_name_plural = "Facet counts"
+        # Also the index for a category's rows and the conflict target for increments
+        constraints = [
+            models.UniqueConstraint(
+                fields=['category', 'brand', 'price_band', 'in_stock'], name='store_facetcount_unique'
+            )
+        ]
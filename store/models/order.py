@@ -4,6 +4,11 @@ from .customer import Customer
 
 class Order(models.Model):
     """Represents a customer order for a product in Smart Computers."""
+    PENDING = 'Pending'
+    SHIPPED = 'Shipped'
+    DELIVERED = 'Delivered'
+    CANCELLED = 'Cancelled'
+
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, help_text="The customer placing the order")
     product = models.ForeignKey(Product, on_delete=models.CASCADE, help_text="The product being ordered")
     date_ordered = models.DateTimeField(auto_now_add=True, help_text="Date the order was placed")
@@ -11,12 +16,12 @@ class Order(models.Model):
     status = models.CharField(
         max_length=20,
         choices=[
-            ('Pending', 'Pending'),
-            ('Shipped', 'Shipped'),
-            ('Delivered', 'Delivered'),
-            ('Cancelled', 'Cancelled')
+            (PENDING, 'Pending'),
+            (SHIPPED, 'Shipped'),
+            (DELIVERED, 'Delivered'),
+            (CANCELLED, 'Cancelled')
         ],
-        default='Pending',
+        default=PENDING,
         help_text="Current status of the order"
     )
     address = models.CharField(max_length=100, default='', blank=True, help_text="Delivery address")
@@ -35,4 +40,11 @@ class Order(models.Model):
     class Meta:
         verbose_name = "Order"
         verbose_name_plural = "Orders"
-        ordering = ['-date_ordered']  # Newest first
\ No newline at end of file
+        ordering = ['-date_ordered']  # Newest first
+        indexes = [
+            # A customer's order history, newest first, read straight off the index;
+            # id breaks ties between the lines of one checkout for keyset paging
+            models.Index(fields=['customer', '-date_ordered', '-id'], name='store_order_customer_date'),
+            # The admin's status filter with its date ordering and date drill-down
+            models.Index(fields=['status', 'date_ordered'], name='store_order_status_date'),
+        ]
\ No newline at end of file
@@ -0,0 +1,40 @@
+from django.db import models
+from django.utils import timezone
+
+class OutboundEmail(models.Model):
+    """An email waiting in the outbox; a background worker sends it over SMTP."""
+    PENDING = 'Pending'
+    SENDING = 'Sending'
+    SENT = 'Sent'
+    FAILED = 'Failed'
+
+    subject = models.TextField(help_text="Subject line")
+    body = models.TextField(help_text="Plain text body")
+    from_email = models.CharField(max_length=254, help_text="Sender address")
+    to = models.JSONField(help_text="List of recipient addresses")
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            (PENDING, 'Pending'),
+            (SENDING, 'Sending'),
+            (SENT, 'Sent'),
+            (FAILED, 'Failed')
+        ],
+        default=PENDING,
+        help_text="Delivery state of the email"
+    )
+    attempts = models.PositiveIntegerField(default=0, help_text="Number of times sending was started")
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text="Earliest time the worker may try to send it")
+    error = models.TextField(default='', blank=True, help_text="Last sending error, if any")
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)} ({self.status})"
+
+    class Meta:
+        verbose_name = "Outbound email"
+        verbose_name_plural = "Outbound emails"
+        # The worker polls for pending emails that are due
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
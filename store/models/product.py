@@ -2,6 +2,10 @@ from django.db import models
 from .category import Category
 
 class Product(models.Model):  # Changed to singular 'Product'
+    sku = models.CharField(
+        max_length=64, unique=True, null=True, blank=True,
+        help_text="Supplier stock keeping unit; bulk imports match products on it"
+    )
     name = models.CharField(max_length=60)
     brand = models.CharField(max_length=60, default='', blank=True, null=True)
     price = models.IntegerField(default=0)
@@ -9,17 +13,25 @@ class Product(models.Model):  # Changed to singular 'Product'
     description = models.CharField(max_length=250, default='', blank=True, null=True)
     image = models.ImageField(upload_to='uploads/products/')
     quantity = models.PositiveIntegerField(default=0, help_text="Number of units in stock")  # New field
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Last change to anything the product page shows; bulk update() calls must set it too"
+    )
 
     def __str__(self):
         return self.name
 
-    def reduce_stock(self, amount):
-        """Reduce stock by the given amount if sufficient quantity exists."""
-        if self.quantity >= amount:
-            self.quantity -= amount
-            self.save()
-            return True
-        return False
+    class Meta:
+        indexes = [
+            # Category pages and the admin list products of one category by name
+            models.Index(fields=['category', 'name'], name='store_product_category_name'),
+            # Filtered listings page through one category by id (store.services.facets)
+            models.Index(fields=['category', 'brand', 'id'], name='store_product_category_brand'),
+            models.Index(fields=['category', 'price', 'id'], name='store_product_category_price'),
+            models.Index(
+                fields=['category', 'id'], condition=models.Q(quantity__gt=0), name='store_product_category_stocked'
+            ),
+        ]
 
     @staticmethod
     def get_products_by_id(ids):
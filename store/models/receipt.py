@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils import timezone
+from .customer import Customer
+from .report import ReportOrder
+
+class Receipt(models.Model):
+    """A checkout receipt PDF, queued at checkout and rendered by a background worker."""
+    PENDING = 'Pending'
+    RENDERING = 'Rendering'
+    READY = 'Ready'
+    FAILED = 'Failed'
+
+    order = models.OneToOneField(ReportOrder, on_delete=models.CASCADE, related_name='receipt', help_text="The checkout this receipt belongs to")
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, help_text="The customer allowed to download the receipt")
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            (PENDING, 'Pending'),
+            (RENDERING, 'Rendering'),
+            (READY, 'Ready'),
+            (FAILED, 'Failed')
+        ],
+        default=PENDING,
+        help_text="Rendering state of the receipt"
+    )
+    payload = models.JSONField(help_text="Snapshot of the order details printed on the receipt")
+    file = models.FileField(upload_to='receipts/', blank=True, help_text="The rendered PDF")
+    attempts = models.PositiveIntegerField(default=0, help_text="Number of times rendering was started")
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text="Earliest time the worker may try to render it")
+    error = models.TextField(default='', blank=True, help_text="Last rendering error, if any")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Receipt for order {self.order_id} ({self.status})"
+
+    class Meta:
+        verbose_name = "Receipt"
+        verbose_name_plural = "Receipts"
+        # The worker polls for pending receipts that are due
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
@@ -2,7 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 
 class ReportProduct(models.Model):
-    name = models.CharField(max_length=200)
+    name = models.CharField(max_length=200, unique=True)  # Upsert key used by checkout
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to='products/', null=True, blank=True)
     stock = models.PositiveIntegerField(default=0)
@@ -16,6 +16,18 @@ class ReportOrder(models.Model):
     is_completed = models.BooleanField(default=False)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
 
+    class Meta:
+        # Sales report date-range scans only read completed orders. A partial index
+        # serves them where a leading boolean column would not: Django filters with a
+        # bare "WHERE is_completed", which SQLite cannot match to (is_completed, ...).
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(is_completed=True),
+                name='store_reportorder_completed_at',
+            )
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.customer}"
 
@@ -26,4 +38,25 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)  # Price at purchase
 
     def __str__(self):
-        return f"{self.quantity} x {self.product.name}"
\ No newline at end of file
+        return f"{self.quantity} x {self.product.name}"
+
+class DailySales(models.Model):
+    """Completed-order totals per local calendar day, maintained by checkout."""
+    date = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.date}: {self.orders} orders"
+
+class ProductSales(models.Model):
+    """Units sold and revenue per report product across all completed orders."""
+    product = models.OneToOneField(ReportProduct, on_delete=models.CASCADE, related_name='sales')
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['-quantity'])]  # Top-products lookup
+
+    def __str__(self):
+        return f"{self.product.name}: {self.quantity} sold"
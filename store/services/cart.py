@@ -0,0 +1,393 @@
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from store.models.cart import CartLine
+from store.models.product import Product
+
+
+def cart_owner(request):
+    """The customer id the cart belongs to, or 'anonymous' before login."""
+    return request.session.get('customer', 'anonymous')
+
+
+async def acart_owner(request):
+    return await request.session.aget('customer', 'anonymous')
+
+
+class CartStore:
+    """
+    Base for cart backends: ``load(owner)`` and ``save(owner, lines, response)``.
+
+    Async views use ``aload``/``asave``/``aget_products``; backends override
+    them where they can avoid a thread hop.
+    """
+
+    def __init__(self, request):
+        self.request = request
+
+    def get_products(self, product_ids):
+        """Return ``{id: Product}`` for the given ids."""
+        return Product.objects.in_bulk(product_ids)
+
+    async def aget_products(self, product_ids):
+        return await Product.objects.ain_bulk(product_ids)
+
+    async def aload(self, owner):
+        return await sync_to_async(self.load)(owner)
+
+    async def asave(self, owner, lines, response):
+        await sync_to_async(self.save)(owner, lines, response)
+
+
+class SessionCartStore(CartStore):
+    """Keeps each cart in the session under ``cart_<owner>``, as the cart views always did."""
+
+    def load(self, owner):
+        return dict(self.request.session.get(f"cart_{owner}", {}))
+
+    def save(self, owner, lines, response):
+        self.request.session[f"cart_{owner}"] = lines
+        self.request.session.modified = True
+
+    async def aload(self, owner):
+        return dict(await self.request.session.aget(f"cart_{owner}", {}))
+
+    async def asave(self, owner, lines, response):
+        await self.request.session.aset(f"cart_{owner}", lines)
+
+
+class CacheCartStore(CartStore):
+    """
+    Keeps carts in the CART_CACHE backend, keyed by customer or by a random cart id cookie.
+
+    Only the cache is written on a cart change, never the session table.
+    The backend must be shared by every process that serves the site.
+    """
+
+    cookie_name = 'cart_id'
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.cache = caches[settings.CART_CACHE]
+        self.token = request.COOKIES.get(self.cookie_name)
+        self.new_token = False
+
+    def _key(self, owner):
+        if owner != 'anonymous':
+            return f"cart:customer:{owner}"
+        if not self.token:
+            self.token = uuid.uuid4().hex
+            self.new_token = True
+        return f"cart:anonymous:{self.token}"
+
+    def load(self, owner):
+        if owner == 'anonymous' and not self.token:
+            return {}
+        return dict(self.cache.get(self._key(owner)) or {})
+
+    def save(self, owner, lines, response):
+        self.cache.set(self._key(owner), lines, settings.CART_MAX_AGE)
+        self._set_cookie(response)
+
+    async def aload(self, owner):
+        if owner == 'anonymous' and not self.token:
+            return {}
+        return dict(await self.cache.aget(self._key(owner)) or {})
+
+    async def asave(self, owner, lines, response):
+        await self.cache.aset(self._key(owner), lines, settings.CART_MAX_AGE)
+        self._set_cookie(response)
+
+    def _set_cookie(self, response):
+        if self.new_token:
+            response.set_cookie(
+                self.cookie_name, self.token, max_age=settings.CART_MAX_AGE, httponly=True, samesite='Lax'
+            )
+
+
+class SignedCookieCartStore(CartStore):
+    """
+    Keeps carts in one signed, compressed cookie holding ``{owner: {product_id: qty}}``.
+
+    Nothing is stored server side, so a cart change costs no database or cache
+    write. The signature stops clients from editing quantities or ids.
+    """
+
+    cookie_name = 'cart'
+    salt = 'store.cart'
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.carts = None
+
+    def _carts(self):
+        if self.carts is None:
+            try:
+                self.carts = signing.loads(
+                    self.request.COOKIES.get(self.cookie_name, ''), salt=self.salt, max_age=settings.CART_MAX_AGE
+                )
+            except signing.BadSignature:
+                self.carts = {}
+        return self.carts
+
+    def load(self, owner):
+        return dict(self._carts().get(str(owner), {}))
+
+    def save(self, owner, lines, response):
+        carts = self._carts()
+        if lines:
+            carts[str(owner)] = lines
+        else:
+            carts.pop(str(owner), None)
+        if carts:
+            response.set_cookie(
+                self.cookie_name, signing.dumps(carts, salt=self.salt, compress=True),
+                max_age=settings.CART_MAX_AGE, httponly=True, samesite='Lax'
+            )
+        else:
+            response.delete_cookie(self.cookie_name, samesite='Lax')
+
+    # Cookie carts never touch the database or cache
+    async def aload(self, owner):
+        return self.load(owner)
+
+    async def asave(self, owner, lines, response):
+        self.save(owner, lines, response)
+
+
+# bulk_create options that turn CartLine inserts into an upsert on (customer, product)
+UPSERT = {'update_conflicts': True, 'unique_fields': ['customer', 'product'], 'update_fields': ['quantity', 'updated_at']}
+
+
+class DatabaseCartStore(CartStore):
+    """
+    Keeps a logged-in customer's cart as CartLine rows, so it outlives the session.
+
+    ``load`` reads the lines and their products in one joined query, and
+    ``save`` writes only what changed: one DELETE for removed lines and one
+    upsert for added or changed ones.
+    """
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.loaded = {}
+        self.products = {}
+
+    def _remember(self, rows):
+        self.loaded = {str(row.product_id): row.quantity for row in rows}
+        self.products = {row.product_id: row.product for row in rows}
+        return dict(self.loaded)
+
+    def _rows(self, owner):
+        return CartLine.objects.filter(customer_id=owner).select_related('product')
+
+    def load(self, owner):
+        return self._remember(list(self._rows(owner)))
+
+    async def aload(self, owner):
+        return self._remember([row async for row in self._rows(owner)])
+
+    def get_products(self, product_ids):
+        if all(pid in self.products for pid in product_ids):
+            return self.products
+        return super().get_products(product_ids)
+
+    async def aget_products(self, product_ids):
+        if all(pid in self.products for pid in product_ids):
+            return self.products
+        return await super().aget_products(product_ids)
+
+    def _diff(self, lines):
+        removed = [int(pid) for pid in self.loaded if pid not in lines]
+        changed = {int(pid): qty for pid, qty in lines.items() if self.loaded.get(pid) != qty}
+        new = [pid for pid in changed if str(pid) not in self.loaded]
+        return removed, changed, new
+
+    def _keep_existing(self, changed, existing):
+        # Drop ids of products that no longer exist rather than fail on the foreign key
+        return {pid: qty for pid, qty in changed.items() if str(pid) in self.loaded or pid in existing}
+
+    @staticmethod
+    def _rows_for(owner, changed):
+        return [CartLine(customer_id=owner, product_id=pid, quantity=qty) for pid, qty in changed.items()]
+
+    def save(self, owner, lines, response):
+        removed, changed, new = self._diff(lines)
+        if new:
+            existing = set(Product.objects.filter(id__in=new).values_list('id', flat=True))
+            changed = self._keep_existing(changed, existing)
+        if removed:
+            CartLine.objects.filter(customer_id=owner, product_id__in=removed).delete()
+        if changed:
+            CartLine.objects.bulk_create(self._rows_for(owner, changed), **UPSERT)
+        self.loaded = dict(lines)
+
+    async def asave(self, owner, lines, response):
+        removed, changed, new = self._diff(lines)
+        if new:
+            existing = {pid async for pid in Product.objects.filter(id__in=new).values_list('id', flat=True)}
+            changed = self._keep_existing(changed, existing)
+        if removed:
+            await CartLine.objects.filter(customer_id=owner, product_id__in=removed).adelete()
+        if changed:
+            await CartLine.objects.abulk_create(self._rows_for(owner, changed), **UPSERT)
+        self.loaded = dict(lines)
+
+
+def get_store_class():
+    return import_string(settings.CART_STORAGE)
+
+
+def merge_carts(customer_id, lines):
+    """
+    Add an anonymous cart's ``{product_id: quantity}`` lines to a customer's CartLine rows.
+
+    One INSERT .. ON CONFLICT adds the quantities onto lines the customer
+    already has, which the ORM's bulk_create cannot express.
+    """
+    product_ids = [int(pid) for pid in lines]
+    existing = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+    rows = [(pid, qty) for pid, qty in ((int(pid), qty) for pid, qty in lines.items()) if pid in existing and qty > 0]
+    if not rows:
+        return 0
+
+    qn = connection.ops.quote_name
+    table = qn(CartLine._meta.db_table)
+    now = CartLine._meta.get_field('updated_at').get_db_prep_value(timezone.now(), connection)
+    placeholders = ', '.join(['(%s, %s, %s, %s)'] * len(rows))
+    params = []
+    for pid, qty in rows:
+        params.extend([customer_id, pid, qty, now])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({qn('customer_id')}, {qn('product_id')}, {qn('quantity')}, {qn('updated_at')}) "
+            f"VALUES {placeholders} "
+            f"ON CONFLICT ({qn('customer_id')}, {qn('product_id')}) DO UPDATE SET "
+            f"{qn('quantity')} = {table}.{qn('quantity')} + EXCLUDED.{qn('quantity')}, "
+            f"{qn('updated_at')} = EXCLUDED.{qn('updated_at')}",
+            params
+        )
+    return len(rows)
+
+
+class CartService:
+    """
+    The shopping cart for one request: ``{product_id: quantity}`` plus pricing.
+
+    Use ``CartService.for_request(request)``. Changes are held in memory and
+    written once, by CartMiddleware, when the response goes out: to CartLine
+    rows for a logged-in customer, otherwise to the CART_STORAGE backend.
+    """
+
+    def __init__(self, request, store=None, owner=None):
+        self.request = request
+        self.owner = owner if owner is not None else cart_owner(request)
+        if store is None:
+            store_class = get_store_class() if self.owner == 'anonymous' else DatabaseCartStore
+            store = store_class(request)
+        self.store = store
+        self._lines = None
+        self.modified = False
+
+    @classmethod
+    def for_request(cls, request):
+        if not hasattr(request, '_cart'):
+            request._cart = cls(request)
+        return request._cart
+
+    @classmethod
+    async def afor_request(cls, request):
+        """Async views: the request's cart with its lines already loaded."""
+        if not hasattr(request, '_cart'):
+            request._cart = cls(request, owner=await acart_owner(request))
+        await request._cart.aload()
+        return request._cart
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            self._lines = self.store.load(self.owner)
+        return self._lines
+
+    async def aload(self):
+        if self._lines is None:
+            self._lines = await self.store.aload(self.owner)
+        return self._lines
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def add(self, product_id, quantity=1):
+        product_id = _clean_id(product_id)
+        if product_id and quantity > 0:
+            self.lines[product_id] = self.lines.get(product_id, 0) + quantity
+            self.modified = True
+
+    def decrease(self, product_id):
+        product_id = _clean_id(product_id)
+        if product_id in self.lines:
+            if self.lines[product_id] > 1:
+                self.lines[product_id] -= 1
+            else:
+                del self.lines[product_id]
+            self.modified = True
+
+    def remove(self, product_id):
+        product_id = _clean_id(product_id)
+        if product_id in self.lines:
+            del self.lines[product_id]
+            self.modified = True
+
+    def clear(self):
+        self.lines.clear()
+        self.modified = True
+
+    def merge_into(self, customer_id):
+        """Move this (anonymous) cart into the customer's persistent cart, e.g. at login."""
+        if self.lines:
+            merge_carts(customer_id, self.lines)
+            self.clear()
+
+    def items(self):
+        """Cart lines joined to their products: ``[{'product', 'quantity', 'total'}]`` in at most one query."""
+        if not self.lines:
+            return []
+        return self._priced(self.store.get_products([int(pid) for pid in self.lines]))
+
+    async def aitems(self):
+        lines = await self.aload()
+        if not lines:
+            return []
+        return self._priced(await self.store.aget_products([int(pid) for pid in lines]))
+
+    def _priced(self, products):
+        return [
+            {'product': products[int(pid)], 'quantity': qty, 'total': products[int(pid)].price * qty}
+            for pid, qty in self.lines.items()
+            if int(pid) in products
+        ]
+
+    def save(self, response):
+        if self.modified:
+            self.store.save(self.owner, self.lines, response)
+            self.modified = False
+
+    async def asave(self, response):
+        if self.modified:
+            await self.store.asave(self.owner, await self.aload(), response)
+            self.modified = False
+
+
+def _clean_id(product_id):
+    """Normalise a posted product id to the string key used in stored carts."""
+    try:
+        product_id = int(product_id)
+    except (TypeError, ValueError):
+        return None
+    return str(product_id) if product_id > 0 else None
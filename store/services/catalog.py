@@ -0,0 +1,253 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils import timezone
+from store.models.category import Category
+from store.models.product import Product
+from store.services import facets
+
+# Cache scopes: one per category id, plus 'all' for the unfiltered listing
+# and 'categories' for the sidebar dropdown. Their versions live in the shared
+# CATALOG_VERSION_CACHE; the pages they key stay in each process's own cache.
+# Product pages are versioned by Product.updated_at instead (product_version()).
+ALL_SCOPE = 'all'
+CATEGORIES_SCOPE = 'categories'
+
+
+def _versions():
+    """The CATALOG_VERSION_CACHE backend; shared by every process, so a bump in one is seen by all."""
+    return caches[settings.CATALOG_VERSION_CACHE]
+
+
+def _version_key(scope):
+    return f"catalog:version:{scope}"
+
+
+def get_version(scope):
+    """Return the current cache version for a listing scope."""
+    versions = _versions()
+    key = _version_key(scope)
+    version = versions.get(key)
+    if version is None:
+        # Seed with a timestamp so an evicted counter never reuses old page keys
+        versions.add(key, time.time_ns(), None)
+        version = versions.get(key, 0)
+    return version
+
+
+async def aget_version(scope):
+    versions = _versions()
+    key = _version_key(scope)
+    version = await versions.aget(key)
+    if version is None:
+        await versions.aadd(key, time.time_ns(), None)
+        version = await versions.aget(key, 0)
+    return version
+
+
+def bump_version(scope):
+    """Invalidate every cached page for a scope by moving its version on."""
+    versions = _versions()
+    key = _version_key(scope)
+    try:
+        versions.incr(key)
+    except ValueError:
+        versions.add(key, time.time_ns(), None)
+
+
+def invalidate_products(*category_ids):
+    """Invalidate the listing pages that can contain products of these categories."""
+    for category_id in {c for c in category_ids if c is not None}:
+        bump_version(category_id)
+    bump_version(ALL_SCOPE)
+
+
+def invalidate_categories():
+    bump_version(CATEGORIES_SCOPE)
+
+
+def invalidate_product_pages(*product_ids):
+    """
+    Invalidate cached detail pages after writes that skip auto_now, in one UPDATE.
+
+    Saves move ``updated_at`` themselves; update(), bulk_create() and saves
+    limited by update_fields or deferred fields need this (or to set it).
+    """
+    ids = set(product_ids)
+    if ids:
+        Product.objects.filter(id__in=ids).update(updated_at=timezone.now())
+
+
+def _product_version(modified):
+    # Microseconds since the epoch: a cache-key-safe stamp that moves on every change
+    return None if modified is None else (round(modified.timestamp() * 1_000_000), modified)
+
+
+def product_version(product_id):
+    """
+    ``(version, last modified)`` of a product page, or None if there is no such product.
+
+    Read from the product's ``updated_at`` column with one primary key lookup,
+    so every process and host agrees on it without a shared cache.
+    """
+    return _product_version(Product.objects.filter(id=product_id).values_list('updated_at', flat=True).first())
+
+
+async def aproduct_version(product_id):
+    return _product_version(await Product.objects.filter(id=product_id).values_list('updated_at', flat=True).afirst())
+
+
+def get_page_size(requested=None):
+    """Resolve the page size from the request, bounded by the configured maximum."""
+    default = getattr(settings, 'CATALOG_PAGE_SIZE', 24)
+    maximum = getattr(settings, 'CATALOG_MAX_PAGE_SIZE', 96)
+    try:
+        size = int(requested) if requested else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def _timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def _categories():
+    return Category.get_all_categories().order_by('id')
+
+
+def get_categories():
+    """Return all categories, cached until a category is saved or deleted."""
+    key = f"catalog:categories:{get_version(CATEGORIES_SCOPE)}"
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(_categories())
+        cache.set(key, categories, _timeout())
+    return categories
+
+
+async def aget_categories():
+    key = f"catalog:categories:{await aget_version(CATEGORIES_SCOPE)}"
+    categories = await cache.aget(key)
+    if categories is None:
+        categories = [category async for category in _categories()]
+        await cache.aset(key, categories, _timeout())
+    return categories
+
+
+def _filters_key(filters):
+    if not filters or filters == facets.parse_filters({}):
+        return ''
+    # Brands are free text; hash them into a cache-safe key
+    return ':' + hashlib.sha1(repr(sorted(filters.items())).encode()).hexdigest()[:16]
+
+
+def _page_key(scope, version, after, page_size, filters=None):
+    return f"catalog:page:{scope}:{version}:{after or 0}:{page_size}{_filters_key(filters)}"
+
+
+def _page_rows(category_id, after, page_size, filters=None):
+    products = facets.filter_products(Product.get_all_products_by_categoryid(category_id), filters).order_by('id')
+    if after:
+        products = products.filter(id__gt=after)
+    # Fetch one extra row to learn whether another page exists
+    return products[:page_size + 1]
+
+
+def _page(rows, page_size):
+    return {
+        'products': rows[:page_size],
+        'next_cursor': rows[page_size - 1].id if len(rows) > page_size else None,
+    }
+
+
+def get_page(category_id=None, after=None, page_size=None, filters=None):
+    """
+    Return one page of the catalog listing using keyset pagination on id.
+
+    ``after`` is the cursor returned as ``next_cursor`` by the previous page, so
+    every page is a single indexed range scan no matter how deep it is.
+    ``filters`` come from facets.parse_filters; within a category each one
+    has a matching (category, ..., id) index.
+    """
+    page_size = get_page_size(page_size)
+    scope = category_id or ALL_SCOPE
+    key = _page_key(scope, get_version(scope), after, page_size, filters)
+    page = cache.get(key)
+    if page is None:
+        page = _page(list(_page_rows(category_id, after, page_size, filters)), page_size)
+        cache.set(key, page, _timeout())
+    return page
+
+
+async def aget_page(category_id=None, after=None, page_size=None, filters=None):
+    page_size = get_page_size(page_size)
+    scope = category_id or ALL_SCOPE
+    key = _page_key(scope, await aget_version(scope), after, page_size, filters)
+    page = await cache.aget(key)
+    if page is None:
+        page = _page([row async for row in _page_rows(category_id, after, page_size, filters)], page_size)
+        await cache.aset(key, page, _timeout())
+    return page
+
+
+def _facets_key(scope, version):
+    return f"catalog:facets:{scope}:{version}"
+
+
+def get_facets(category_id=None, filters=None):
+    """
+    Return the listing's filter options with product counts.
+
+    Counts come from the precomputed FacetCount rows of the category, cached
+    under the same version as its pages, so no product is counted per request.
+    """
+    scope = category_id or ALL_SCOPE
+    key = _facets_key(scope, get_version(scope))
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(facets.facet_rows(category_id))
+        cache.set(key, rows, _timeout())
+    return facets.summarize(rows, filters or facets.parse_filters({}))
+
+
+async def aget_facets(category_id=None, filters=None):
+    scope = category_id or ALL_SCOPE
+    key = _facets_key(scope, await aget_version(scope))
+    rows = await cache.aget(key)
+    if rows is None:
+        rows = [row async for row in facets.facet_rows(category_id)]
+        await cache.aset(key, rows, _timeout())
+    return facets.summarize(rows, filters or facets.parse_filters({}))
+
+
+def _product_key(product_id, version):
+    return f"catalog:product:{product_id}:{version}"
+
+
+def get_product(product_id, version):
+    """
+    Return the product for a detail page, with its category, or None.
+
+    Cached under its ``product_version()``, so a hit costs no further query
+    and any save, delete or stock change serves the fresh row.
+    """
+    key = _product_key(product_id, version)
+    product = cache.get(key)
+    if product is None:
+        product = Product.objects.select_related('category').filter(id=product_id).first()
+        if product is not None:
+            cache.set(key, product, _timeout())
+    return product
+
+
+async def aget_product(product_id, version):
+    key = _product_key(product_id, version)
+    product = await cache.aget(key)
+    if product is None:
+        product = await Product.objects.select_related('category').filter(id=product_id).afirst()
+        if product is not None:
+            await cache.aset(key, product, _timeout())
+    return product
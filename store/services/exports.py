@@ -0,0 +1,59 @@
+from django.conf import settings
+from store.models.order import Order
+from store.models.report import OrderItem
+from store.services import sales
+
+# Column name -> ORM path, per dataset. The column names double as NDJSON keys.
+DATASETS = {
+    'orders': (
+        Order.objects.all(),
+        'date_ordered',
+        [
+            ('order_id', 'id'),
+            ('date_ordered', 'date_ordered'),
+            ('customer_id', 'customer_id'),
+            ('customer_first_name', 'customer__first_name'),
+            ('customer_last_name', 'customer__last_name'),
+            ('product_id', 'product_id'),
+            ('product_name', 'product__name'),
+            ('quantity', 'quantity'),
+            ('price', 'price'),
+            ('status', 'status'),
+            ('address', 'address'),
+            ('phone', 'phone'),
+        ],
+    ),
+    'sales': (
+        OrderItem.objects.filter(order__is_completed=True),
+        'order__created_at',
+        [
+            ('item_id', 'id'),
+            ('order_id', 'order_id'),
+            ('created_at', 'order__created_at'),
+            ('product_name', 'product__name'),
+            ('quantity', 'quantity'),
+            ('unit_price', 'price'),
+            ('order_total', 'order__total'),
+        ],
+    ),
+}
+
+
+def export_rows(dataset, start=None, end=None):
+    """
+    Return ``(columns, rows)`` for a dataset, where rows is a lazy iterator of tuples.
+
+    Rows are read with ``values_list().iterator()`` in EXPORT_CHUNK_SIZE
+    batches, so the caller can stream any number of them in constant memory.
+    Raises KeyError for an unknown dataset.
+    """
+    queryset, date_field, columns = DATASETS[dataset]
+    lower, upper = sales.period_bounds(start, end)
+    if lower:
+        queryset = queryset.filter(**{f"{date_field}__gte": lower})
+    if upper:
+        queryset = queryset.filter(**{f"{date_field}__lt": upper})
+    rows = queryset.order_by('id').values_list(*[path for _, path in columns]).iterator(
+        chunk_size=settings.EXPORT_CHUNK_SIZE
+    )
+    return [name for name, _ in columns], rows
@@ -0,0 +1,176 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Case, Count, F, IntegerField, Value, When
+from store.models.facet import FacetCount
+from store.models.product import Product
+
+
+def band(price):
+    """Index of the PRICE_BANDS band a price falls in; the last band is open-ended."""
+    for index, upper in enumerate(settings.PRICE_BANDS):
+        if price < upper:
+            return index
+    return len(settings.PRICE_BANDS)
+
+
+def band_range(index):
+    """``(lower, upper)`` price bounds of a band, None where it is open."""
+    bounds = (None, *settings.PRICE_BANDS, None)
+    return bounds[index], bounds[index + 1]
+
+
+def band_label(index):
+    lower, upper = band_range(index)
+    if lower is None:
+        return f"Under KES {upper:,}"
+    if upper is None:
+        return f"KES {lower:,} and above"
+    return f"KES {lower:,} - {upper - 1:,}"
+
+
+def facet_key(category_id, brand, price, quantity):
+    """The FacetCount row a product with these values is counted in."""
+    return (category_id, brand or '', band(price or 0), (quantity or 0) > 0)
+
+
+def key_of(product):
+    return facet_key(product.category_id, product.brand, product.price, product.quantity)
+
+
+def _fields(key):
+    category_id, brand, price_band, in_stock = key
+    return {'category_id': category_id, 'brand': brand, 'price_band': price_band, 'in_stock': in_stock}
+
+
+def adjust(old, new, count=1):
+    """
+    Move ``count`` products (one by default) from the ``old`` facet key to the ``new`` one.
+
+    Either may be None for a created or deleted product. Missing rows are
+    inserted empty and then changed with F() expressions, so concurrent saves
+    never lose an update.
+    """
+    if old == new:
+        return
+    if old is not None:
+        FacetCount.objects.filter(**_fields(old), products__gte=count).update(products=F('products') - count)
+    if new is not None:
+        FacetCount.objects.bulk_create([FacetCount(**_fields(new))], ignore_conflicts=True)
+        FacetCount.objects.filter(**_fields(new)).update(products=F('products') + count)
+
+
+def _band_expression():
+    return Case(
+        *[When(price__lt=upper, then=Value(index)) for index, upper in enumerate(settings.PRICE_BANDS)],
+        default=Value(len(settings.PRICE_BANDS)),
+        output_field=IntegerField(),
+    )
+
+
+@transaction.atomic
+def rebuild(category_ids=None):
+    """
+    Recount the facet rows of some categories (all by default) from Product.
+
+    Used after bulk writes that skip the save signals, and after PRICE_BANDS
+    changes; invalidate the catalog listings afterwards. Returns the number
+    of rows written.
+    """
+    products = Product.objects.all()
+    rows = FacetCount.objects.all()
+    if category_ids is not None:
+        category_ids = set(category_ids)
+        products = products.filter(category_id__in=category_ids)
+        rows = rows.filter(category_id__in=category_ids)
+    rows.delete()
+
+    counts = {}
+    grouped = products.annotate(
+        band=_band_expression(),
+        stocked=Case(When(quantity__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField()),
+    ).values_list('category_id', 'brand', 'band', 'stocked').annotate(n=Count('id')).order_by()
+    for category_id, brand, price_band, in_stock, n in grouped:
+        # NULL and empty brands share the unbranded row
+        key = (category_id, brand or '', price_band, in_stock)
+        counts[key] = counts.get(key, 0) + n
+    FacetCount.objects.bulk_create(
+        [FacetCount(**_fields(key), products=n) for key, n in counts.items()], batch_size=1000
+    )
+    return len(counts)
+
+
+def parse_filters(params):
+    """Read the listing's brand, price band and in-stock filters from a query dict."""
+    try:
+        price_band = int(params.get('band', ''))
+    except ValueError:
+        price_band = None
+    if price_band is not None and not 0 <= price_band <= len(settings.PRICE_BANDS):
+        price_band = None
+    return {
+        'brand': params.get('brand') or None,
+        'band': price_band,
+        'in_stock': params.get('in_stock') == '1',
+    }
+
+
+def filter_products(products, filters):
+    """Apply parsed filters to a Product queryset."""
+    if not filters:
+        return products
+    if filters['brand']:
+        products = products.filter(brand=filters['brand'])
+    if filters['band'] is not None:
+        lower, upper = band_range(filters['band'])
+        if lower is not None:
+            products = products.filter(price__gte=lower)
+        if upper is not None:
+            products = products.filter(price__lt=upper)
+    if filters['in_stock']:
+        products = products.filter(quantity__gt=0)
+    return products
+
+
+def facet_rows(category_id=None):
+    """``(brand, price_band, in_stock, products)`` for every non-empty facet row of a category (or all)."""
+    counts = FacetCount.objects.filter(products__gt=0)
+    if category_id:
+        counts = counts.filter(category_id=category_id)
+    return counts.values_list('brand', 'price_band', 'in_stock', 'products')
+
+
+def _count(rows, brand=None, price_band=None, in_stock=False):
+    return sum(
+        n for row_brand, row_band, row_stock, n in rows
+        if (brand is None or row_brand == brand)
+        and (price_band is None or row_band == price_band)
+        and (row_stock or not in_stock)
+    )
+
+
+def summarize(rows, filters):
+    """
+    Filter options with counts for a listing, computed from facet ``rows``.
+
+    Each option's count applies the other selected filters, as shoppers
+    expect: picking a brand narrows the price band counts, and so on.
+    """
+    brands = sorted({row[0] for row in rows if row[0]})
+    return {
+        'brands': [
+            {'value': brand, 'count': _count(rows, brand, filters['band'], filters['in_stock']),
+             'selected': brand == filters['brand']}
+            for brand in brands
+        ],
+        'bands': [
+            {'value': index, 'label': band_label(index),
+             'count': _count(rows, filters['brand'], index, filters['in_stock']),
+             'selected': index == filters['band']}
+            for index in range(len(settings.PRICE_BANDS) + 1)
+        ],
+        'in_stock': {
+            'count': _count(rows, filters['brand'], filters['band'], True),
+            'selected': filters['in_stock'],
+        },
+        'total': _count(rows, filters['brand'], filters['band'], filters['in_stock']),
+    }
@@ -0,0 +1,145 @@
+import hashlib
+import io
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from store.models.product import Product
+from store.services import catalog, jobs
+
+logger = logging.getLogger(__name__)
+
+# Browsers that cannot show WebP get the source's own format
+FALLBACK_FORMATS = {'PNG': ('PNG', 'png'), 'GIF': ('PNG', 'png')}
+DEFAULT_FALLBACK = ('JPEG', 'jpg')
+
+
+def derived_dir(name):
+    """Derivatives of ``uploads/products/x.jpg`` live in ``uploads/products/x_derived/``."""
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, f"{posixpath.splitext(filename)[0]}_derived")
+
+
+def fingerprint(name):
+    """
+    A short token that changes whenever the source file does, or None if it is missing.
+
+    It is part of every derivative's filename, so a replaced upload gets new
+    derivatives while an unchanged one keeps serving the files it has.
+    """
+    try:
+        size = default_storage.size(name)
+        modified = default_storage.get_modified_time(name).timestamp()
+    except (OSError, NotImplementedError):
+        return None
+    return hashlib.sha1(f"{name}:{size}:{modified}".encode()).hexdigest()[:12]
+
+
+def _widths(source_width):
+    """Configured widths narrower than the source; the source width itself if none are."""
+    widths = [w for w in settings.IMAGE_WIDTHS if w < source_width]
+    return widths or [source_width]
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.save(buffer, fmt, quality=settings.IMAGE_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def _save(name, content):
+    saved = default_storage.save(name, ContentFile(content))
+    if saved != name:
+        # Another worker wrote the same derivative first; keep theirs
+        default_storage.delete(saved)
+
+
+def generate(name):
+    """
+    Write the WebP and fallback derivatives of one source image, if not already there.
+
+    Returns the derivative set, or None when the source is missing or not an
+    image. Derivatives of earlier versions of the source are deleted. When
+    any file was written, the cached pages of the products showing the image
+    are invalidated, as they were rendered with the full-size original.
+    """
+    token = fingerprint(name)
+    if token is None:
+        return None
+    directory = derived_dir(name)
+    try:
+        with default_storage.open(name, 'rb') as f:
+            source = Image.open(f)
+            source_format = source.format
+            source = ImageOps.exif_transpose(source)
+            source.load()
+    except (OSError, Image.DecompressionBombError):
+        logger.warning(f"Cannot read image {name}; serving it as uploaded")
+        return None
+
+    fallback_format, fallback_ext = FALLBACK_FORMATS.get(source_format, DEFAULT_FALLBACK)
+    derived = {'webp': [], 'fallback': []}
+    written = False
+    for width in _widths(source.width):
+        resized = None
+        for kind, fmt, ext in (('webp', 'WEBP', 'webp'), ('fallback', fallback_format, fallback_ext)):
+            path = posixpath.join(directory, f"{token}-{width}w.{ext}")
+            if not default_storage.exists(path):
+                if resized is None:
+                    height = max(1, round(source.height * width / source.width))
+                    resized = source.resize((width, height), Image.LANCZOS)
+                _save(path, _encode(resized, fmt))
+                written = True
+            derived[kind].append((width, path))
+
+    _delete_stale(directory, token)
+    cache.set(_cache_key(name, token), derived, None)
+    if written:
+        catalog.invalidate_product_pages(*Product.objects.filter(image=name).values_list('id', flat=True))
+    return derived
+
+
+def _delete_stale(directory, token):
+    try:
+        _, files = default_storage.listdir(directory)
+    except OSError:
+        return
+    for filename in files:
+        if not filename.startswith(f"{token}-"):
+            default_storage.delete(posixpath.join(directory, filename))
+
+
+def _cache_key(name, token):
+    return f"images:derived:{hashlib.sha1(name.encode()).hexdigest()}:{token}"
+
+
+def derivatives(name):
+    """
+    Return ``{'webp': [(width, path)], 'fallback': [(width, path)]}`` for a source image.
+
+    Costs a stat of the source and a cache read. When the derivatives do not
+    exist yet this returns None at once and queues their generation on the
+    background workers, so the page shows the original this one time.
+    """
+    if not name:
+        return None
+    token = fingerprint(name)
+    if token is None:
+        return None
+    key = _cache_key(name, token)
+    derived = cache.get(key)
+    if derived is None and cache.add(f"images:pending:{key}", 1, 60):
+        jobs.submit(generate, name)
+        # With BACKGROUND_WORKERS = 0 the job has already run
+        derived = cache.get(key)
+    return derived
+
+
+def srcset(paths):
+    return ', '.join(f"{default_storage.url(path)} {width}w" for width, path in paths)
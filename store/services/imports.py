@@ -0,0 +1,233 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from store.models.category import Category
+from store.models.product import Product
+from store.services import catalog, facets
+
+# Columns an import file may carry; only sku is required on every row
+COLUMNS = ('sku', 'name', 'brand', 'price', 'category', 'description', 'quantity', 'image')
+INTEGER_COLUMNS = ('price', 'quantity')
+# A product the import creates needs these as well, as (field, column)
+REQUIRED_FOR_NEW = (('name', 'name'), ('category_id', 'category'))
+# Errors kept for the report; the rest are only counted
+MAX_ERRORS = 50
+
+
+class ImportFormatError(ValueError):
+    """The file as a whole cannot be read, e.g. a CSV without a sku column."""
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def text_stream(binary):
+    """Decode an open binary file lazily; a UTF-8 byte order mark is dropped."""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    if 'sku' not in (reader.fieldnames or []):
+        raise ImportFormatError("The CSV header has no sku column")
+    for row in reader:
+        # Line of the record's last physical line; header is line 1
+        yield reader.line_num, row
+
+
+def read_jsonl(stream):
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+            continue
+        yield line_number, row if isinstance(row, dict) else ValueError("not a JSON object")
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line number, row dict)`` one record at a time; unreadable lines yield an exception instead."""
+    return read_jsonl(stream) if fmt == 'jsonl' else read_csv(stream)
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+class ImportStats:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.categories_created = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def error(self, line_number, message):
+        self.skipped += 1
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"line {line_number}: {message}")
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.rows} row(s): {self.created} created, {self.updated} updated, {self.skipped} skipped "
+            f"in {self.elapsed:.2f}s ({self.rows_per_second:,.0f} rows/s)"
+        )
+
+
+class ProductImporter:
+    """
+    Upserts products from rows of an import file, matched on ``sku``.
+
+    Rows are handled IMPORT_BATCH_SIZE at a time, each batch in its own
+    transaction with one lookup of the existing SKUs and one
+    ``bulk_create(update_conflicts=True)`` per set of columns, so memory
+    stays flat however long the file is. Only the columns a row carries
+    are written; a price and stock feed of ``sku,price,quantity`` leaves
+    names and descriptions alone. Categories are resolved by name through
+    a map loaded once. Bad rows are skipped and reported, and batches
+    already imported stay imported when a later one fails.
+
+    The writes bypass the save signals, so the touched categories' facet
+    counts are rebuilt and their cached listings invalidated at the end;
+    product pages follow the ``updated_at`` every write sets.
+    """
+
+    def __init__(self, create_categories=False, batch_size=None):
+        self.create_categories = create_categories
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.categories = {
+            name.strip().lower(): category_id for name, category_id in Category.objects.values_list('name', 'id')
+        }
+        self.lengths = {
+            column: Product._meta.get_field(column).max_length
+            for column in COLUMNS if column not in INTEGER_COLUMNS and column != 'category'
+        }
+        self.touched_categories = set()
+
+    def run(self, rows, progress=None):
+        """Import ``(line number, row)`` pairs; ``progress(stats)`` is called after every batch."""
+        stats = ImportStats()
+        try:
+            for batch in _batches(rows, self.batch_size):
+                self.import_batch(batch, stats)
+                stats.elapsed = time.monotonic() - stats.started
+                if progress:
+                    progress(stats)
+        finally:
+            if self.touched_categories:
+                facets.rebuild(self.touched_categories)
+                catalog.invalidate_products(*self.touched_categories)
+            stats.elapsed = time.monotonic() - stats.started
+        return stats
+
+    def category_id(self, name):
+        name = name.strip()
+        key = name.lower()
+        if key not in self.categories and self.create_categories:
+            if len(name) > Category._meta.get_field('name').max_length:
+                raise ValueError(f"category name {name!r} is too long")
+            self.categories[key] = Category.objects.create(name=name).id
+            catalog.invalidate_categories()
+            return self.categories[key], True
+        return self.categories.get(key), False
+
+    def clean(self, row, stats):
+        """The row's known, non-empty columns converted for Product; raises ValueError when they do not fit."""
+        values = {}
+        for column in COLUMNS:
+            value = row.get(column)
+            if value is None or (isinstance(value, str) and not value.strip()):
+                continue
+            if column in INTEGER_COLUMNS:
+                try:
+                    value = int(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"{column} must be a whole number, got {value!r}")
+                if value < 0:
+                    raise ValueError(f"{column} cannot be negative")
+            elif column == 'category':
+                category_id, created = self.category_id(str(value))
+                if category_id is None:
+                    raise ValueError(f"unknown category {value!r}")
+                stats.categories_created += created
+                column, value = 'category_id', category_id
+            else:
+                value = str(value).strip()
+                if len(value) > self.lengths[column]:
+                    raise ValueError(f"{column} is longer than {self.lengths[column]} characters")
+            values[column] = value
+        if 'sku' not in values:
+            raise ValueError("sku is missing")
+        return values
+
+    def import_batch(self, batch, stats):
+        cleaned = {}
+        for line_number, row in batch:
+            stats.rows += 1
+            if isinstance(row, Exception):
+                stats.error(line_number, row)
+                continue
+            try:
+                values = self.clean(row, stats)
+            except ValueError as e:
+                stats.error(line_number, e)
+                continue
+            if values['sku'] in cleaned:
+                # A later line for the same SKU wins, as if imported one after the other
+                stats.skipped += 1
+            cleaned[values['sku']] = (line_number, values)
+
+        existing = dict(
+            (sku, (product_id, category_id)) for sku, product_id, category_id
+            in Product.objects.filter(sku__in=cleaned).values_list('sku', 'id', 'category_id')
+        )
+        groups = {}
+        for sku, (line_number, values) in cleaned.items():
+            if sku not in existing:
+                missing = [column for field, column in REQUIRED_FOR_NEW if field not in values]
+                if missing:
+                    stats.error(line_number, f"new SKU {sku!r} needs {' and '.join(missing)}")
+                    continue
+            groups.setdefault(tuple(sorted(values)), []).append(Product(**values))
+
+        with transaction.atomic():
+            for columns, products in groups.items():
+                Product.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    # bulk_create() fills updated_at, which versions the cached product pages
+                    update_fields=[column for column in columns if column != 'sku'] + ['updated_at'],
+                )
+        imported = [product.sku for products in groups.values() for product in products]
+        stats.updated += sum(1 for sku in imported if sku in existing)
+        stats.created += sum(1 for sku in imported if sku not in existing)
+
+        saved = Product.objects.filter(sku__in=imported).values_list('category_id', flat=True)
+        old_categories = {existing[sku][1] for sku in imported if sku in existing}
+        self.touched_categories |= old_categories | set(saved)
+
+
+def import_file(binary, fmt, create_categories=False, batch_size=None, progress=None):
+    """Import products from an open binary CSV or JSONL file and return the ImportStats."""
+    importer = ProductImporter(create_categories, batch_size)
+    return importer.run(read_rows(text_stream(binary), fmt), progress)
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_timers = set()
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                thread_name_prefix='store-jobs',
+            )
+        return _executor
+
+
+def _run(func, args):
+    # Worker threads keep their own DB connections; treat each job like a request
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception(f"Background job {func.__name__} failed")
+    finally:
+        close_old_connections()
+
+
+def submit(func, *args):
+    """
+    Run ``func(*args)`` on the in-process worker pool.
+
+    The job's state must live in the database so that the ``manage.py`` worker
+    commands can pick it up if this process exits first. With
+    ``BACKGROUND_WORKERS = 0`` the job runs inline, which keeps tests and
+    single-threaded deployments deterministic.
+    """
+    if not settings.BACKGROUND_WORKERS:
+        func(*args)
+        return
+    _get_executor().submit(_run, func, args)
+
+
+def submit_later(delay, func, *args):
+    """
+    Hand ``func(*args)`` to the worker pool once ``delay`` seconds have passed.
+
+    The timer only lives in this process; if it exits first, the ``manage.py``
+    worker commands pick the job up from the database. With
+    ``BACKGROUND_WORKERS = 0`` nothing is scheduled and those commands are
+    the only way the job runs.
+    """
+    if not settings.BACKGROUND_WORKERS:
+        return
+
+    def fire():
+        with _lock:
+            _timers.discard(timer)
+        submit(func, *args)
+
+    timer = threading.Timer(delay, fire)
+    timer.daemon = True
+    with _lock:
+        _timers.add(timer)
+    timer.start()
+
+
+def shutdown(wait=True):
+    """
+    Stop the worker pool, by default after the queued jobs finish; the next submit starts a new one.
+
+    Jobs still waiting on a ``submit_later`` timer are dropped.
+    """
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+        timers = list(_timers)
+        _timers.clear()
+    for timer in timers:
+        timer.cancel()
+    if executor is not None:
+        executor.shutdown(wait=wait)
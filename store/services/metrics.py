@@ -0,0 +1,85 @@
+import bisect
+import threading
+import time
+
+# Histogram bucket upper bounds; +Inf is implied
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+METRICS = (
+    ('store_request_duration_seconds', 'Wall time spent in the view and middleware', DURATION_BUCKETS),
+    ('store_db_queries', 'Database queries issued per request', QUERY_BUCKETS),
+    ('store_db_duration_seconds', 'Time spent waiting on database queries per request', DURATION_BUCKETS),
+)
+
+_lock = threading.Lock()
+_histograms = {}
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram: per-bucket counts, a sum and a count."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class QueryTimer:
+    """``connection.execute_wrapper`` hook counting queries and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def observe(view, duration, queries, db_duration):
+    """Record one request against its URL name."""
+    with _lock:
+        for (name, _, buckets), value in zip(METRICS, (duration, queries, db_duration)):
+            key = (name, view)
+            if key not in _histograms:
+                _histograms[key] = Histogram(buckets)
+            _histograms[key].observe(value)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Return every histogram in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name, help_text, _ in METRICS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, view), histogram in sorted(_histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{view="{view}"}} {_format(histogram.sum)}')
+                lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+    return "\n".join(lines) + "\n"
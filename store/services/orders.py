@@ -0,0 +1,164 @@
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from store.models.order import Order
+from store.models.report import ReportProduct, ReportOrder, OrderItem
+from store.services import sales, stock
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@transaction.atomic
+def place_order(customer, cart_items, destination, phone, total_price):
+    """
+    Persist a checkout: reserve stock and write the Order and report rows.
+
+    Rows are built in memory and written with a fixed number of statements
+    (one stock UPDATE, one upsert of ReportProduct, one bulk insert per
+    table and the sales rollup increments), so the cost stays flat as the
+    cart grows. Everything runs in one transaction; if any line cannot be
+    reserved stock.InsufficientStock propagates and nothing is written.
+    """
+    stock.reserve_many([(item['product'], item['quantity']) for item in cart_items])
+
+    report_order = ReportOrder.objects.create(
+        customer=None,  # No User linked to Customer
+        is_completed=True,
+        # Round to cents up front so the rollups add exactly what the column holds
+        total=Decimal(str(total_price)).quantize(Decimal('0.01'))
+    )
+
+    # Order.save() is skipped by bulk_create, so price must be set explicitly
+    Order.objects.bulk_create([
+        Order(
+            customer=customer,
+            product=item['product'],
+            quantity=item['quantity'],
+            price=item['total'],
+            address=destination,
+            phone=phone,
+            status=Order.PENDING
+        )
+        for item in cart_items
+    ])
+
+    # One upsert resolves every ReportProduct; keyed by name as the report groups by it
+    report_products = {
+        item['product'].name: ReportProduct(
+            name=item['product'].name,
+            price=item['product'].price,
+            image=item['product'].image if item['product'].image else None,
+            stock=item['product'].quantity
+        )
+        for item in cart_items
+    }
+    ReportProduct.objects.bulk_create(
+        list(report_products.values()),
+        update_conflicts=True,
+        unique_fields=['name'],
+        update_fields=['price', 'stock'],
+    )
+
+    order_items = OrderItem.objects.bulk_create([
+        OrderItem(
+            order=report_order,
+            product=report_products[item['product'].name],
+            quantity=item['quantity'],
+            price=item['product'].price
+        )
+        for item in cart_items
+    ])
+    sales.record_order(report_order, order_items)
+
+    logger.info(f"Created ReportOrder {report_order.id} with {len(cart_items)} item(s), total {total_price}")
+    return report_order
+
+
+# Only what the history table shows; values() joins product for its name
+HISTORY_FIELDS = ('id', 'date_ordered', 'price', 'quantity', 'status', 'product__name')
+
+
+def order_history(customer_id, before=None, page_size=None):
+    """
+    Return one page of a customer's orders, newest first, using keyset pagination.
+
+    ``before`` is the id of the last order on the previous page. Pages are
+    read off the (customer, -date_ordered, -id) index, so page 500 costs the
+    same as page 1. Returns ``{'orders': [dict], 'next_cursor': id or None}``.
+    """
+    page_size = page_size or getattr(settings, 'ORDER_HISTORY_PAGE_SIZE', 20)
+    orders = Order.objects.filter(customer_id=customer_id)
+    if before:
+        boundary = orders.filter(id=before).values_list('date_ordered', flat=True).first()
+        if boundary is None:
+            # Unknown or someone else's order: start from the top
+            before = None
+        else:
+            orders = orders.filter(date_ordered__lte=boundary).exclude(date_ordered=boundary, id__gte=before)
+    # Fetch one extra row to learn whether another page exists
+    rows = list(orders.order_by('-date_ordered', '-id').values(*HISTORY_FIELDS)[:page_size + 1])
+    return {
+        'orders': rows[:page_size],
+        'next_cursor': rows[page_size - 1]['id'] if len(rows) > page_size else None,
+    }
+
+
+def status_counts(customer_id):
+    """Orders per status for a customer, from one aggregate query; every status is present."""
+    counts = dict(
+        Order.objects.filter(customer_id=customer_id).order_by().values_list('status').annotate(n=Count('id'))
+    )
+    return {status: counts.get(status, 0) for status, _ in Order._meta.get_field('status').choices}
+
+
+# Allowed status changes; Delivered and Cancelled orders are final
+TRANSITIONS = {
+    Order.PENDING: {Order.SHIPPED, Order.DELIVERED, Order.CANCELLED},
+    Order.SHIPPED: {Order.DELIVERED, Order.CANCELLED},
+    Order.DELIVERED: set(),
+    Order.CANCELLED: set(),
+}
+
+
+def sources(status):
+    """The statuses an order may move to ``status`` from."""
+    return sorted(source for source, targets in TRANSITIONS.items() if status in targets)
+
+
+def transition(orders, status, chunk_size=None):
+    """
+    Move every order of a queryset that TRANSITIONS allows to ``status``.
+
+    Orders are handled ORDER_TRANSITION_CHUNK_SIZE at a time by keyset over
+    their ids, each chunk in its own short transaction with its rows locked,
+    so a selection of any size runs in bounded memory. Cancelled orders give
+    their units back: one stock UPDATE per chunk adds each product's total.
+    Orders whose current status cannot move there are left alone.
+    Returns ``{'changed': n, 'skipped': n, 'restocked': units}``.
+    """
+    if status not in TRANSITIONS:
+        raise ValueError(f"Unknown order status {status!r}")
+    allowed = sources(status)
+    chunk_size = chunk_size or settings.ORDER_TRANSITION_CHUNK_SIZE
+    result = {'changed': 0, 'skipped': orders.exclude(status__in=allowed).count(), 'restocked': 0}
+    eligible = orders.filter(status__in=allowed).order_by('id').values_list('id', flat=True)
+    last = 0
+    while ids := list(eligible.filter(id__gt=last)[:chunk_size]):
+        last = ids[-1]
+        with transaction.atomic():
+            # Re-checked under the lock: another request may have moved some meanwhile
+            locked = list(
+                Order.objects.select_for_update().filter(id__in=ids, status__in=allowed)
+                .values_list('id', 'product_id', 'quantity')
+            )
+            if status == Order.CANCELLED:
+                units = {}
+                for _, product_id, quantity in locked:
+                    units[product_id] = units.get(product_id, 0) + quantity
+                stock.release(units)
+                result['restocked'] += sum(units.values())
+            result['changed'] += Order.objects.filter(id__in=[order_id for order_id, _, _ in locked]).update(status=status)
+        result['skipped'] += len(ids) - len(locked)
+    return result
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from store.models.outbox import OutboundEmail
+from store.services import jobs
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(subject, body, to, from_email=None):
+    """
+    Queue an email and hand the outbox to a background worker.
+
+    The request only writes the row; sending is scheduled once the surrounding
+    transaction commits, so slow or unreachable SMTP never holds up a page.
+    """
+    email = OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+    )
+    transaction.on_commit(lambda: jobs.submit(send_pending))
+    return email
+
+
+def claim(email_id):
+    """Atomically move a pending email to sending; False if another worker has it."""
+    return bool(OutboundEmail.objects.filter(id=email_id, status=OutboundEmail.PENDING).update(
+        status=OutboundEmail.SENDING,
+        attempts=F('attempts') + 1,
+        updated_at=timezone.now()
+    ))
+
+
+def retry_delay(attempts):
+    """Seconds to wait after a failed attempt: EMAIL_OUTBOX_RETRY_DELAY, doubling each time."""
+    return settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def _failed(email, error):
+    email.error = error
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = OutboundEmail.FAILED
+        logger.error(f"Giving up on email {email.id} after {email.attempts} attempts: {error}")
+    else:
+        email.status = OutboundEmail.PENDING
+        email.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(email.attempts))
+    email.save(update_fields=['status', 'error', 'next_attempt_at', 'updated_at'])
+
+
+def send_batch(emails):
+    """
+    Send claimed emails over one SMTP connection and record each outcome.
+
+    A message the server rejects is retried on its own; when the connection
+    cannot be opened at all, every email in the batch is retried.
+    """
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning(f"Cannot connect to the mail server: {e}")
+        for email in emails:
+            _failed(email, str(e))
+        return 0
+
+    sent = 0
+    try:
+        for email in emails:
+            message = EmailMessage(email.subject, email.body, email.from_email, email.to, connection=connection)
+            try:
+                message.send()
+            except Exception as e:
+                logger.warning(f"Sending email {email.id} failed: {e}")
+                _failed(email, str(e))
+                continue
+            email.status = OutboundEmail.SENT
+            email.error = ''
+            email.sent_at = timezone.now()
+            email.save(update_fields=['status', 'error', 'sent_at', 'updated_at'])
+            sent += 1
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            # The messages are out; a failed QUIT changes nothing
+            pass
+    return sent
+
+
+def send_pending(limit=None):
+    """
+    Send up to ``limit`` due emails in batches and return how many were sent.
+
+    Emails stuck in sending longer than EMAIL_OUTBOX_STALE_AFTER seconds
+    (their worker died) are put back in the queue first. Retries whose
+    backoff has not passed yet are left for a later run; when this batch
+    puts emails back, that run is scheduled in this process for the
+    earliest of their ``next_attempt_at``.
+    """
+    limit = limit or settings.EMAIL_OUTBOX_BATCH_SIZE
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.EMAIL_OUTBOX_STALE_AFTER)
+    OutboundEmail.objects.filter(status=OutboundEmail.SENDING, updated_at__lt=stale_before).update(
+        status=OutboundEmail.PENDING
+    )
+    due = OutboundEmail.objects.filter(
+        status=OutboundEmail.PENDING, next_attempt_at__lte=now
+    ).order_by('next_attempt_at', 'id').values_list('id', flat=True)
+    claimed = [email_id for email_id in list(due[:limit]) if claim(email_id)]
+    if not claimed:
+        return 0
+    emails = list(OutboundEmail.objects.filter(id__in=claimed).order_by('id'))
+    sent = send_batch(emails)
+    retries = [email.next_attempt_at for email in emails if email.status == OutboundEmail.PENDING]
+    if retries:
+        jobs.submit_later(max(0, (min(retries) - timezone.now()).total_seconds()), send_pending)
+    return sent
@@ -0,0 +1,27 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+HOMEPAGE_KEY = 'pages:homepage'
+
+
+def homepage():
+    """
+    The rendered homepage as ``{'html', 'etag', 'modified'}``.
+
+    The template has no per-request content, so it is rendered once per
+    PAGE_CACHE_TIMEOUT and the ETag is a digest of the HTML.
+    """
+    page = cache.get(HOMEPAGE_KEY)
+    if page is None:
+        html = render_to_string('homepage.html')
+        page = {
+            'html': html,
+            'etag': hashlib.sha1(html.encode()).hexdigest()[:16],
+            'modified': timezone.now().replace(microsecond=0),
+        }
+        cache.set(HOMEPAGE_KEY, page, getattr(settings, 'PAGE_CACHE_TIMEOUT', 3600))
+    return page
@@ -0,0 +1,193 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from store.models.receipt import Receipt
+from store.services import jobs
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(report_order, customer, cart_items, destination, phone, subtotal, discount, delivery_fee, total_price):
+    """
+    Queue the receipt for a checkout and hand it to a background worker.
+
+    The Receipt row is the queue entry. Rendering is only scheduled once the
+    surrounding transaction commits, so a rolled back checkout never renders.
+    """
+    receipt = Receipt.objects.create(
+        order=report_order,
+        customer=customer,
+        payload={
+            'date': timezone.localdate().strftime("%B %d, %Y"),
+            'customer_name': f"{customer.first_name} {customer.last_name}",
+            'destination': destination,
+            'phone': phone,
+            'items': [
+                {
+                    'name': item['product'].name,
+                    'quantity': item['quantity'],
+                    'price': item['product'].price,
+                    'total': item['total']
+                }
+                for item in cart_items
+            ],
+            'subtotal': subtotal,
+            'discount': discount,
+            'delivery_fee': delivery_fee,
+            'total_price': total_price,
+        }
+    )
+    transaction.on_commit(lambda: jobs.submit(process, receipt.id))
+    return receipt
+
+
+def claim(receipt_id):
+    """Atomically move a pending receipt to rendering; False if another worker has it."""
+    return bool(Receipt.objects.filter(id=receipt_id, status=Receipt.PENDING).update(
+        status=Receipt.RENDERING,
+        attempts=F('attempts') + 1,
+        updated_at=timezone.now()
+    ))
+
+
+def retry_delay(attempts):
+    """Seconds to wait after a failed render: RECEIPT_RETRY_DELAY, doubling each time."""
+    return settings.RECEIPT_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def process(receipt_id):
+    """
+    Render a claimed receipt and store the PDF next to the other media uploads.
+
+    A failed render goes back in the queue and is scheduled again in this
+    process after ``retry_delay``; the receipt is only marked failed once
+    RECEIPT_MAX_ATTEMPTS renders have failed.
+    """
+    if not claim(receipt_id):
+        return
+    receipt = Receipt.objects.get(id=receipt_id)
+    try:
+        pdf = render_pdf(receipt.payload)
+        receipt.file.save(f"receipt_{receipt.order_id}.pdf", ContentFile(pdf), save=False)
+        receipt.status = Receipt.READY
+        receipt.error = ''
+    except Exception as e:
+        receipt.error = str(e)
+        if receipt.attempts >= settings.RECEIPT_MAX_ATTEMPTS:
+            logger.exception(f"Giving up on receipt {receipt_id} after {receipt.attempts} attempts")
+            receipt.status = Receipt.FAILED
+        else:
+            logger.warning(f"Rendering receipt {receipt_id} failed, will retry: {e}")
+            receipt.status = Receipt.PENDING
+            receipt.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(receipt.attempts))
+    receipt.save(update_fields=['file', 'status', 'error', 'next_attempt_at', 'updated_at'])
+    if receipt.status == Receipt.PENDING:
+        jobs.submit_later(retry_delay(receipt.attempts), process, receipt_id)
+
+
+def process_pending(limit=100):
+    """
+    Render up to ``limit`` due receipts in this process and return how many ran.
+
+    Receipts stuck in rendering longer than RECEIPT_STALE_AFTER seconds (their
+    worker died) are put back in the queue first. Retries whose backoff has
+    not passed yet are left for a later run.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.RECEIPT_STALE_AFTER)
+    Receipt.objects.filter(status=Receipt.RENDERING, updated_at__lt=stale_before).update(
+        status=Receipt.PENDING
+    )
+    processed = 0
+    pending = Receipt.objects.filter(
+        status=Receipt.PENDING, next_attempt_at__lte=now
+    ).order_by('next_attempt_at', 'id').values_list('id', flat=True)
+    for receipt_id in list(pending[:limit]):
+        process(receipt_id)
+        processed += 1
+    return processed
+
+
+def render_pdf(payload):
+    """Draw the receipt with ReportLab and return the PDF bytes."""
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+
+    # Company Name (Top-Left)
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(50, 780, "Smart Computers")
+    p.setFont("Helvetica", 10)
+    p.drawString(50, 765, "Your Trusted Tech Store")
+
+    # Receipt Header
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(250, 740, "Order Receipt")
+    p.line(50, 735, 550, 735)
+
+    # Receipt Details
+    p.setFont("Helvetica", 11)
+    p.drawString(50, 710, f"Date: {payload['date']}")
+    p.drawString(50, 690, f"Customer: {payload['customer_name']}")
+    p.drawString(50, 670, f"Destination: {payload['destination']}")
+    p.drawString(50, 650, f"M-Pesa Number: {payload['phone']}")
+
+    # Table Header for Order Details
+    p.setFont("Helvetica-Bold", 11)
+    p.drawString(50, 620, "Item")
+    p.drawString(300, 620, "Qty")
+    p.drawString(350, 620, "Price")
+    p.drawString(450, 620, "Total")
+    p.line(50, 615, 550, 615)
+
+    # Table Content (Order Items)
+    y = 595
+    p.setFont("Helvetica", 11)
+    for item in payload['items']:
+        p.drawString(50, y, item['name'][:30])
+        p.drawString(300, y, str(item['quantity']))
+        p.drawString(350, y, f"KES {item['price']:.2f}")
+        p.drawString(450, y, f"KES {item['total']:.2f}")
+        y -= 20
+        if y < 100:
+            p.showPage()
+            p.setFont("Helvetica", 11)
+            y = 780
+
+    # Totals Section
+    p.line(50, y, 550, y)
+    y -= 20
+    p.drawString(350, y, "Subtotal:")
+    p.drawString(450, y, f"KES {payload['subtotal']:.2f}")
+    y -= 20
+    p.drawString(350, y, "Discount (5%):")
+    p.drawString(450, y, f"-KES {payload['discount']:.2f}")
+    y -= 20
+    p.drawString(350, y, "Delivery Fee:")
+    p.drawString(450, y, f"KES {payload['delivery_fee']:.2f}")
+    y -= 20
+    p.line(350, y, 550, y)
+    y -= 20
+    p.setFont("Helvetica-Bold", 11)
+    p.drawString(350, y, "Total:")
+    p.drawString(450, y, f"KES {payload['total_price']:.2f}")
+
+    # Thank You Note
+    y -= 40
+    p.setFont("Helvetica-Oblique", 10)
+    p.drawString(50, y, "Thank you for shopping with Smart Computers, welcome again!")
+
+    # Footer
+    p.setFont("Helvetica", 9)
+    p.drawString(50, 30, "Contact us: support@smartcomputers.com | +254 797 469 560")
+
+    # Finalize PDF
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
@@ -0,0 +1,195 @@
+import datetime
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, Count, DateField, DecimalField, F, Sum, Value, When
+from django.db.models.functions import TruncDate, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+from store.models.report import ReportOrder, OrderItem, DailySales, ProductSales
+
+REVENUE = DecimalField(max_digits=14, decimal_places=2)
+
+
+def record_order(report_order, order_items):
+    """
+    Add a completed checkout to the daily and per-product rollups.
+
+    Call inside the checkout transaction. Missing rollup rows are inserted
+    empty first and then incremented with F() expressions, so concurrent
+    checkouts never lose an update and the statement count is independent of
+    the number of lines.
+    """
+    day = timezone.localdate(report_order.created_at)
+    DailySales.objects.bulk_create([DailySales(date=day)], ignore_conflicts=True)
+    DailySales.objects.filter(date=day).update(
+        orders=F('orders') + 1,
+        revenue=F('revenue') + Value(Decimal(report_order.total), output_field=REVENUE)
+    )
+
+    quantities, revenues = {}, {}
+    for item in order_items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        revenues[item.product_id] = revenues.get(item.product_id, 0) + Decimal(item.price) * item.quantity
+    if not quantities:
+        return
+    ProductSales.objects.bulk_create(
+        [ProductSales(product_id=product_id) for product_id in quantities],
+        ignore_conflicts=True
+    )
+    ProductSales.objects.filter(product_id__in=quantities).update(
+        quantity=F('quantity') + Case(
+            *[When(product_id=pid, then=Value(qty)) for pid, qty in quantities.items()],
+            default=Value(0)
+        ),
+        revenue=F('revenue') + Case(
+            *[When(product_id=pid, then=Value(rev, output_field=REVENUE)) for pid, rev in revenues.items()],
+            default=Value(Decimal(0), output_field=REVENUE),
+            output_field=REVENUE
+        )
+    )
+
+
+@transaction.atomic
+def rebuild():
+    """Recompute both rollup tables from the full order history."""
+    DailySales.objects.all().delete()
+    ProductSales.objects.all().delete()
+
+    days = ReportOrder.objects.filter(is_completed=True).annotate(
+        day=TruncDate('created_at')
+    ).values('day').annotate(count=Count('id'), amount=Sum('total')).order_by()
+    DailySales.objects.bulk_create(
+        [DailySales(date=row['day'], orders=row['count'], revenue=row['amount']) for row in days],
+        batch_size=1000
+    )
+
+    products = OrderItem.objects.filter(
+        order__is_completed=True,
+        product__isnull=False
+    ).values('product').annotate(
+        units=Sum('quantity'),
+        amount=Sum(F('price') * F('quantity'), output_field=REVENUE)
+    ).order_by()
+    ProductSales.objects.bulk_create(
+        [ProductSales(product_id=row['product'], quantity=row['units'], revenue=row['amount']) for row in products],
+        batch_size=1000
+    )
+    return DailySales.objects.count(), ProductSales.objects.count()
+
+
+def totals():
+    """All-time revenue and completed order count, read from the daily rollup."""
+    result = DailySales.objects.aggregate(revenue=Sum('revenue'), orders=Sum('orders'))
+    return result['revenue'] or 0, result['orders'] or 0
+
+
+def top_products(limit=5):
+    """Best sellers by units, shaped like the raw OrderItem aggregation the report used."""
+    rows = ProductSales.objects.filter(quantity__gt=0).order_by('-quantity', 'product__name').values(
+        'product__name',
+        total_quantity=F('quantity'),
+        total_revenue=F('revenue')
+    )
+    return list(rows[:limit] if limit else rows)
+
+
+GROUPINGS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def watermark():
+    """
+    ``(id, created_at)`` of the newest completed order, or None.
+
+    It moves whenever checkout records an order, so anything derived from the
+    report figures can be cached under it.
+    """
+    return ReportOrder.objects.filter(is_completed=True).order_by('-id').values_list('id', 'created_at').first()
+
+
+def parse_period(params):
+    """
+    Read ``start``, ``end`` (YYYY-MM-DD, inclusive) and ``group`` from query parameters.
+
+    Returns ``(start, end, group)`` with missing dates as None; raises
+    ValueError for malformed dates, an unknown grouping or an inverted range.
+    """
+    start = _parse_date(params.get('start'))
+    end = _parse_date(params.get('end'))
+    group = params.get('group') or 'day'
+    if group not in GROUPINGS:
+        raise ValueError(f"Unknown grouping '{group}'")
+    if start and end and start > end:
+        raise ValueError("Start date is after end date")
+    return start, end, group
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def period_bounds(start, end):
+    """
+    Convert inclusive local dates to a half-open ``[lower, upper)`` datetime range.
+
+    Either bound is None when the date is missing. The half-open upper bound
+    keeps the whole end day and stays index-friendly.
+    """
+    lower = _day_start(start) if start else None
+    upper = _day_start(end + datetime.timedelta(days=1)) if end else None
+    return lower, upper
+
+
+def summary(start=None, end=None, group='day', top=5):
+    """
+    Revenue, order count, top products and a revenue/orders time series.
+
+    Without a date range everything comes from the rollups. With one, the
+    completed orders in range are read through the partial
+    store_reportorder_completed_at index (created_at WHERE is_completed)
+    and bucketed in SQL with Trunc*, and the totals are summed from that
+    series rather than scanned again.
+    """
+    trunc = GROUPINGS[group]
+    if not start and not end:
+        series = list(DailySales.objects.annotate(period=trunc('date')).values('period').annotate(
+            orders=Sum('orders'), revenue=Sum('revenue')
+        ).order_by('period'))
+        total_revenue, total_orders = totals()
+        return {
+            'total_revenue': total_revenue,
+            'total_orders': total_orders,
+            'top_products': top_products(top),
+            'series': series,
+        }
+
+    lower, upper = period_bounds(start, end)
+    orders = ReportOrder.objects.filter(is_completed=True)
+    items = OrderItem.objects.filter(order__is_completed=True, product__isnull=False)
+    if lower:
+        orders = orders.filter(created_at__gte=lower)
+        items = items.filter(order__created_at__gte=lower)
+    if upper:
+        orders = orders.filter(created_at__lt=upper)
+        items = items.filter(order__created_at__lt=upper)
+
+    series = list(orders.annotate(period=trunc('created_at', output_field=DateField())).values('period').annotate(
+        orders=Count('id'), revenue=Sum('total')
+    ).order_by('period'))
+    products = items.values('product__name').annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum(F('price') * F('quantity'), output_field=REVENUE)
+    ).order_by('-total_quantity', 'product__name')
+    return {
+        'total_revenue': sum((row['revenue'] for row in series), Decimal(0)),
+        'total_orders': sum(row['orders'] for row in series),
+        'top_products': list(products[:top] if top else products),
+        'series': series,
+    }
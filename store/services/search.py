@@ -0,0 +1,101 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from store.models.product import Product
+
+FTS_TABLE = 'store_product_fts'
+# bm25 column weights for name, brand and description
+WEIGHTS = (10.0, 4.0, 1.0)
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+_fts_databases = {}
+
+
+def terms(query):
+    """Split free text into search terms, dropping FTS syntax and punctuation."""
+    return _TERM.findall((query or '').lower())[:8]
+
+
+def fts_available():
+    """Whether the migration-built FTS5 index exists in the current database."""
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts_databases:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_databases[name] = cursor.fetchone() is not None
+    return _fts_databases[name]
+
+
+def match_expression(words):
+    """
+    Build an FTS5 MATCH string: every word must appear, the last one as a prefix.
+
+    Words are quoted so user input is never parsed as FTS operators; the
+    trailing ``*`` turns the word still being typed into a prefix query. A
+    single letter is matched whole, as the prefix indexes start at two.
+    """
+    quoted = [f'"{word}"' for word in words]
+    if len(words[-1]) > 1:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _fts_ids(words, limit):
+    # Scoring every match of a very common word costs tens of milliseconds at
+    # 100k products, so only the newest SEARCH_CANDIDATES matches are scored.
+    sql = (
+        f"SELECT rowid FROM ("
+        f"SELECT rowid, bm25({FTS_TABLE}, {', '.join(str(w) for w in WEIGHTS)}) AS score "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s"
+        f") ORDER BY score LIMIT %s"
+    )
+    candidates = getattr(settings, 'SEARCH_CANDIDATES', 1000)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match_expression(words), max(candidates, limit), limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _like_filter(words):
+    condition = Q()
+    for word in words:
+        condition &= Q(name__icontains=word) | Q(brand__icontains=word) | Q(description__icontains=word)
+    return condition
+
+
+def matches(query):
+    """
+    A filter for products matching every word of ``query``: a subquery on the
+    FTS index where it exists, LIKE matching otherwise. ``query`` must contain
+    at least one term.
+    """
+    words = terms(query)
+    if not fts_available():
+        return _like_filter(words)
+    return Q(id__in=RawSQL(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match_expression(words)]
+    ))
+
+
+def search(query, limit=None):
+    """
+    Return up to ``limit`` products matching ``query`` ranked by relevance.
+
+    On SQLite the FTS5 index answers the query and bm25 ranks name matches
+    above brand and description matches, among the newest
+    SEARCH_CANDIDATES matches when a term is very common. Elsewhere every word must appear in
+    one of those fields (a LIKE scan) and results are ordered by name.
+    """
+    limit = limit or getattr(settings, 'SEARCH_RESULTS', 20)
+    words = terms(query)
+    if not words:
+        return []
+    if not fts_available():
+        return list(Product.objects.filter(_like_filter(words)).order_by('name')[:limit])
+    ids = _fts_ids(words, limit)
+    products = Product.objects.in_bulk(ids)
+    return [products[pid] for pid in ids if pid in products]
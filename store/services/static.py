@@ -0,0 +1,183 @@
+import gzip
+import mimetypes
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+
+try:
+    import brotli
+except ImportError:  # Optional; without it only gzip variants are written
+    brotli = None
+
+# Most preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Formats that are compressed already; another pass only costs CPU
+INCOMPRESSIBLE = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.ico', '.woff', '.woff2',
+    '.zip', '.gz', '.br', '.mp4', '.webm', '.pdf',
+}
+
+
+def _compress(encoding, content):
+    if encoding == 'gzip':
+        # A fixed mtime keeps the output identical between deploys
+        return gzip.compress(content, compresslevel=9, mtime=0)
+    return brotli.compress(content, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Content-hashes file names like ManifestStaticFilesStorage, then writes
+    a ``.gz`` (and with the brotli package a ``.br``) copy of every hashed
+    file next to it, so no request ever compresses on the fly.
+
+    A variant is only kept when it saves at least 5% of the file.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            self.compress(hashed_name)
+
+    def compress(self, name):
+        if os.path.splitext(name)[1].lower() in INCOMPRESSIBLE:
+            return
+        with self.open(name) as f:
+            content = f.read()
+        for encoding, suffix in ENCODINGS:
+            if encoding == 'br' and brotli is None:
+                continue
+            compressed = _compress(encoding, content)
+            if len(compressed) < len(content) * 0.95:
+                path = self.path(name + suffix)
+                with open(path, 'wb') as f:
+                    f.write(compressed)
+
+
+class Asset:
+    """One collected file and its precompressed variants, stat'ed once."""
+
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.modified_at = int(stat.st_mtime)
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.immutable = immutable
+        self.variants = {
+            encoding: (path + suffix, os.path.getsize(path + suffix))
+            for encoding, suffix in ENCODINGS
+            if os.path.exists(path + suffix)
+        }
+
+
+def scan(root):
+    """
+    Map every file under ``root`` (minus the compressed variants) to an Asset.
+
+    Files named in the storage manifest carry a content hash and are
+    immutable; anything else may change under the same name.
+    """
+    hashed = set(ManifestStaticFilesStorage(location=root).hashed_files.values())
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    assets = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            if any(name.endswith(suffix) and os.path.exists(path[:-len(suffix)]) for suffix in suffixes):
+                continue
+            assets[name] = Asset(path, name in hashed)
+    return assets
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def find(name):
+    """
+    The Asset for a STATIC_URL-relative name, or None.
+
+    STATIC_ROOT is scanned on first use and kept for the life of the
+    process: restart the server after collectstatic. Only names found in the
+    scan are served, so no request path ever reaches the filesystem.
+    """
+    root = str(settings.STATIC_ROOT)
+    index = _indexes.get(root)
+    if index is None:
+        with _lock:
+            index = _indexes.get(root)
+            if index is None:
+                index = _indexes[root] = scan(root) if os.path.isdir(root) else {}
+    return index.get(name)
+
+
+def accepts(header, encoding):
+    """Whether an Accept-Encoding header allows ``encoding`` (q=0 refuses it)."""
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding.strip().lower() not in (encoding, '*'):
+            continue
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def _not_modified(request, asset):
+    since = request.headers.get('If-Modified-Since')
+    if not since:
+        return False
+    try:
+        return int(parsedate_to_datetime(since).timestamp()) >= asset.modified_at
+    except (TypeError, ValueError):
+        return False
+
+
+def serve(request, asset):
+    """
+    Answer a GET or HEAD for ``asset`` with its best variant the client accepts.
+
+    The file goes out through FileResponse, so WSGI servers that provide
+    ``wsgi.file_wrapper`` send it with sendfile() rather than through Python.
+    """
+    if asset.immutable:
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = f'public, max-age={settings.STATIC_MAX_AGE}'
+    if _not_modified(request, asset):
+        response = HttpResponseNotModified()
+    else:
+        path, size, encoding = asset.path, asset.size, None
+        accept = request.headers.get('Accept-Encoding', '')
+        for candidate, (variant_path, variant_size) in asset.variants.items():
+            if accepts(accept, candidate):
+                path, size, encoding = variant_path, variant_size, candidate
+                break
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=asset.content_type)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=asset.content_type)
+            # The variant's file name is not the one the page asked for
+            response.headers.pop('Content-Disposition', None)
+        response['Content-Length'] = size
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['Cache-Control'] = cache_control
+    response['Last-Modified'] = asset.last_modified
+    if asset.variants:
+        response['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,113 @@
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.utils import timezone
+from store.models.product import Product
+from store.services import catalog, facets
+
+
+class InsufficientStock(Exception):
+    """Raised when a product no longer has enough units to cover a reservation."""
+
+    def __init__(self, product):
+        self.product = product
+        super().__init__(f"Insufficient stock for {product.name}")
+
+
+class _ShortStock(Exception):
+    pass
+
+
+def reserve_many(lines):
+    """
+    Take stock for every ``(product, amount)`` pair in one conditional UPDATE.
+
+    Each row is only decremented if it still covers its amount, so concurrent
+    reservations can never push a quantity below zero. If any row falls short
+    nothing is taken and InsufficientStock names the first short product. On
+    success the products' ``quantity`` attributes hold the new stock levels.
+    Call it inside ``transaction.atomic`` so a later failure releases the units.
+    """
+    if not lines:
+        return lines
+    covered = Q()
+    for product, amount in lines:
+        covered |= Q(id=product.id, quantity__gte=amount)
+    ids = [product.id for product, _ in lines]
+
+    try:
+        with transaction.atomic():
+            updated = Product.objects.filter(covered).update(
+                quantity=Case(
+                    *[When(id=product.id, then=F('quantity') - amount) for product, amount in lines],
+                    default=F('quantity'),
+                    output_field=PositiveIntegerField(),
+                ),
+                # Product pages show stock and are versioned by updated_at
+                updated_at=timezone.now(),
+            )
+            if updated != len(lines):
+                raise _ShortStock
+    except _ShortStock:
+        # The savepoint is rolled back, so these are the levels that fell short
+        levels = dict(Product.objects.filter(id__in=ids).values_list('id', 'quantity'))
+        for product, amount in lines:
+            if levels.get(product.id, 0) < amount:
+                raise InsufficientStock(product)
+        # Stock was released concurrently after the UPDATE; still a failed reservation
+        raise InsufficientStock(lines[0][0])
+
+    levels = dict(Product.objects.filter(id__in=ids).values_list('id', 'quantity'))
+    sold_out = set()
+    for product, _ in lines:
+        if not levels[product.id]:
+            # update() skips the save signals, so move sold-out products to their out-of-stock facet here
+            facets.adjust(facets.key_of(product), facets.facet_key(product.category_id, product.brand, product.price, 0))
+            sold_out.add(product.category_id)
+        product.quantity = levels[product.id]
+    if sold_out:
+        # Sell-outs change the in-stock filtered listings and their counts
+        transaction.on_commit(lambda: catalog.invalidate_products(*sold_out))
+    return lines
+
+
+def release(units):
+    """
+    Put units back in stock; ``units`` maps product ids to the count returned.
+
+    One UPDATE adds every product's total with F() expressions, however many
+    orders the units came from; products getting the same amount share a
+    branch of its CASE, which keeps the statement small. Products that were
+    sold out move back to their in-stock facet. Call it inside the
+    transaction that gives the units up, e.g. the one cancelling their orders.
+    """
+    by_amount = {}
+    for product_id, amount in units.items():
+        if amount:
+            by_amount.setdefault(amount, []).append(product_id)
+    ids = [product_id for product_ids in by_amount.values() for product_id in product_ids]
+    if not ids:
+        return
+    # Locked in id order so concurrent releases and reservations cannot deadlock
+    sold_out = list(
+        Product.objects.select_for_update().filter(id__in=ids, quantity=0).order_by('id')
+        .values_list('category_id', 'brand', 'price')
+    )
+    Product.objects.filter(id__in=ids).update(
+        quantity=Case(
+            *[When(id__in=product_ids, then=F('quantity') + amount) for amount, product_ids in by_amount.items()],
+            default=F('quantity'),
+            output_field=PositiveIntegerField(),
+        ),
+        updated_at=timezone.now(),
+    )
+    # update() skips the save signals, so move restocked products to their in-stock facets here
+    moves = {}
+    for category_id, brand, price in sold_out:
+        key = facets.facet_key(category_id, brand, price, 0)
+        moves[key] = moves.get(key, 0) + 1
+    for key, count in moves.items():
+        category_id, brand, price_band, _ = key
+        facets.adjust(key, (category_id, brand, price_band, True), count)
+    restocked = {category_id for category_id, _, _ in sold_out}
+    if restocked:
+        transaction.on_commit(lambda: catalog.invalidate_products(*restocked))
@@ -0,0 +1,61 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def cache():
+    """The THROTTLE_CACHE backend; it must be shared by every process, or each one grants its own burst."""
+    return caches[settings.THROTTLE_CACHE]
+
+
+def _key(action, scope, identity):
+    # Emails are free text; hash them into a cache-safe key
+    return f"throttle:{action}:{scope}:{hashlib.sha1(identity.encode()).hexdigest()}"
+
+
+def take(key, per_minute, burst, now=None):
+    """
+    Take one token from a token bucket kept in the throttle cache.
+
+    The bucket holds up to ``burst`` tokens and refills at ``per_minute``.
+    Returns 0 when a token was taken, otherwise the seconds until one will
+    be. A rejection only reads the cache. Buckets are read and written
+    without a lock, so concurrent requests can overshoot by a few tokens.
+    """
+    now = time.time() if now is None else now
+    rate = per_minute / 60
+    buckets = cache()
+    tokens, stamp = buckets.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - stamp) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    # An untouched bucket is full again after burst / rate seconds; let it expire then
+    buckets.set(key, (tokens - 1, now), math.ceil(burst / rate))
+    return 0
+
+
+def client_ip(request):
+    """The connecting address; put a proxy's real-IP handling in front of Django if there is one."""
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def check(request, action, email=None):
+    """
+    Charge one attempt at ``action`` to the client's IP and to the email.
+
+    Rates come from THROTTLE_RATES[action]. Returns 0 when the attempt may
+    go ahead, otherwise the whole seconds to wait. The IP is charged first,
+    so a flood from one address does not also drain its victims' buckets.
+    """
+    rates = getattr(settings, 'THROTTLE_RATES', {}).get(action, {})
+    identities = [('ip', client_ip(request)), ('email', (email or '').strip().lower())]
+    for scope, identity in identities:
+        if scope not in rates or not identity:
+            continue
+        wait = take(_key(action, scope, identity), *rates[scope])
+        if wait:
+            return math.ceil(wait)
+    return 0
@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from store.models.category import Category
+from store.models.product import Product
+from store.services import catalog, facets, images, jobs
+
+# Product fields that decide which FacetCount row it is counted in
+FACET_FIELDS = ('category_id', 'brand', 'price', 'quantity')
+_DEFERRED = object()
+
+
+@receiver(post_init, sender=Product)
+def remember_product_category(sender, instance, **kwargs):
+    """Keep the loaded category, image and facet so saves can tell what changed."""
+    instance._loaded_category_id = instance.__dict__.get('category_id')
+    instance._loaded_image = _image_name(instance.__dict__.get('image'))
+    values = [instance.__dict__.get(name, _DEFERRED) for name in FACET_FIELDS]
+    # Unknown when any of the fields was deferred by only()/defer()
+    instance._loaded_facet = None if _DEFERRED in values else facets.facet_key(*values)
+
+
+@receiver(post_save, sender=Product)
+def count_product_facets(sender, instance, created, **kwargs):
+    """Move the product between FacetCount rows; connected before the listing caches are invalidated."""
+    new = facets.key_of(instance)
+    if created:
+        facets.adjust(None, new)
+    elif instance._loaded_facet is None:
+        _recount_facets(instance)
+    else:
+        facets.adjust(instance._loaded_facet, new)
+    instance._loaded_facet = new
+
+
+@receiver(post_delete, sender=Product)
+def uncount_product_facets(sender, instance, **kwargs):
+    if instance._loaded_facet is None:
+        _recount_facets(instance)
+    else:
+        facets.adjust(instance._loaded_facet, None)
+
+
+def _recount_facets(instance):
+    """
+    Recount after a save or delete of a product loaded with deferred fields, whose old row is unknown.
+
+    Only its loaded and current categories are recounted, and their listings
+    are invalidated by invalidate_product_listing next. When the category
+    itself was deferred the old one is unknown too, so every category is
+    recounted and invalidated.
+    """
+    if instance._loaded_category_id is None:
+        facets.rebuild()
+        catalog.invalidate_products(*Category.objects.values_list('id', flat=True))
+    else:
+        facets.rebuild({instance._loaded_category_id, instance.category_id} - {None})
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_listing(sender, instance, signal, update_fields=None, **kwargs):
+    # A deleted product's deferred category can no longer be loaded; _recount_facets invalidated every listing
+    category_id = instance.category_id if signal is post_save or 'category_id' in instance.__dict__ else None
+    catalog.invalidate_products(instance._loaded_category_id, category_id)
+    if signal is post_save and update_fields is not None and 'updated_at' not in update_fields:
+        # Saves limited to some fields (deferred loads included) leave the page version behind
+        catalog.invalidate_product_pages(instance.pk)
+    instance._loaded_category_id = category_id
+
+
+@receiver(post_save, sender=Product)
+def generate_product_image_derivatives(sender, instance, created, **kwargs):
+    """Build thumbnails for a new upload in the background once the save commits."""
+    name = _image_name(instance.image)
+    if name and (created or name != instance._loaded_image):
+        transaction.on_commit(lambda: jobs.submit(images.generate, name))
+    instance._loaded_image = name
+
+
+def _image_name(image):
+    # Before first access the field holds the stored name, afterwards a FieldFile
+    return getattr(image, 'name', image) or None
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_listing(sender, instance, **kwargs):
+    catalog.invalidate_categories()
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS to each new SQLite connection, before it runs any query."""
+    if connection.vendor != 'sqlite':
+        return
+    # The raw connection keeps these out of query logs and request metrics
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,39 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+from store.services import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw'):
+    """
+    Render a product image as a <picture> with WebP and fallback srcsets.
+
+    Until the derivatives exist (they are queued on first use) this renders
+    the original upload as a plain lazy-loaded <img>.
+
+    Usage: {% responsive_image product.image product.name "(max-width: 600px) 50vw, 280px" %}
+    """
+    if not image:
+        return ''
+    derived = images.derivatives(image.name)
+    if not derived:
+        return format_html('<img src="{}" alt="{}" loading="lazy" decoding="async">', image.url, alt)
+    largest = derived['fallback'][-1][1]
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        images.srcset(derived['webp']), sizes,
+        default_storage.url(largest), images.srcset(derived['fallback']), sizes, alt
+    )
+
+
+@register.simple_tag
+def image_srcset(image, kind='webp'):
+    """The ``srcset`` value alone, for 'webp' or 'fallback' derivatives; empty until they exist."""
+    derived = images.derivatives(image.name) if image else None
+    return images.srcset(derived[kind]) if derived else ''
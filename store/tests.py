@@ -1,3 +1,1505 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import json
+import os
+import random
+import runpy
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache, caches
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.template import Context, Template
+from django.db import OperationalError, close_old_connections, connection
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.http import StreamingHttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from store.models.cart import CartLine
+from store.models.category import Category
+from store.models.customer import Customer
+from store.models.facet import FacetCount
+from store.models.order import Order
+from store.models.outbox import OutboundEmail
+from store.models.product import Product
+from store.models.receipt import Receipt
+from store.models.report import ReportOrder, ReportProduct, OrderItem, DailySales
+from store.benchmarks import runner, scenarios
+from store.benchmarks.scenarios import FLOOD_ADDRESS
+from store.benchmarks.seed import seed
+from store.services import catalog, exports, facets, images, imports, jobs, metrics, orders, outbox, receipts, sales, search, throttle
+from PIL import Image
+from store.services.orders import place_order
+from store.services.stock import InsufficientStock, reserve_many
+
+
+# Login buckets and listing versions go in the per-process cache the tests clear, not the shared ones on disk
+_shared_caches = override_settings(THROTTLE_CACHE='default', CATALOG_VERSION_CACHE='default', CART_CACHE='default')
+
+
+def setUpModule():
+    _shared_caches.enable()
+
+
+def tearDownModule():
+    _shared_caches.disable()
+
+
+# PBKDF2 is deliberately slow, so hash the shared test password only once
+PASSWORD_HASH = make_password('secret123')
+
+
+def make_customer(email='buyer@example.com'):
+    return Customer.objects.create(
+        first_name='Test', last_name='Buyer', phone='0712345678',
+        email=email, password=PASSWORD_HASH
+    )
+
+
+def make_product(category, name='Laptop', price=1000, quantity=10):
+    return Product.objects.create(
+        name=name, price=price, category=category, quantity=quantity, image='uploads/products/x.jpg'
+    )
+
+
+def cart_line(product, quantity):
+    return {'product': product, 'quantity': quantity, 'total': product.price * quantity}
+
+
+@override_settings(CATALOG_PAGE_SIZE=3, CATALOG_MAX_PAGE_SIZE=5)
+class CatalogPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.laptops = Category.objects.create(name='Laptops')
+        self.phones = Category.objects.create(name='Phones')
+        self.products = [
+            make_product(self.laptops if i % 3 else self.phones, f'Item {i}', price=100 + i) for i in range(11)
+        ]
+
+    def walk(self, category_id=None, page_size=None):
+        pages, after = [], None
+        while True:
+            page = catalog.get_page(category_id, after, page_size)
+            pages.append([product.id for product in page['products']])
+            after = page['next_cursor']
+            if after is None:
+                return pages
+
+    def test_cursors_walk_every_product_once(self):
+        pages = self.walk()
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 2])
+        self.assertEqual(sum(pages, []), [product.id for product in self.products])
+
+        laptops = sum(self.walk(self.laptops.id, page_size=2), [])
+        self.assertEqual(laptops, [product.id for product in self.products if product.category_id == self.laptops.id])
+
+    def test_page_size_is_clamped_to_the_maximum(self):
+        self.assertEqual(len(catalog.get_page(page_size=500)['products']), 5)
+        self.assertEqual(len(catalog.get_page(page_size='junk')['products']), 3)
+        self.assertEqual([len(page) for page in self.walk(page_size=500)], [5, 5, 1])
+
+    def test_pagination_links_keep_the_page_size(self):
+        response = self.client.get(reverse('index'), {'category': self.laptops.id, 'page_size': 500})
+        self.assertEqual(len(response.context['products']), 5)
+        self.assertEqual(response.context['listing_query'], f'category={self.laptops.id}&page_size=5')
+        self.assertContains(response, f'page_size=5&after={response.context["next_cursor"]}')
+        self.assertContains(response, '<input type="hidden" name="page_size" value="5">')
+
+    def test_product_saves_and_deletes_refresh_cached_pages(self):
+        laptop = self.products[1]
+        versions = catalog.get_version(self.laptops.id), catalog.get_version(catalog.ALL_SCOPE)
+        phone_version = catalog.get_version(self.phones.id)
+        self.assertEqual(catalog.get_page(self.laptops.id)['products'][0].name, 'Item 1')
+
+        laptop.name = 'Renamed'
+        laptop.save()
+        self.assertNotEqual((catalog.get_version(self.laptops.id), catalog.get_version(catalog.ALL_SCOPE)), versions)
+        self.assertEqual(catalog.get_version(self.phones.id), phone_version)
+        self.assertEqual(catalog.get_page(self.laptops.id)['products'][0].name, 'Renamed')
+        self.assertEqual(catalog.get_page()['products'][1].name, 'Renamed')
+
+        laptop_id = laptop.id
+        laptop.delete()
+        self.assertNotIn(laptop_id, sum(self.walk(self.laptops.id), []))
+        self.assertNotIn(laptop_id, sum(self.walk(), []))
+
+
+class PlaceOrderTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Laptops')
+        self.customer = make_customer()
+
+    def test_failed_line_rolls_back_whole_checkout(self):
+        first = make_product(self.category, 'First', quantity=5)
+        second = make_product(self.category, 'Second', quantity=1)
+        lines = [cart_line(first, 2), cart_line(second, 3)]
+
+        with self.assertRaises(InsufficientStock) as ctx:
+            place_order(self.customer, lines, 'Nairobi', '0712345678', 5000)
+
+        self.assertEqual(ctx.exception.product.id, second.id)
+        first.refresh_from_db()
+        self.assertEqual(first.quantity, 5)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(ReportOrder.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_successful_checkout_decrements_stock(self):
+        product = make_product(self.category, quantity=5)
+        place_order(self.customer, [cart_line(product, 2)], 'Nairobi', '0712345678', 2000)
+
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 3)
+        self.assertEqual(Order.objects.get().quantity, 2)
+        self.assertEqual(OrderItem.objects.get().quantity, 2)
+
+
+class BulkOrderWriterTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Accessories')
+        self.customer = make_customer()
+
+    def make_cart(self, lines, prefix='Item'):
+        products = [make_product(self.category, f'{prefix} {i}', price=100 + i, quantity=5) for i in range(lines)]
+        return [cart_line(product, 2) for product in products]
+
+    def test_query_count_is_flat_for_a_50_line_cart(self):
+        warmup = self.make_cart(1, 'Warmup')
+        with CaptureQueriesContext(connection) as single:
+            place_order(self.customer, warmup, 'Nairobi', '0712345678', 300)
+
+        cart = self.make_cart(50)
+        with self.assertNumQueries(len(single)):
+            place_order(self.customer, cart, 'Nairobi', '0712345678', 10000)
+
+        self.assertEqual(Order.objects.count(), 51)
+        self.assertEqual(OrderItem.objects.count(), 51)
+        self.assertEqual(ReportProduct.objects.count(), 51)
+        self.assertTrue(all(q == 3 for q in Product.objects.values_list('quantity', flat=True)))
+
+    def test_existing_report_products_are_updated_in_place(self):
+        cart = self.make_cart(3)
+        place_order(self.customer, cart, 'Nairobi', '0712345678', 1000)
+        place_order(self.customer, cart, 'Nairobi', '0712345678', 1000)
+
+        self.assertEqual(ReportProduct.objects.count(), 3)
+        self.assertEqual(set(ReportProduct.objects.values_list('stock', flat=True)), {1})
+        self.assertEqual(OrderItem.objects.filter(product__isnull=True).count(), 0)
+
+
+class SalesHistoryMixin:
+    """Four checkouts over forty days, shared by the sales report, rollup and export tests."""
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name='Rollups')
+        self.customer = make_customer()
+        self.products = [make_product(category, f'Rollup {i}', price=999 + i, quantity=100) for i in range(4)]
+
+    def checkout_on(self, day, lines):
+        cart = [cart_line(self.products[index], qty) for index, qty in lines]
+        subtotal = sum(line['total'] for line in cart)
+        when = timezone.make_aware(datetime.datetime.combine(day, datetime.time(23, 30)))
+        with mock.patch('django.utils.timezone.now', return_value=when):
+            place_order(self.customer, cart, 'Nairobi', '0712345678', subtotal - subtotal * 0.05 + 100)
+
+    def place_history(self):
+        today = datetime.date(2025, 3, 10)
+        self.checkout_on(today, [(0, 1), (1, 3)])
+        self.checkout_on(today, [(1, 1)])
+        self.checkout_on(today - datetime.timedelta(days=1), [(2, 2), (0, 1), (3, 7)])
+        self.checkout_on(today - datetime.timedelta(days=40), [(3, 1)])
+
+
+class SalesRollupTests(SalesHistoryMixin, TestCase):
+    def raw_aggregates(self):
+        orders = ReportOrder.objects.filter(is_completed=True)
+        daily = {
+            row['day']: (row['count'], row['amount'])
+            for row in orders.annotate(day=TruncDate('created_at')).values('day').annotate(
+                count=Count('id'), amount=Sum('total')
+            )
+        }
+        products = list(OrderItem.objects.filter(order__is_completed=True, product__isnull=False).values(
+            'product__name'
+        ).annotate(
+            total_quantity=Sum('quantity'),
+            total_revenue=Sum(F('price') * F('quantity'), output_field=DecimalField())
+        ).order_by('-total_quantity', 'product__name'))
+        return orders.aggregate(total=Sum('total'))['total'], orders.count(), daily, products
+
+    def rollup_aggregates(self):
+        revenue, count = sales.totals()
+        daily = {row.date: (row.orders, row.revenue) for row in DailySales.objects.all()}
+        return revenue, count, daily, sales.top_products(limit=None)
+
+    def test_incremental_rollups_match_raw_aggregation(self):
+        self.place_history()
+        self.assertEqual(self.rollup_aggregates(), self.raw_aggregates())
+        self.assertEqual(DailySales.objects.count(), 3)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.place_history()
+        incremental = self.rollup_aggregates()
+        call_command('rebuild_sales_rollups', stdout=io.StringIO())
+        self.assertEqual(self.rollup_aggregates(), incremental)
+
+    def test_report_view_reads_rollups(self):
+        self.place_history()
+        revenue, count, _, products = self.raw_aggregates()
+        response = self.client.get(reverse('sales_report'))
+        self.assertEqual(response.context['total_revenue'], revenue)
+        self.assertEqual(response.context['total_orders'], count)
+        self.assertEqual(list(response.context['top_products']), products[:5])
+
+
+class SalesReportPeriodTests(SalesHistoryMixin, TestCase):
+    def test_date_range_series_and_totals(self):
+        self.place_history()
+        response = self.client.get(reverse('sales_report'), {'start': '2025-03-09', 'end': '2025-03-10'})
+
+        series = response.context['series']
+        self.assertEqual([row['period'] for row in series], [datetime.date(2025, 3, 9), datetime.date(2025, 3, 10)])
+        self.assertEqual([row['orders'] for row in series], [1, 2])
+        in_range = ReportOrder.objects.filter(created_at__date__gte=datetime.date(2025, 3, 9))
+        self.assertEqual(response.context['total_revenue'], in_range.aggregate(total=Sum('total'))['total'])
+        self.assertEqual(response.context['top_products'][0]['product__name'], 'Rollup 3')
+
+    def test_month_grouping_over_all_time(self):
+        self.place_history()
+        response = self.client.get(reverse('sales_report'), {'group': 'month'})
+        periods = [(row['period'], row['orders']) for row in response.context['series']]
+        self.assertEqual(periods, [(datetime.date(2025, 1, 1), 1), (datetime.date(2025, 3, 1), 3)])
+
+    def test_invalid_period_is_reported(self):
+        response = self.client.get(reverse('sales_report'), {'start': '2025-03-10', 'end': '2025-03-01'})
+        self.assertIn('error', response.context)
+        response = self.client.get(reverse('sales_report_pdf'), {'group': 'year'})
+        self.assertEqual(response.status_code, 400)
+
+    @skipUnless(connection.vendor == 'sqlite', "EXPLAIN output checked is SQLite's")
+    def test_range_scan_uses_completed_orders_index(self):
+        start = timezone.make_aware(datetime.datetime(2025, 3, 3))
+        plan = ReportOrder.objects.filter(
+            is_completed=True, created_at__gte=start, created_at__lt=start + datetime.timedelta(days=7)
+        ).explain()
+        self.assertIn('USING INDEX store_reportorder_completed_at', plan)
+
+
+class SalesReportPdfCacheTests(SalesHistoryMixin, TestCase):
+    def test_report_pdf_is_cached_until_an_order_completes(self):
+        cache.clear()
+        self.place_history()
+        url = reverse('sales_report_pdf')
+        with mock.patch('store.views.report.render_report_pdf', return_value=b'%PDF-1.4 report') as render_pdf:
+            first = self.client.get(url, {'group': 'week'})
+            self.assertEqual(first.content, b'%PDF-1.4 report')
+            self.assertEqual(self.client.get(url, {'group': 'week'}, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+            self.assertEqual(self.client.get(url, {'group': 'week'}).content, b'%PDF-1.4 report')
+            self.assertEqual(render_pdf.call_count, 1)
+
+            self.assertNotEqual(self.client.get(url, {'group': 'month'})['ETag'], first['ETag'])
+            self.assertEqual(render_pdf.call_count, 2)
+
+            self.checkout_on(datetime.date(2025, 3, 11), [(0, 1)])
+            fresh = self.client.get(url, {'group': 'week'}, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(fresh.status_code, 200)
+            self.assertEqual(render_pdf.call_count, 3)
+
+
+class SalesExportTests(SalesHistoryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user('staff', password='secret123', is_staff=True)
+
+    def export(self, fmt, **params):
+        self.client.force_login(self.staff)
+        return self.client.get(reverse(f'sales_export_{fmt}'), params)
+
+    def test_csv_streams_header_and_rows(self):
+        self.place_history()
+        response = self.export('csv')
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('smart_computers_orders.csv', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(','), [name for name, _ in exports.DATASETS['orders'][2]])
+        self.assertEqual(len(lines) - 1, Order.objects.count())
+
+    def test_ndjson_streams_one_object_per_line(self):
+        self.place_history()
+        response = self.export('ndjson', dataset='sales')
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), OrderItem.objects.filter(order__is_completed=True).count())
+        self.assertEqual(list(rows[0]), [name for name, _ in exports.DATASETS['sales'][2]])
+
+    def test_date_range_limits_rows(self):
+        self.place_history()
+        response = self.export('ndjson', start='2025-03-09', end='2025-03-09')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(row['date_ordered'].startswith('2025-03-09') for row in rows))
+
+    def test_bad_requests(self):
+        self.assertEqual(self.export('csv', dataset='customers').status_code, 400)
+        self.assertEqual(self.export('csv', start='09/03/2025').status_code, 400)
+
+    def test_export_is_staff_only(self):
+        for fmt in ('csv', 'ndjson'):
+            response = self.client.get(reverse(f'sales_export_{fmt}'))
+            self.assertEqual(response.status_code, 302)
+            self.assertIn(reverse('admin:login'), response['Location'])
+        self.client.force_login(User.objects.create_user('shopper', password='secret123'))
+        self.assertEqual(self.client.get(reverse('sales_export_csv')).status_code, 302)
+
+
+class CartStorageTests(TestCase):
+    BACKENDS = [
+        'store.services.cart.SessionCartStore',
+        'store.services.cart.CacheCartStore',
+        'store.services.cart.SignedCookieCartStore',
+    ]
+
+    def setUp(self):
+        category = Category.objects.create(name='Cart')
+        self.first = make_product(category, 'First', price=500)
+        self.second = make_product(category, 'Second', price=250)
+
+    def cart_quantities(self):
+        response = self.client.get(reverse('cart'))
+        return {item['product'].id: item['quantity'] for item in response.context['cart_items']}, response.context['total_price']
+
+    def test_cart_mutations_round_trip_on_every_backend(self):
+        for backend in self.BACKENDS:
+            with self.subTest(backend=backend), override_settings(CART_STORAGE=backend):
+                self.client = self.client_class()
+                self.client.post(reverse('add_to_cart'), {'product': self.first.id})
+                self.client.post(reverse('add_to_cart'), {'product': self.first.id})
+                self.client.post(reverse('add_to_cart'), {'product': self.second.id, 'quantity': 3})
+                self.client.post(reverse('add_to_cart'), {'product': 'not-a-product'})
+                self.assertEqual(self.cart_quantities(), ({self.first.id: 2, self.second.id: 3}, 1750))
+
+                self.client.post(reverse('decrease_cart_item'), {'product': self.first.id})
+                self.client.post(reverse('remove_from_cart'), {'product': self.second.id})
+                self.assertEqual(self.cart_quantities(), ({self.first.id: 1}, 500))
+
+    @override_settings(CART_STORAGE='store.services.cart.CacheCartStore')
+    def test_cached_carts_are_shared_between_processes(self):
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        shared = {**settings.CACHES['cart'], 'LOCATION': location.name}
+        with override_settings(CACHES={**settings.CACHES, 'cart': shared}, CART_CACHE='cart'):
+            self.client.post(reverse('add_to_cart'), {'product': self.first.id, 'quantity': 2})
+            token = self.client.cookies['cart_id'].value
+            self.assertIsNone(cache.get(f'cart:anonymous:{token}'))
+            # Another worker process opens the same directory and finds the cart
+            other = caches.create_connection('cart')
+            self.assertEqual(other.get(f'cart:anonymous:{token}'), {str(self.first.id): 2})
+            self.assertEqual(self.cart_quantities(), ({self.first.id: 2}, 1000))
+
+    @override_settings(CART_STORAGE='store.services.cart.SignedCookieCartStore')
+    def test_signed_cookie_add_to_cart_touches_no_database(self):
+        with self.assertNumQueries(0):
+            self.client.post(reverse('add_to_cart'), {'product': self.first.id})
+        self.assertIn('cart', self.client.cookies)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+    @override_settings(CART_STORAGE='store.services.cart.SignedCookieCartStore')
+    def test_tampered_cart_cookie_is_ignored(self):
+        self.client.post(reverse('add_to_cart'), {'product': self.first.id})
+        self.client.cookies['cart'] = self.client.cookies['cart'].value[:-2] + 'xx'
+        self.assertEqual(self.cart_quantities(), ({}, 0))
+
+
+class PersistentCartTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Saved')
+        self.first = make_product(category, 'First', price=500)
+        self.second = make_product(category, 'Second', price=250)
+        self.customer = make_customer()
+
+    def login(self, client=None):
+        client = client or self.client
+        return client.post(reverse('login'), {'email': self.customer.email, 'password': 'secret123'})
+
+    def saved_lines(self):
+        return dict(CartLine.objects.filter(customer=self.customer).values_list('product_id', 'quantity'))
+
+    def test_login_merges_anonymous_cart_into_saved_cart(self):
+        CartLine.objects.create(customer=self.customer, product=self.first, quantity=1)
+        self.client.post(reverse('add_to_cart'), {'product': self.first.id, 'quantity': 2})
+        self.client.post(reverse('add_to_cart'), {'product': self.second.id})
+
+        self.login()
+
+        self.assertEqual(self.saved_lines(), {self.first.id: 3, self.second.id: 1})
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.context['total_price'], 1750)
+        # The anonymous cart was emptied rather than left behind
+        self.client.get(reverse('logout'))
+        self.assertEqual(self.client.get(reverse('cart')).context['cart_items'], [])
+
+    def test_saved_cart_outlives_the_session(self):
+        self.login()
+        self.client.post(reverse('add_to_cart'), {'product': self.second.id, 'quantity': 2})
+        self.client.post(reverse('decrease_cart_item'), {'product': self.second.id})
+        self.client.post(reverse('add_to_cart'), {'product': 999999})
+        self.client.get(reverse('logout'))
+
+        other = self.client_class()
+        self.login(other)
+        response = other.get(reverse('cart'))
+        self.assertEqual(
+            [(item['product'].id, item['quantity']) for item in response.context['cart_items']],
+            [(self.second.id, 1)]
+        )
+
+    def test_cart_page_reads_lines_and_products_in_one_query(self):
+        CartLine.objects.create(customer=self.customer, product=self.first, quantity=1)
+        CartLine.objects.create(customer=self.customer, product=self.second, quantity=2)
+        self.login()
+        # One query loads the session, one loads the cart joined to its products
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(response.context['total_price'], 1000)
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_requests_are_recorded_per_url_name(self):
+        category = Category.objects.create(name='Metered')
+        product = make_product(category)
+        self.client.post(reverse('add_to_cart'), {'product': product.id})
+        self.client.get(reverse('cart'))
+        response = self.client.get(reverse('cart'))
+
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries"$')
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('store_request_duration_seconds_count{view="cart"} 2', text)
+        self.assertIn('store_db_queries_bucket{view="cart",le="1"} 2', text)
+        self.assertIn('store_db_queries_sum{view="cart"} 2', text)
+        self.assertIn('store_request_duration_seconds_count{view="add_to_cart"} 1', text)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled_metrics_leave_no_trace(self):
+        response = self.client.get(reverse('cart'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        self.assertEqual(metrics.render().count('_count'), 0)
+
+
+@skipUnless(connection.vendor == 'sqlite', "FTS5 index is SQLite only")
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Computers')
+        self.laptop = make_product(category, 'Dell Latitude Laptop')
+        self.bag = Product.objects.create(
+            name='Carry Bag', brand='Targus', category=category, image='uploads/products/x.jpg',
+            description='Padded sleeve that fits any laptop up to 15 inches'
+        )
+        self.mouse = Product.objects.create(name='Wireless Mouse', brand='Logitech', category=category, image='x.jpg')
+
+    def names(self, query):
+        return [product.name for product in search.search(query)]
+
+    def test_prefix_queries_rank_name_matches_first(self):
+        self.assertEqual(self.names('lap'), ['Dell Latitude Laptop', 'Carry Bag'])
+        self.assertEqual(self.names('dell lat'), ['Dell Latitude Laptop'])
+        self.assertEqual(self.names('logi'), ['Wireless Mouse'])
+        self.assertEqual(self.names('printer'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.mouse.name = 'Wireless Keyboard'
+        self.mouse.save()
+        self.bag.delete()
+        self.assertEqual(self.names('keyb'), ['Wireless Keyboard'])
+        self.assertEqual(self.names('mouse'), [])
+        self.assertEqual(self.names('sleeve'), [])
+
+    def test_operator_characters_are_treated_as_text(self):
+        for query in ['"lap', 'lap*', 'NOT lap', 'lap OR (', '-', '']:
+            with self.subTest(query=query):
+                search.search(query)
+        self.assertEqual(self.names('NEAR(laptop'), [])
+
+    def test_typeahead_json_and_admin_filter(self):
+        response = self.client.get(reverse('search'), {'q': 'wire', 'format': 'json'})
+        self.assertEqual(
+            response.json()['results'],
+            [{'id': self.mouse.id, 'name': 'Wireless Mouse', 'brand': 'Logitech', 'price': 0,
+              'url': reverse('product_display', args=[self.mouse.id])}]
+        )
+        self.assertEqual(
+            set(Product.objects.filter(search.matches('lap')).values_list('name', flat=True)),
+            {'Dell Latitude Laptop', 'Carry Bag'}
+        )
+
+
+class ProductImageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, BACKGROUND_WORKERS=0, IMAGE_WIDTHS=(320, 640))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+    def upload(self, name, size, color='red'):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'JPEG')
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_derivatives_are_resized_and_regenerated_only_on_change(self):
+        name = self.upload('uploads/products/laptop.jpg', (1000, 500))
+        derived = images.generate(name)
+        self.assertEqual([width for width, _ in derived['webp']], [320, 640])
+        with default_storage.open(derived['webp'][0][1]) as f:
+            self.assertEqual(Image.open(f).size, (320, 160))
+        with default_storage.open(derived['fallback'][1][1]) as f:
+            self.assertEqual(Image.open(f).format, 'JPEG')
+
+        written = default_storage.get_modified_time(derived['webp'][0][1])
+        self.assertEqual(images.generate(name), derived)
+        self.assertEqual(default_storage.get_modified_time(derived['webp'][0][1]), written)
+
+        # Replacing the source (new size here) gives new files and removes the old ones
+        default_storage.delete(name)
+        self.upload(name, (400, 400), 'blue')
+        replaced = images.generate(name)
+        self.assertEqual([width for width, _ in replaced['webp']], [320])
+        self.assertFalse(default_storage.exists(derived['webp'][0][1]))
+        self.assertEqual(len(default_storage.listdir(images.derived_dir(name))[1]), 2)
+
+    def test_small_sources_are_never_upscaled(self):
+        derived = images.generate(self.upload('uploads/products/icon.jpg', (200, 100)))
+        self.assertEqual([width for width, _ in derived['fallback']], [200])
+
+    def test_template_tag_emits_srcset_and_falls_back_to_the_original(self):
+        category = Category.objects.create(name='Imaged')
+        product = make_product(category)
+        template = Template('{% load product_images %}{% responsive_image product.image product.name "50vw" %}')
+
+        html = template.render(Context({'product': product}))
+        self.assertEqual(html, f'<img src="{product.image.url}" alt="Laptop" loading="lazy" decoding="async">')
+
+        product.image = self.upload('uploads/products/real.jpg', (800, 600))
+        product.save()
+        html = template.render(Context({'product': product}))
+        self.assertIn('<source type="image/webp" srcset="/media/uploads/products/real_derived/', html)
+        self.assertRegex(html, r'-320w\.webp 320w, \S+-640w\.webp 640w" sizes="50vw">')
+        self.assertRegex(html, r'<img src="\S+-640w\.jpg" srcset="\S+-320w\.jpg 320w, \S+-640w\.jpg 640w"')
+
+
+    def test_generated_derivatives_replace_the_cached_product_page(self):
+        product = make_product(Category.objects.create(name='Imaged'))
+        product.image = self.upload('uploads/products/late.jpg', (800, 600))
+        product.save()
+        url = reverse('product_display', args=[product.id])
+        # No worker picks the job up yet, so the page goes out with the original
+        with mock.patch('store.services.images.jobs.submit'):
+            first = self.client.get(url)
+        self.assertNotContains(first, 'srcset')
+
+        images.generate(product.image.name)
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertContains(fresh, 'late_derived/')
+
+class PageCachingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = make_product(Category.objects.create(name='Cached'), quantity=5)
+        self.url = reverse('product_display', args=[self.product.id])
+
+    def test_repeat_product_view_is_a_304_from_one_lookup(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertIn('Last-Modified', first)
+
+        # Only the product's updated_at is read
+        with self.assertNumQueries(1):
+            repeat = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat['ETag'], first['ETag'])
+
+        # A cache hit still renders, with no query past that lookup
+        with self.assertNumQueries(1):
+            self.assertContains(self.client.get(self.url), '5 units available')
+
+    def test_writes_from_another_process_change_the_page(self):
+        etag = self.client.get(self.url)['ETag']
+        # Another worker's write reaches this one only through the database
+        Product.objects.filter(id=self.product.id).update(price=1700, updated_at=timezone.now())
+        fresh = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(fresh, 'KES 1700')
+
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        shared = {**settings.CACHES['catalog'], 'LOCATION': location.name}
+        with override_settings(CACHES={**settings.CACHES, 'catalog': shared}, CATALOG_VERSION_CACHE='catalog'):
+            version = catalog.get_version(catalog.ALL_SCOPE)
+            # Another process opens the same directory and moves the listing on
+            caches.create_connection('catalog').incr(f'catalog:version:{catalog.ALL_SCOPE}')
+            self.assertEqual(catalog.get_version(catalog.ALL_SCOPE), version + 1)
+
+    def test_saves_and_stock_changes_invalidate_the_product_page(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.product.price = 1500
+        self.product.save()
+        saved = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(saved, 'KES 1500')
+        self.assertNotEqual(saved['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(make_customer(), [cart_line(self.product, 2)], 'Nairobi', '0712345678', 3000)
+        bought = self.client.get(self.url, HTTP_IF_NONE_MATCH=saved['ETag'])
+        self.assertContains(bought, '3 units available')
+
+        self.product.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_rotated_csrf_cookie_gets_a_fresh_page(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'rotated-at-login'
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_homepage_is_rendered_once_and_revalidated(self):
+        first = self.client.get(reverse('homepage'))
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            repeat = self.client.get(reverse('homepage'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(
+            self.client.get(reverse('homepage'), HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304
+        )
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Async')
+        self.first = make_product(category, 'First', price=500)
+        self.second = make_product(category, 'Second', price=250)
+        self.customer = make_customer()
+
+    async def cart_state(self, url_name='async_cart'):
+        response = await self.async_client.get(reverse(url_name))
+        return {item['product'].id: item['quantity'] for item in response.context['cart_items']}, response.context['total_price']
+
+    async def test_async_cart_mutations_match_the_sync_views(self):
+        for logged_in in (False, True):
+            with self.subTest(logged_in=logged_in):
+                self.async_client = self.async_client_class()
+                if logged_in:
+                    await self.async_client.post(reverse('login'), {'email': self.customer.email, 'password': 'secret123'})
+                await self.async_client.post(reverse('async_add_to_cart'), {'product': self.first.id, 'quantity': 2})
+                await self.async_client.post(reverse('async_add_to_cart'), {'product': self.second.id})
+                await self.async_client.post(reverse('async_add_to_cart'), {'product': 999999})
+                await self.async_client.post(reverse('async_decrease_cart_item'), {'product': self.first.id})
+                self.assertEqual(await self.cart_state(), ({self.first.id: 1, self.second.id: 1}, 750))
+                # Both variants read the same stored cart
+                self.assertEqual(await self.cart_state('cart'), await self.cart_state())
+                await self.async_client.post(reverse('async_remove_from_cart'), {'product': self.second.id})
+                self.assertEqual(await self.cart_state(), ({self.first.id: 1}, 500))
+        self.assertEqual(await CartLine.objects.filter(customer=self.customer).acount(), 1)
+
+    async def test_async_listing_and_product_page(self):
+        response = await self.async_client.get(reverse('async_index'))
+        self.assertEqual([p.id for p in response.context['products']], [self.first.id, self.second.id])
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+        url = reverse('async_product_display', args=[self.first.id])
+        page = await self.async_client.get(url)
+        self.assertContains(page, 'Price: KES 500')
+        self.assertEqual((await self.async_client.get(url, headers={'if-none-match': page['ETag']})).status_code, 304)
+        self.assertEqual((await self.async_client.get(reverse('async_product_display', args=[999999]))).status_code, 404)
+
+
+@skipUnless(connection.vendor == 'sqlite', "asserts on SQLite's EXPLAIN QUERY PLAN output")
+class IndexPlanTests(TestCase):
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn(f'SCAN {queryset.model._meta.db_table}', plan)
+        # The ordering comes from the index too, not a sort
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_hot_queries_use_their_indexes(self):
+        self.assertIn('USING INDEX sqlite_autoindex_store_customer', Customer.objects.filter(email='a@example.com').explain())
+        self.assertUsesIndex(Order.objects.filter(customer=1).order_by('-date_ordered', '-id'), 'store_order_customer_date')
+        self.assertUsesIndex(Order.objects.filter(status='Pending').order_by('-date_ordered'), 'store_order_status_date')
+        self.assertUsesIndex(Product.objects.filter(category=1).order_by('name'), 'store_product_category_name')
+
+    def test_signup_race_on_the_same_email_is_reported_not_raised(self):
+        make_customer('taken@example.com')
+        # The other request inserted between this one's exists() check and its save
+        with mock.patch('django.db.models.query.QuerySet.exists', return_value=False):
+            response = self.client.post(reverse('signup'), {
+                'firstname': 'A', 'lastname': 'B', 'phone': '0712345678',
+                'email': 'taken@example.com', 'password': 'secret123',
+            })
+        self.assertContains(response, 'Email Address Already Registered')
+        self.assertEqual(Customer.objects.filter(email='taken@example.com').count(), 1)
+
+
+@override_settings(PRICE_BANDS=(1000, 5000))
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.laptops = Category.objects.create(name='Laptops')
+        self.phones = Category.objects.create(name='Phones')
+
+    def add(self, brand, price, quantity=5, category=None):
+        return Product.objects.create(
+            name=f'{brand} {price}', brand=brand, price=price, quantity=quantity,
+            category=category or self.laptops, image='uploads/products/x.jpg'
+        )
+
+    def counts(self):
+        return {
+            (row.category_id, row.brand, row.price_band, row.in_stock): row.products
+            for row in FacetCount.objects.filter(products__gt=0)
+        }
+
+    def assertCountsMatchRebuild(self):
+        incremental = self.counts()
+        facets.rebuild()
+        self.assertEqual(incremental, self.counts())
+
+    def test_saves_deletes_and_sell_outs_keep_counts_current(self):
+        dell = self.add('Dell', 800)
+        hp = self.add('HP', 3000, quantity=1)
+        self.add('Dell', 9000, category=self.phones)
+        self.assertEqual(self.counts()[(self.laptops.id, 'Dell', 0, True)], 1)
+
+        dell.price, dell.brand = 6000, 'Lenovo'
+        dell.save()
+        self.assertCountsMatchRebuild()
+
+        # Checkout takes stock with update(), which sends no save signals
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_many([(Product.objects.get(id=hp.id), 1)])
+        self.assertEqual(self.counts()[(self.laptops.id, 'HP', 1, False)], 1)
+        self.assertCountsMatchRebuild()
+
+        Product.objects.get(id=dell.id).delete()
+        Product.objects.only('id').get(id=hp.id).save()
+        self.assertCountsMatchRebuild()
+
+    def test_deferred_loads_recount_only_their_categories(self):
+        dell = self.add('Dell', 800)
+        self.add('Dell', 9000, category=self.phones)
+        phones_version = catalog.get_version(self.phones.id)
+        with mock.patch('store.signals.facets.rebuild', wraps=facets.rebuild) as rebuild:
+            loaded = Product.objects.only('name', 'category').get(id=dell.id)
+            loaded.price = 6000
+            loaded.save()
+            rebuild.assert_called_once_with({self.laptops.id})
+            self.assertEqual(catalog.get_version(self.phones.id), phones_version)
+            self.assertEqual(self.counts()[(self.laptops.id, 'Dell', 2, True)], 1)
+
+            moved = Product.objects.only('category').get(id=dell.id)
+            moved.category = self.phones
+            moved.save()
+            rebuild.assert_called_with({self.laptops.id, self.phones.id})
+            self.assertNotEqual(catalog.get_version(self.phones.id), phones_version)
+
+            # Without the category the old one is unknown, so everything is recounted and invalidated
+            phones_version = catalog.get_version(self.phones.id)
+            Product.objects.only('id').get(id=dell.id).delete()
+            rebuild.assert_called_with()
+            self.assertNotEqual(catalog.get_version(self.phones.id), phones_version)
+        self.assertEqual(self.counts(), {(self.phones.id, 'Dell', 2, True): 1})
+        self.assertCountsMatchRebuild()
+
+    def test_listing_filters_and_counts(self):
+        cheap = self.add('Dell', 800)
+        self.add('Dell', 3000, quantity=0)
+        self.add('HP', 3000)
+        self.add('HP', 9000, category=self.phones)
+
+        response = self.client.get(reverse('index'), {'category': self.laptops.id, 'brand': 'Dell'})
+        self.assertEqual(len(response.context['products']), 2)
+        found = response.context['facets']
+        self.assertEqual({b['value']: b['count'] for b in found['brands']}, {'Dell': 2, 'HP': 1})
+        self.assertEqual([b['count'] for b in found['bands']], [1, 1, 0])
+        self.assertEqual(found['in_stock']['count'], 1)
+
+        response = self.client.get(reverse('index'), {'category': self.laptops.id, 'band': 0, 'in_stock': 1})
+        self.assertEqual([p.id for p in response.context['products']], [cheap.id])
+        self.assertEqual(response.context['listing_query'], f'category={self.laptops.id}&band=0&in_stock=1')
+        # Counts and pages are cached; the repeat visit counts nothing
+        with self.assertNumQueries(0):
+            self.client.get(reverse('index'), {'category': self.laptops.id, 'band': 0, 'in_stock': 1})
+
+    @skipUnless(connection.vendor == 'sqlite', "asserts on SQLite's EXPLAIN QUERY PLAN output")
+    def test_filtered_listings_use_their_indexes(self):
+        plans = {
+            'store_product_category_brand': {'brand': 'Dell', 'band': None, 'in_stock': False},
+            'store_product_category_price': {'brand': None, 'band': 1, 'in_stock': False},
+            'store_product_category_stocked': {'brand': None, 'band': None, 'in_stock': True},
+        }
+        for index, filters in plans.items():
+            with self.subTest(index=index):
+                plan = facets.filter_products(Product.objects.filter(category=self.laptops.id), filters).order_by('id').explain()
+                self.assertIn(index, plan)
+
+
+class DatabaseSettingsTests(TestCase):
+    def load_settings(self, **env):
+        with mock.patch.dict(os.environ, env):
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'ecommerce', 'settings.py'))
+
+    def test_postgresql_is_chosen_from_the_environment(self):
+        default = self.load_settings(DATABASE_ENGINE='postgresql', POSTGRES_HOST='db.internal')['DATABASES']['default']
+        self.assertEqual(default['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((default['HOST'], default['CONN_MAX_AGE'], default['CONN_HEALTH_CHECKS']), ('db.internal', 60, True))
+
+        pooled = self.load_settings(DATABASE_ENGINE='postgresql', POSTGRES_POOL_SIZE='8')['DATABASES']['default']
+        # Django refuses persistent connections next to a pool
+        self.assertEqual(pooled['CONN_MAX_AGE'], 0)
+        self.assertEqual(pooled['OPTIONS']['pool']['max_size'], 8)
+
+    @skipUnless(connection.vendor == 'sqlite', "SQLite connection tuning")
+    def test_new_sqlite_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            for pragma, expected in [('synchronous', 1), ('busy_timeout', 5000), ('temp_store', 2)]:
+                cursor.execute(f"PRAGMA {pragma}")
+                self.assertEqual(cursor.fetchone()[0], expected, pragma)
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='History')
+        self.product = make_product(category, quantity=1000)
+        self.customer = make_customer()
+        session = self.client.session
+        session['customer'] = self.customer.id
+        session.save()
+
+    def place(self, count, status='Pending'):
+        # One checkout writes all its lines at once, so several share a timestamp
+        Order.objects.bulk_create([
+            Order(customer=self.customer, product=self.product, price=1000, status=status) for _ in range(count)
+        ])
+
+    @override_settings(ORDER_HISTORY_PAGE_SIZE=4)
+    def test_keyset_pages_cover_every_order_once(self):
+        self.place(5)
+        self.place(5, 'Delivered')
+        seen, url, queries = [], reverse('profile'), 4  # session, customer check, page, status counts
+        while url:
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            queries = 5  # plus the cursor's timestamp
+            seen += [order['id'] for order in response.context['orders']]
+            cursor = response.context['next_cursor']
+            url = f"{reverse('profile')}?before={cursor}" if cursor else None
+        self.assertEqual(seen, list(Order.objects.order_by('-date_ordered', '-id').values_list('id', flat=True)))
+        self.assertEqual(
+            response.context['status_counts'], {'Pending': 5, 'Shipped': 0, 'Delivered': 5, 'Cancelled': 0}
+        )
+        self.assertContains(response, 'Laptop')
+
+    def test_cursor_of_another_customers_order_starts_over(self):
+        self.place(2)
+        other = make_customer('other@example.com')
+        foreign = Order.objects.create(customer=other, product=self.product, price=1)
+        response = self.client.get(f"{reverse('profile')}?before={foreign.id}")
+        self.assertEqual(len(response.context['orders']), 2)
+
+
+class ReceiptTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, BACKGROUND_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        self.product = make_product(Category.objects.create(name='Receipts'), price=1000)
+        self.customer = make_customer()
+
+    def checkout(self):
+        """Check out one laptop, leaving the queued render to the caller."""
+        self.client.post(reverse('login'), {'email': self.customer.email, 'password': 'secret123'})
+        self.client.post(reverse('add_to_cart'), {'product': self.product.id})
+        with self.captureOnCommitCallbacks(execute=False):
+            response = self.client.post(reverse('checkout'), {'destination': 'Nairobi', 'mpesa_number': '0712345678'})
+        return response, Receipt.objects.get()
+
+    def test_checkout_queues_receipt_and_worker_renders_it(self):
+        response, receipt = self.checkout()
+        self.assertEqual(response.context['receipt'], receipt)
+        self.assertEqual((receipt.status, receipt.customer, receipt.payload['total_price']), (Receipt.PENDING, self.customer, 1050))
+
+        url = reverse('receipt', args=[receipt.id])
+        pending = self.client.get(url)
+        self.assertEqual(pending.status_code, 202)
+        self.assertEqual(pending['Retry-After'], '2')
+
+        self.assertEqual(receipts.process_pending(), 1)
+        receipt.refresh_from_db()
+        self.assertEqual((receipt.status, receipt.attempts), (Receipt.READY, 1))
+        download = self.client.get(url)
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(receipts.process_pending(), 0)
+
+    def test_receipt_is_only_served_to_its_customer(self):
+        _, receipt = self.checkout()
+        url = reverse('receipt', args=[receipt.id])
+        other = make_customer('other@example.com')
+        self.client.post(reverse('login'), {'email': other.email, 'password': 'secret123'})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.get(reverse('logout'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_failed_renders_back_off_then_give_up(self):
+        _, receipt = self.checkout()
+        url = reverse('receipt', args=[receipt.id])
+        broken = mock.patch('store.services.receipts.render_pdf', side_effect=OSError('disk full'))
+        with broken, self.assertLogs('store.services.receipts', 'WARNING'):
+            self.assertEqual(receipts.process_pending(), 1)
+            receipt.refresh_from_db()
+            self.assertEqual((receipt.status, receipt.attempts, receipt.error), (Receipt.PENDING, 1, 'disk full'))
+            self.assertGreater(receipt.next_attempt_at, timezone.now())
+            # Not due yet, and the customer is still told to wait
+            self.assertEqual(receipts.process_pending(), 0)
+            self.assertEqual(self.client.get(url).status_code, 202)
+            self.assertEqual(receipts.retry_delay(3), settings.RECEIPT_RETRY_DELAY * 4)
+
+            for attempt in range(2, settings.RECEIPT_MAX_ATTEMPTS + 1):
+                Receipt.objects.filter(id=receipt.id).update(next_attempt_at=timezone.now())
+                receipts.process_pending()
+        receipt.refresh_from_db()
+        self.assertEqual((receipt.status, receipt.attempts), (Receipt.FAILED, settings.RECEIPT_MAX_ATTEMPTS))
+        self.assertEqual(self.client.get(url).status_code, 500)
+
+    def test_failed_render_is_rescheduled_in_process(self):
+        _, receipt = self.checkout()
+        with mock.patch('store.services.receipts.render_pdf', side_effect=OSError('disk full')), \
+                mock.patch('store.services.receipts.jobs.submit_later') as submit_later, \
+                self.assertLogs('store.services.receipts', 'WARNING'):
+            receipts.process_pending()
+        submit_later.assert_called_once_with(receipts.retry_delay(1), receipts.process, receipt.id)
+
+    def test_retry_after_a_failure_renders_the_receipt(self):
+        _, receipt = self.checkout()
+        with mock.patch('store.services.receipts.render_pdf', side_effect=OSError('disk full')), \
+                self.assertLogs('store.services.receipts', 'WARNING'):
+            receipts.process_pending()
+        Receipt.objects.filter(id=receipt.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(receipts.process_pending(), 1)
+        receipt.refresh_from_db()
+        self.assertEqual((receipt.status, receipt.attempts, receipt.error), (Receipt.READY, 2, ''))
+
+
+class JobTests(SimpleTestCase):
+    @override_settings(BACKGROUND_WORKERS=1)
+    def test_delayed_job_runs_on_the_pool(self):
+        self.addCleanup(jobs.shutdown)
+        ran = threading.Event()
+        jobs.submit_later(0.01, ran.set)
+        self.assertTrue(ran.wait(5))
+
+    @override_settings(BACKGROUND_WORKERS=1)
+    def test_shutdown_drops_waiting_jobs(self):
+        ran = threading.Event()
+        jobs.submit_later(0.2, ran.set)
+        jobs.shutdown()
+        self.assertFalse(ran.wait(0.4))
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_nothing_is_scheduled_without_workers(self):
+        ran = threading.Event()
+        jobs.submit_later(0, ran.set)
+        self.assertFalse(ran.wait(0.1))
+
+
+@override_settings(BACKGROUND_WORKERS=0, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class EmailOutboxTests(TestCase):
+    def test_contact_form_queues_and_the_worker_delivers(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post(reverse('contacts'), {'email': 'visitor@example.com', 'message': 'Hi'})
+        self.assertContains(response, 'sent successfully')
+        # Nothing goes out inside the request
+        self.assertEqual(mail.outbox, [])
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.to), (OutboundEmail.PENDING, [settings.CONTACT_EMAIL]))
+
+        for callback in callbacks:
+            callback()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.SENT)
+        self.assertEqual(mail.outbox[0].from_email, 'visitor@example.com')
+
+    def test_batch_shares_one_connection(self):
+        for i in range(3):
+            outbox.enqueue(f"Note {i}", 'body', ['staff@example.com'])
+        with mock.patch('store.services.outbox.get_connection', wraps=outbox.get_connection) as get_connection:
+            self.assertEqual(outbox.send_pending(), 3)
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_failed_batch_schedules_one_retry_in_process(self):
+        for i in range(3):
+            outbox.enqueue(f"Note {i}", 'body', ['staff@example.com'])
+        refused = mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused'))
+        with refused, mock.patch('store.services.outbox.jobs.submit_later') as submit_later, \
+                self.assertLogs('store.services.outbox', 'WARNING'):
+            self.assertEqual(outbox.send_pending(), 0)
+        submit_later.assert_called_once()
+        delay, func = submit_later.call_args.args
+        self.assertIs(func, outbox.send_pending)
+        self.assertAlmostEqual(delay, outbox.retry_delay(1), delta=1)
+
+    def test_failures_back_off_then_give_up(self):
+        email = outbox.enqueue('Note', 'body', ['staff@example.com'])
+        refused = mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused'))
+        with refused, self.assertLogs('store.services.outbox', 'WARNING'):
+            self.assertEqual(outbox.send_pending(), 0)
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts, email.error), (OutboundEmail.PENDING, 1, 'refused'))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            # Not due yet
+            self.assertEqual(outbox.send_pending(), 0)
+            self.assertEqual(outbox.retry_delay(3), settings.EMAIL_OUTBOX_RETRY_DELAY * 4)
+
+            for attempt in range(2, settings.EMAIL_OUTBOX_MAX_ATTEMPTS + 1):
+                OutboundEmail.objects.filter(id=email.id).update(next_attempt_at=timezone.now())
+                outbox.send_pending()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.FAILED, settings.EMAIL_OUTBOX_MAX_ATTEMPTS))
+
+
+@override_settings(THROTTLE_RATES={
+    'login': {'ip': (1, 3), 'email': (1, 5)},
+    'signup': {'ip': (1, 2)},
+})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = make_customer()
+
+    def attempt(self, password='wrong', address='10.0.0.1', email=None):
+        return self.client.post(
+            reverse('login'), {'email': email or self.customer.email, 'password': password}, REMOTE_ADDR=address
+        )
+
+    def test_buckets_are_shared_between_processes(self):
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        shared = {**settings.CACHES['throttle'], 'LOCATION': location.name}
+        with override_settings(CACHES={**settings.CACHES, 'throttle': shared}, THROTTLE_CACHE='throttle'):
+            self.assertEqual(throttle.take('throttle:test', 1, 1), 0)
+            self.assertIsNone(cache.get('throttle:test'))
+            # Another worker process opens the same directory and sees the spent bucket
+            other = caches.create_connection('throttle')
+            self.assertIsNot(other, throttle.cache())
+            self.assertEqual(other.get('throttle:test')[0], 0)
+            self.assertGreater(throttle.take('throttle:test', 1, 1), 0)
+
+    def test_bucket_allows_a_burst_then_refills_at_the_rate(self):
+        self.assertEqual([throttle.take('throttle:test', 60, 2, now=100) for _ in range(3)], [0, 0, 1.0])
+        self.assertEqual(throttle.take('throttle:test', 60, 2, now=100.5), 0.5)
+        self.assertEqual(throttle.take('throttle:test', 60, 2, now=101), 0)
+
+    def test_flooding_address_is_rejected_without_touching_the_database(self):
+        for _ in range(3):
+            self.assertContains(self.attempt(), 'Invalid email or password')
+        with self.assertNumQueries(0):
+            response = self.attempt(password='secret123')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), range(1, 61))
+        self.assertContains(response, 'Too many attempts', status_code=429)
+        self.assertNotIn('customer', self.client.session)
+
+        # The same customer signing in from elsewhere is not locked out
+        self.assertRedirects(self.attempt(password='secret123', address='10.0.0.2'), reverse('index'), fetch_redirect_response=False)
+
+    def test_guessing_one_account_from_many_addresses_is_rejected(self):
+        statuses = [self.attempt(address=f'10.0.1.{i}', email=f' {self.customer.email.upper()}').status_code for i in range(6)]
+        self.assertEqual(statuses, [200] * 5 + [429])
+
+    def test_signup_is_throttled_per_address(self):
+        data = {'firstname': 'A', 'lastname': 'B', 'phone': '0712345678', 'password': 'secret123'}
+        statuses = [
+            self.client.post(reverse('signup'), data | {'email': f'new{i}@example.com'}).status_code for i in range(3)
+        ]
+        self.assertEqual(statuses, [302, 302, 429])
+        self.assertEqual(Customer.objects.filter(email__startswith='new').count(), 2)
+
+
+class StaticPipelineTests(TestCase):
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        storages = settings.STORAGES | {
+            'staticfiles': {'BACKEND': 'store.services.static.CompressedManifestStaticFilesStorage'}
+        }
+        settings_override = override_settings(STATIC_ROOT=static_root.name, STORAGES=storages)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.url = staticfiles_storage.url('css/index.css')
+        with staticfiles_storage.open(staticfiles_storage.stored_name('css/index.css')) as f:
+            self.source = f.read()
+
+    def test_hashed_files_are_served_precompressed_and_immutable(self):
+        self.assertRegex(self.url, r'^/static/css/index\.[0-9a-f]{12}\.css$')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertEqual(gzip.decompress(body), self.source)
+
+        plain = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(b''.join(plain.streaming_content), self.source)
+
+    def test_unhashed_names_get_a_short_lifetime_and_revalidate(self):
+        response = self.client.get('/static/css/index.css')
+        self.assertEqual(response['Cache-Control'], f'public, max-age={settings.STATIC_MAX_AGE}')
+        self.assertEqual(self.client.get('/static/css/index.css', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_only_collected_names_are_served(self):
+        for path in ['/static/css/missing.css', '/static/../ecommerce/settings.py', '/static/css/']:
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_pages_link_the_hashed_names(self):
+        self.assertContains(self.client.get(reverse('login')), staticfiles_storage.url('css/login.css'))
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.laptops = Category.objects.create(name='Laptops')
+        self.existing = Product.objects.create(
+            sku='LT-1', name='Old Laptop', brand='HP', price=900, quantity=0, category=self.laptops, image='x.jpg'
+        )
+
+    def import_csv(self, text, **options):
+        return imports.import_file(io.BytesIO(text.encode()), 'csv', **options)
+
+    def test_csv_creates_new_and_updates_existing_products(self):
+        listing = catalog.get_page(self.laptops.id)
+        stats = self.import_csv(
+            "\ufeffsku,name,brand,price,category,quantity\n"
+            "LT-1,Renamed Laptop,HP,950,laptops,4\n"
+            "LT-2,Gaming Laptop,Acer,1500,Laptops,2\n"
+        )
+        self.assertEqual((stats.rows, stats.created, stats.updated, stats.skipped), (2, 1, 1, 0))
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.price, self.existing.quantity), ('Renamed Laptop', 950, 4))
+        self.assertEqual(Product.objects.get(sku='LT-2').category, self.laptops)
+
+        # The bulk writes skip the save signals; search, facets and the cached listing still follow
+        self.assertEqual([p.name for p in search.search('gaming')], ['Gaming Laptop'])
+        counted = set(FacetCount.objects.filter(products__gt=0).values_list('brand', 'in_stock', 'products'))
+        self.assertEqual(counted, {('HP', True, 1), ('Acer', True, 1)})
+        self.assertNotEqual(catalog.get_page(self.laptops.id), listing)
+
+    def test_price_and_stock_feed_only_touches_its_columns(self):
+        stats = self.import_csv(
+            "sku,price,quantity\n"
+            "LT-1,800,7\n"
+            "LT-1,850,6\n"
+            "LT-9,100,1\n"
+            "LT-3,cheap,1\n"
+            ",100,1\n"
+        )
+        self.assertEqual((stats.rows, stats.created, stats.updated, stats.skipped, stats.failed), (5, 0, 1, 4, 3))
+        self.assertEqual(stats.errors, [
+            "line 5: price must be a whole number, got 'cheap'",
+            "line 6: sku is missing",
+            "line 4: new SKU 'LT-9' needs name and category",
+        ])
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.brand, self.existing.price, self.existing.quantity), ('Old Laptop', 'HP', 850, 6))
+
+    def test_jsonl_is_imported_in_batches(self):
+        lines = [{'sku': f'M-{i}', 'name': f'Mouse {i}', 'price': 10 + i, 'category': 'Mice', 'quantity': i} for i in range(5)]
+        rows = imports.read_rows(io.StringIO('\n'.join(json.dumps(line) for line in lines) + '\nnot json\n'), 'jsonl')
+        seen = []
+        stats = imports.ProductImporter(create_categories=True, batch_size=2).run(rows, progress=lambda s: seen.append(s.rows))
+        self.assertEqual(seen, [2, 4, 6])
+        self.assertEqual((stats.created, stats.failed, stats.categories_created), (5, 1, 1))
+        self.assertEqual(Product.objects.filter(category__name='Mice').count(), 5)
+        self.assertEqual(facets.summarize(facets.facet_rows(), facets.parse_filters({}))['in_stock']['count'], 4)
+
+    def test_unknown_categories_are_rejected_unless_created(self):
+        stats = self.import_csv("sku,name,category\nX-1,Cable,Cables\n")
+        self.assertEqual(stats.errors, ["line 2: unknown category 'Cables'"])
+        self.assertFalse(Category.objects.filter(name='Cables').exists())
+
+    def test_command_reports_throughput(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write("sku,name,category,price\nK-1,Keyboard,Laptops,20\n")
+        self.addCleanup(os.unlink, f.name)
+        out = io.StringIO()
+        call_command('import_products', f.name, stdout=out)
+        self.assertIn('1 row(s): 1 created, 0 updated, 0 skipped', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write("name,price\nKeyboard,20\n")
+        self.addCleanup(os.unlink, f.name)
+        with self.assertRaisesMessage(CommandError, 'no sku column'):
+            call_command('import_products', f.name)
+
+    def test_admin_upload(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'secret123')
+        self.client.force_login(admin_user)
+        url = reverse('admin:store_product_import')
+        self.assertContains(self.client.get(reverse('admin:store_product_changelist')), url)
+        upload = SimpleUploadedFile('feed.csv', b"sku,quantity\nLT-1,12\n", content_type='text/csv')
+        response = self.client.post(url, {'file': upload})
+        self.assertRedirects(response, reverse('admin:store_product_changelist'))
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.quantity, 12)
+
+
+    def test_admin_search_matches_skus(self):
+        Product.objects.create(sku='DT-77', name='Desktop Tower', price=500, quantity=1, category=self.laptops, image='x.jpg')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret123'))
+        url = reverse('admin:store_product_changelist')
+        for term, names in [('LT-1', ['Old Laptop']), ('dt', ['Desktop Tower']), ('laptop', ['Old Laptop'])]:
+            with self.subTest(term=term):
+                response = self.client.get(url, {'q': term})
+                self.assertEqual([product.name for product in response.context['cl'].result_list], names)
+
+class OrderTransitionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Returns')
+        self.laptop = make_product(self.category, 'Laptop', quantity=0)
+        self.mouse = make_product(self.category, 'Mouse', quantity=5)
+        self.customer = make_customer()
+
+    def order(self, product, quantity, status=Order.PENDING):
+        return Order.objects.create(customer=self.customer, product=product, quantity=quantity, status=status)
+
+    def test_cancelling_restocks_each_product_once_per_chunk(self):
+        for status in [Order.PENDING, Order.SHIPPED, Order.PENDING]:
+            self.order(self.laptop, 2, status)
+        self.order(self.mouse, 1)
+        delivered = self.order(self.mouse, 4, Order.DELIVERED)
+        before = catalog.product_version(self.laptop.id)
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            result = orders.transition(Order.objects.all(), Order.CANCELLED)
+        self.assertEqual(result, {'changed': 4, 'skipped': 1, 'restocked': 7})
+        self.assertEqual(sum(1 for q in queries if q['sql'].startswith('UPDATE "store_product"')), 1)
+
+        self.laptop.refresh_from_db()
+        self.mouse.refresh_from_db()
+        self.assertEqual((self.laptop.quantity, self.mouse.quantity), (6, 6))
+        delivered.refresh_from_db()
+        self.assertEqual(delivered.status, Order.DELIVERED)
+        # The sold-out laptop is back in the in-stock facet and its page is invalidated
+        self.assertEqual(facets.summarize(facets.facet_rows(self.category.id), facets.parse_filters({}))['in_stock']['count'], 2)
+        self.assertNotEqual(catalog.product_version(self.laptop.id), before)
+
+    def test_final_statuses_do_not_move_and_nothing_is_restocked_twice(self):
+        self.order(self.mouse, 3)
+        orders.transition(Order.objects.all(), Order.CANCELLED)
+        self.assertEqual(orders.transition(Order.objects.all(), Order.CANCELLED), {'changed': 0, 'skipped': 1, 'restocked': 0})
+        self.assertEqual(orders.transition(Order.objects.all(), Order.SHIPPED)['skipped'], 1)
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.mouse.quantity, 8)
+        with self.assertRaises(ValueError):
+            orders.transition(Order.objects.all(), 'Lost')
+
+    def test_large_selections_run_in_chunks(self):
+        Order.objects.bulk_create([
+            Order(customer=self.customer, product=self.mouse, quantity=1, price=1) for _ in range(7)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            result = orders.transition(Order.objects.filter(product=self.mouse), Order.CANCELLED, chunk_size=3)
+        self.assertEqual(result, {'changed': 7, 'skipped': 0, 'restocked': 7})
+        self.assertEqual(sum(1 for q in queries if q['sql'].startswith('UPDATE "store_order"')), 3)
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.mouse.quantity, 12)
+
+    def test_admin_actions_and_edits_use_the_state_machine(self):
+        pending, shipped = self.order(self.mouse, 2), self.order(self.mouse, 1, Order.SHIPPED)
+        delivered = self.order(self.mouse, 1, Order.DELIVERED)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret123'))
+        response = self.client.post(reverse('admin:store_order_changelist'), {
+            'action': 'mark_as_cancelled', '_selected_action': [pending.id, delivered.id],
+        }, follow=True)
+        self.assertContains(response, '1 order(s) marked as Cancelled. 2 unit(s) returned to stock.')
+        self.assertContains(response, 'only Pending or Shipped orders can become Cancelled')
+
+        url = reverse('admin:store_order_change', args=[shipped.id])
+        form = {
+            'customer': self.customer.id, 'product': self.mouse.id, 'price': shipped.price, 'status': Order.CANCELLED,
+            'address': '', 'phone': '', 'quantity': 1,
+        }
+        self.client.post(url, form)
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.mouse.quantity, 5 + 2 + 1)
+        self.client.post(url, form | {'status': Order.PENDING})
+        shipped.refresh_from_db()
+        self.assertEqual(shipped.status, Order.CANCELLED)
+
+    def test_command_requires_a_selection(self):
+        self.order(self.mouse, 2)
+        with self.assertRaises(CommandError):
+            call_command('update_order_status', Order.CANCELLED)
+        out = io.StringIO()
+        call_command('update_order_status', Order.CANCELLED, '--from', Order.PENDING, '--chunk-size', '1', stdout=out)
+        self.assertIn('1 order(s) marked as Cancelled, 0 skipped, 2 unit(s) returned to stock', out.getvalue())
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_every_scenario_runs_cleanly_on_a_seeded_catalog(self):
+        seed(categories=3, products=30, customers=5, orders=20)
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        with override_settings(METRICS_ENABLED=True, BACKGROUND_WORKERS=0, MEDIA_ROOT=media_root.name):
+            results = runner.run(iterations=3, warmup=1)
+
+        self.assertEqual(set(results['client']), {
+            'index', 'product_display', 'search', 'add_to_cart', 'cart', 'checkout', 'sales_report', 'profile',
+            'async_index', 'async_product_display', 'async_add_to_cart', 'async_cart', 'login', 'login_flood',
+        })
+        for name, row in results['client'].items():
+            with self.subTest(scenario=name):
+                self.assertEqual(row['errors'], 0)
+                self.assertEqual(row['requests'], 3)
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+                self.assertIsNotNone(row['queries_mean'])
+        self.assertEqual(ReportOrder.objects.count(), 20 + 4)
+
+    def test_setup_logins_are_not_throttled_across_runs(self):
+        seed(categories=1, products=2, customers=1, orders=0)
+        with override_settings(METRICS_ENABLED=True, BACKGROUND_WORKERS=0):
+            # More sign-ins of the one account than its email bucket's burst
+            for _ in range(12):
+                row = runner.run(['profile'], iterations=1, warmup=0)['client']['profile']
+                self.assertEqual(row['errors'], 0)
+                self.assertGreater(row['queries_mean'], 1)
+
+    def test_refused_login_fails_the_run(self):
+        seed(categories=1, products=2, customers=1, orders=0)
+        context = scenarios.Context()
+        context.emails = ['nobody@example.com']
+        with self.assertRaisesMessage(RuntimeError, 'status 200'):
+            runner.run_scenario(scenarios.SCENARIOS['profile'], runner.ClientTransport(), context, iterations=1, warmup=0)
+
+    def test_iterations_are_shared_between_concurrent_clients(self):
+        self.assertEqual(runner._shares(10, 4), [3, 3, 2, 2])
+        self.assertEqual(runner._shares(2, 8), [1, 1])
+
+    def test_compare_flags_slower_or_chattier_scenarios(self):
+        baseline = {'client': {'cart': {'p95_ms': 10.0, 'queries_mean': 2.0}}}
+        steady = {'client': {'cart': {'p95_ms': 12.0, 'queries_mean': 2.0}}}
+        worse = {'client': {'cart': {'p95_ms': 20.0, 'queries_mean': 3.0}}}
+        self.assertEqual(runner.compare(steady, baseline), [])
+        self.assertEqual(len(runner.compare(worse, baseline)), 2)
+
+
+class AsgiBenchmarkTests(TransactionTestCase):
+    def test_sync_and_async_views_serve_concurrent_asgi_clients(self):
+        seed(categories=2, products=20, customers=3, orders=0)
+        names = ['product_display', 'async_product_display', 'async_add_to_cart', 'async_cart']
+        with override_settings(METRICS_ENABLED=True, BACKGROUND_WORKERS=0):
+            results = runner.run(names, ['asgi'], iterations=8, warmup=1, concurrency=4)
+
+        for name in names:
+            with self.subTest(scenario=name):
+                self.assertEqual(results['asgi'][name]['errors'], 0)
+                self.assertEqual(results['asgi'][name]['requests'], 8)
+        # Queries issued from the handler's worker threads are still counted
+        self.assertGreater(results['asgi']['async_cart']['queries_mean'], 0)
+
+    def test_customers_log_in_while_a_flood_is_rejected(self):
+        seed(categories=1, products=2, customers=3, orders=0)
+        cache.clear()
+        rates = {'login': {'ip': (1, 1), 'email': (600, 100)}}
+        # The attacker has spent its burst already, so the flood never reaches the
+        # database; concurrent writers would lock the shared in-memory test database
+        throttle.take(throttle._key('login', 'ip', FLOOD_ADDRESS), *rates['login']['ip'])
+        with override_settings(METRICS_ENABLED=True, BACKGROUND_WORKERS=0, THROTTLE_RATES=rates):
+            results = runner.run(['login'], ['asgi'], iterations=6, warmup=1, alongside='login_flood')
+
+        self.assertEqual(set(results['asgi']), {'login', 'login:login_flood'})
+        self.assertEqual(results['asgi']['login']['errors'], 0)
+        flood = results['asgi']['login:login_flood']
+        self.assertGreater(flood['requests'], 0)
+        self.assertEqual(flood['throttled'], flood['requests'])
+        self.assertEqual(flood['queries_max'], 0)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    STOCK = 20
+    BUYERS = 40
+
+    def test_parallel_checkouts_never_oversell(self):
+        category = Category.objects.create(name='Hot')
+        product = make_product(category, 'Hot SKU', quantity=self.STOCK)
+        customers = [make_customer(f'buyer{i}@example.com') for i in range(self.BUYERS)]
+        start = threading.Barrier(self.BUYERS)
+        outcomes = []
+
+        def checkout(customer):
+            start.wait()
+            try:
+                while True:
+                    try:
+                        # Each buyer holds its own stale copy, as a request would
+                        line = cart_line(Product.objects.get(id=product.id), 1)
+                        place_order(customer, [line], 'Nairobi', '0712345678', line['total'])
+                        outcomes.append('ok')
+                        return
+                    except InsufficientStock:
+                        outcomes.append('rejected')
+                        return
+                    except OperationalError:
+                        # SQLite reports write contention as "locked"; retry like a new request
+                        time.sleep(random.uniform(0.005, 0.03))
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=checkout, args=(c,)) for c in customers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(outcomes.count('ok'), self.STOCK)
+        self.assertEqual(outcomes.count('rejected'), self.BUYERS - self.STOCK)
+        self.assertEqual(product.quantity, 0)
+        self.assertEqual(Order.objects.count(), self.STOCK)
+        self.assertEqual(ReportOrder.objects.count(), self.STOCK)
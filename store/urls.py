@@ -1,17 +1,19 @@
-from django.conf import settings
-from django.conf.urls.static import static
 from django.urls import path
 from .views.homepage import Homepage
-from .views.index import Index
+from .views.index import Index, AsyncIndex
 from .views.profile import Profile
 from .views.cart import Cart, AddToCart, DecreaseCartItem, RemoveFromCart, ProductDisplay
+from .views.cart import AsyncCart, AsyncAddToCart, AsyncDecreaseCartItem, AsyncRemoveFromCart, AsyncProductDisplay
 from. views.checkout import  Checkout
 from .views.report import SalesReportView
+from .views.receipt import ReceiptDownload
+from .views.metrics import metrics
+from .views.search import Search
 
 from .views.signup import Signup
 from .views.contacts import Contact
 from .views.login import Login, logout
-from store.views.report import SalesReportView, SalesReportPDFView
+from store.views.report import SalesReportView, SalesReportPDFView, SalesExportView
 
 
 urlpatterns = [
@@ -22,15 +24,25 @@ urlpatterns = [
     path('cart/decrease/', DecreaseCartItem.as_view(), name='decrease_cart_item'),
     path('cart/remove/', RemoveFromCart.as_view(), name='remove_from_cart'),
     path('checkout/', Checkout.as_view(), name='checkout'),
+    path('receipts/<int:receipt_id>/', ReceiptDownload.as_view(), name='receipt'),
     path('login/', Login.as_view(), name='login'),
     path('logout/', logout, name='logout'),
     path('contacts/', Contact.as_view(), name='contacts'), 
     path('index/', Index.as_view(), name='index'),
+    path('search/', Search.as_view(), name='search'),
     path('product/<int:product_id>/', ProductDisplay.as_view(), name='product_display'),
     path('profile/', Profile.as_view(), name='profile'),
     path('reports/', SalesReportView.as_view(), name='sales_report'),
     path('reports/pdf/', SalesReportPDFView.as_view(), name='sales_report_pdf'),
-]
+    path('reports/export.csv', SalesExportView.as_view(), {'fmt': 'csv'}, name='sales_export_csv'),
+    path('reports/export.ndjson', SalesExportView.as_view(), {'fmt': 'ndjson'}, name='sales_export_ndjson'),
+    path('metrics/', metrics, name='metrics'),
 
-if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT[0])
+    # Async variants of the storefront views, for ASGI deployments
+    path('async/index/', AsyncIndex.as_view(), name='async_index'),
+    path('async/product/<int:product_id>/', AsyncProductDisplay.as_view(), name='async_product_display'),
+    path('async/cart/', AsyncCart.as_view(), name='async_cart'),
+    path('async/cart/add/', AsyncAddToCart.as_view(), name='async_add_to_cart'),
+    path('async/cart/decrease/', AsyncDecreaseCartItem.as_view(), name='async_decrease_cart_item'),
+    path('async/cart/remove/', AsyncRemoveFromCart.as_view(), name='async_remove_from_cart'),
+]
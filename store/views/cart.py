@@ -1,42 +1,20 @@
-from django.shortcuts import render, get_object_or_404, redirect
+import hashlib
+
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import render, redirect
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.views import View
-from django.http import HttpResponse
-from store.models.product import Product
-from store.models.customer import Customer
-from store.models.order import Order
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-import io
-from datetime import datetime
+from store.services import catalog
+from store.services.cart import CartService
 
 class Cart(View):
     """Handles displaying the cart"""
     
     def get(self, request):
-        # Use session['customer'] for cart key
-        cart_key = f"cart_{request.session.get('customer', 'anonymous')}"
-        cart = request.session.get(cart_key, {})
-        
-        if not cart:
-            return render(request, 'cart.html', {'cart_items': [], 'total_price': 0})
-
-        product_ids = [int(pid) for pid in cart.keys()]
-        products = Product.objects.filter(id__in=product_ids)
-        product_dict = {str(product.id): product for product in products}
-
-        cart_items = []
-        total_price = 0
-
-        for pid, qty in cart.items():
-            product = product_dict.get(str(pid))
-            if product:
-                total = product.price * qty
-                total_price += total
-                cart_items.append({
-                    'product': product,
-                    'quantity': qty,
-                    'total': total
-                })
+        cart_items = CartService.for_request(request).items()
+        total_price = sum(item['total'] for item in cart_items)
 
         return render(request, 'cart.html', {
             'cart_items': cart_items,
@@ -47,72 +25,143 @@ class Cart(View):
         return redirect('cart')
 
 
+class AsyncCart(View):
+    """Cart page for ASGI servers, read through the async session and ORM APIs"""
+
+    async def get(self, request):
+        cart_items = await (await CartService.afor_request(request)).aitems()
+        total_price = sum(item['total'] for item in cart_items)
+
+        return render(request, 'cart.html', {
+            'cart_items': cart_items,
+            'total_price': total_price
+        })
+
+    async def post(self, request):
+        return redirect('async_cart')
+
+
+def _posted_quantity(request):
+    try:
+        return max(int(request.POST.get('quantity', 1)), 1)
+    except ValueError:
+        return 1
+
+
 class AddToCart(View):
     """Handles adding items to the cart"""
     
     def post(self, request):
-        product_id = request.POST.get('product')
-        if not product_id:
-            return redirect('cart')
+        CartService.for_request(request).add(request.POST.get('product'), _posted_quantity(request))
+        return redirect('cart')
 
-        product_id = str(product_id)
-        cart_key = f"cart_{request.session.get('customer', 'anonymous')}"
-        cart = request.session.get(cart_key, {})
 
-        cart[product_id] = cart.get(product_id, 0) + 1
-        request.session[cart_key] = cart
-        request.session.modified = True
+class AsyncAddToCart(View):
+    """Async variant of AddToCart"""
 
-        return redirect('cart')
+    async def post(self, request):
+        (await CartService.afor_request(request)).add(request.POST.get('product'), _posted_quantity(request))
+        return redirect('async_cart')
 
 
 class DecreaseCartItem(View):
     """Handles decreasing product quantity"""
 
     def post(self, request):
-        product_id = request.POST.get('product')
-        if not product_id:
-            return redirect('cart')
-
-        product_id = str(product_id)
-        cart_key = f"cart_{request.session.get('customer', 'anonymous')}"
-        cart = request.session.get(cart_key, {})
-
-        if product_id in cart:
-            if cart[product_id] > 1:
-                cart[product_id] -= 1
-            else:
-                del cart[product_id]
-            request.session[cart_key] = cart
-            request.session.modified = True
-
+        CartService.for_request(request).decrease(request.POST.get('product'))
         return redirect('cart')
 
 
+class AsyncDecreaseCartItem(View):
+    """Async variant of DecreaseCartItem"""
+
+    async def post(self, request):
+        (await CartService.afor_request(request)).decrease(request.POST.get('product'))
+        return redirect('async_cart')
+
+
 class RemoveFromCart(View):
     """Handles removing an item completely from the cart"""
 
     def post(self, request):
-        product_id = request.POST.get('product')
-        if not product_id:
-            return redirect('cart')
+        CartService.for_request(request).remove(request.POST.get('product'))
+        return redirect('cart')
 
-        product_id = str(product_id)
-        cart_key = f"cart_{request.session.get('customer', 'anonymous')}"
-        cart = request.session.get(cart_key, {})
 
-        if product_id in cart:
-            del cart[product_id]
-            request.session[cart_key] = cart
-            request.session.modified = True
+class AsyncRemoveFromCart(View):
+    """Async variant of RemoveFromCart"""
+
+    async def post(self, request):
+        (await CartService.afor_request(request)).remove(request.POST.get('product'))
+        return redirect('async_cart')
+
+
+
+def product_etag(product_id, version, request):
+    """
+    Version-based ETag for a product page.
+
+    The page embeds a CSRF token, so the visitor's CSRF secret is part of the
+    tag: a copy rendered before the secret rotated (at login) is not reused.
+    """
+    csrf_secret = request.META.get('CSRF_COOKIE', '')
+    return f"p{product_id}-{version}-{hashlib.sha1(csrf_secret.encode()).hexdigest()[:8]}"
+
+
+def _not_modified(request, product_id, version, modified):
+    """A 304 when the visitor's copy is current, else None; what condition() does, usable from async views."""
+    etag = quote_etag(product_etag(product_id, version, request))
+    response = get_conditional_response(request, etag=etag, last_modified=int(modified.timestamp()))
+    if response is not None:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified.timestamp())
+    return response
 
-        return redirect('cart')
 
+def _product_page(request, product, version, modified):
+    response = render(request, 'productdisplay.html', {
+        'product': product,
+        'version': version,
+        'fragment_timeout': settings.PAGE_CACHE_TIMEOUT,
+    })
+    # Rendering may have issued the first CSRF cookie, so tag what was actually sent
+    response['ETag'] = quote_etag(product_etag(product.id, version, request))
+    response['Last-Modified'] = http_date(modified.timestamp())
+    # Always revalidate, and keep shared caches away from the per-visitor CSRF token
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 class ProductDisplay(View):
     #Handles displaying individual product details
 
     def get(self, request, product_id):
-        product = get_object_or_404(Product, id=product_id)
-        return render(request, 'productdisplay.html', {'product': product})
\ No newline at end of file
+        # One primary key lookup of updated_at decides the version; a matching ETag is answered 304 from it
+        current = catalog.product_version(product_id)
+        if current is None:
+            raise Http404("No Product matches the given query.")
+        version, modified = current
+        response = _not_modified(request, product_id, version, modified)
+        if response is not None:
+            return response
+        product = catalog.get_product(product_id, version)
+        if product is None:
+            raise Http404("No Product matches the given query.")
+        return _product_page(request, product, version, modified)
+
+
+class AsyncProductDisplay(View):
+    """Product page for ASGI servers; the same version check and caches as ProductDisplay"""
+
+    async def get(self, request, product_id):
+        current = await catalog.aproduct_version(product_id)
+        if current is None:
+            raise Http404("No Product matches the given query.")
+        version, modified = current
+        response = _not_modified(request, product_id, version, modified)
+        if response is not None:
+            return response
+        product = await catalog.aget_product(product_id, version)
+        if product is None:
+            raise Http404("No Product matches the given query.")
+        return _product_page(request, product, version, modified)
@@ -1,8 +1,9 @@
 # store/views.py
 from django.shortcuts import render
 from django.views import View
-from django.core.mail import send_mail
 from django.conf import settings
+from store.models.outbox import OutboundEmail
+from store.services import outbox
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,23 +20,19 @@ class Contact(View):
             return render(request, 'contacts.html', {
                 'error': 'Please provide both email and message.'
             })
-
-        try:
-            logger.info(f"Attempting to send email from {email} to {settings.CONTACT_EMAIL}")
-            # This line is where the error occurs
-            send_mail(
-                subject=f"New Contact Message from {email}",
-                message=message,
-                from_email=email,
-                recipient_list=[settings.CONTACT_EMAIL],
-                fail_silently=False,
-            )
-            logger.info("Email sent successfully")
+        if len(email) > OutboundEmail._meta.get_field('from_email').max_length:
             return render(request, 'contacts.html', {
-                'success': True
+                'error': 'Please provide a valid email address.'
             })
-        except Exception as e:
-            logger.error(f"Email sending failed: {str(e)}")
-            return render(request, 'contacts.html', {
-                'error': f"Failed to send message: {str(e)}"
-            })
\ No newline at end of file
+
+        # Only queue it: the outbox worker talks to SMTP, retrying if it is slow or down
+        email_id = outbox.enqueue(
+            subject=f"New Contact Message from {email}",
+            body=message,
+            from_email=email,
+            to=[settings.CONTACT_EMAIL],
+        ).id
+        logger.info(f"Queued contact email {email_id} from {email} to {settings.CONTACT_EMAIL}")
+        return render(request, 'contacts.html', {
+            'success': True
+        })
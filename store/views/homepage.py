@@ -1,6 +1,23 @@
-from django.shortcuts import render
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.http import condition
+from store.services import pages
 
+
+def _page(request):
+    if not hasattr(request, '_homepage'):
+        request._homepage = pages.homepage()
+    return request._homepage
+
+
+@method_decorator(condition(
+    etag_func=lambda request: _page(request)['etag'],
+    last_modified_func=lambda request: _page(request)['modified'],
+), name='get')
 class Homepage(View):
     def get(self, request):
-        return render(request, 'homepage.html')
\ No newline at end of file
+        response = HttpResponse(_page(request)['html'])
+        patch_cache_control(response, no_cache=True)
+        return response
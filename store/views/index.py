@@ -1,31 +1,86 @@
+from urllib.parse import urlencode
+
 from django.shortcuts import render, redirect, HttpResponseRedirect
-from store.models.product import Product
-from store.models.category import Category
+from store.services import catalog, facets
+from store.services.cart import CartService
 from django.views import View
 
 class Index(View):
 
     def post(self, request):
-        product = request.POST.get('product')
-        remove = request.POST.get('remove')
-        cart = request.session.get('cart', {})
-
-        if cart.get(product):
-            if remove:
-                if cart[product] <= 1:
-                    cart.pop(product)
-                else:
-                    cart[product] -= 1
-            else:
-                cart[product] += 1
+        cart = CartService.for_request(request)
+        if request.POST.get('remove'):
+            cart.decrease(request.POST.get('product'))
         else:
-            cart[product] = 1
-
-        request.session['cart'] = cart
+            cart.add(request.POST.get('product'))
         return redirect('homepage')
 
     def get(self, request):
-        categories = Category.get_all_categories()
-        categoryID = request.GET.get('category')
-        products = Product.get_all_products_by_categoryid(categoryID) if categoryID else Product.get_all_products()
-        return render(request, 'index.html', {'products': products, 'categories': categories})
+        categories = catalog.get_categories()
+        categoryID = _positive_int(request.GET.get('category'))
+        after = _positive_int(request.GET.get('after'))
+        filters = facets.parse_filters(request.GET)
+        page_size = _page_size(request.GET.get('page_size'))
+        page = catalog.get_page(categoryID, after, page_size, filters)
+        return render(request, 'index.html', {
+            'products': page['products'],
+            'categories': categories,
+            'next_cursor': page['next_cursor'],
+            'is_first_page': after is None,
+            'facets': catalog.get_facets(categoryID, filters),
+            'listing_query': _listing_query(categoryID, filters, page_size),
+            'page_size': page_size,
+        })
+
+
+class AsyncIndex(View):
+    """Index for ASGI servers: the same page through the async cache, session and ORM APIs"""
+
+    async def post(self, request):
+        cart = await CartService.afor_request(request)
+        if request.POST.get('remove'):
+            cart.decrease(request.POST.get('product'))
+        else:
+            cart.add(request.POST.get('product'))
+        return redirect('homepage')
+
+    async def get(self, request):
+        # Load the session now; the template's login check would otherwise query it synchronously
+        await request.session.aget('customer')
+        categories = await catalog.aget_categories()
+        categoryID = _positive_int(request.GET.get('category'))
+        after = _positive_int(request.GET.get('after'))
+        filters = facets.parse_filters(request.GET)
+        page_size = _page_size(request.GET.get('page_size'))
+        page = await catalog.aget_page(categoryID, after, page_size, filters)
+        return render(request, 'index.html', {
+            'products': page['products'],
+            'categories': categories,
+            'next_cursor': page['next_cursor'],
+            'is_first_page': after is None,
+            'facets': await catalog.aget_facets(categoryID, filters),
+            'listing_query': _listing_query(categoryID, filters, page_size),
+            'page_size': page_size,
+        })
+
+
+def _positive_int(value):
+    """Parse a query-string id or cursor, ignoring anything malformed."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def _page_size(value):
+    """The page size the visitor asked for, clamped to the maximum, or None for the default."""
+    value = _positive_int(value)
+    return catalog.get_page_size(value) if value else None
+
+
+def _listing_query(category_id, filters, page_size=None):
+    """The category, filter and page size part of the listing URL, for pagination links."""
+    params = {'category': category_id, 'brand': filters['brand'], 'band': filters['band'],
+              'in_stock': 1 if filters['in_stock'] else None, 'page_size': page_size}
+    return urlencode({key: value for key, value in params.items() if value is not None})
@@ -1,6 +1,8 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.hashers import check_password
 from store.models.customer import Customer
+from store.services import throttle
+from store.services.cart import CartService
 from django.views import View
 
 class Login(View):
@@ -10,15 +12,28 @@ class Login(View):
     def post(self, request):
         email = request.POST.get('email')
         password = request.POST.get('password')
+        # Before the customer lookup and the deliberately slow password hash
+        wait = throttle.check(request, 'login', email)
+        if wait:
+            return throttled(request, 'login.html', wait)
         customer = Customer.objects.filter(email=email).first()
         error_message = 'Invalid email or password'
 
         if customer and check_password(password, customer.password):
+            # Merge while the request still resolves to the anonymous cart
+            CartService.for_request(request).merge_into(customer.id)
             request.session['customer'] = customer.id
             return redirect('index')  # Redirect to index.html after login
 
         return render(request, 'login.html', {'error': error_message})
 
+def throttled(request, template, wait):
+    response = render(request, template, {
+        'error': f"Too many attempts. Please try again in {wait} seconds."
+    }, status=429)
+    response['Retry-After'] = str(wait)
+    return response
+
 def logout(request):
     if 'customer' in request.session:
         del request.session['customer']  # Clear only customer ID, not entire session
@@ -0,0 +1,10 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from store.services import metrics as registry
+
+
+def metrics(request):
+    """Per-view request metrics of this process in the Prometheus text format"""
+    if not getattr(settings, 'METRICS_ENABLED', False):
+        raise Http404("Metrics are disabled")
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,7 +1,8 @@
 from django.shortcuts import render
 from django.views import View
-from store.models.order import Order
 from store.models.customer import Customer
+from store.services import orders as order_service
+from store.views.index import _positive_int
 
 class Profile(View): 
     def get(self, request):
@@ -9,10 +10,15 @@ class Profile(View):
         if not customer_id:
             return render(request, 'profile.html', {'orders': [], 'error': 'Please log in to view your orders.'})
 
-        try:
-            customer = Customer.objects.get(id=customer_id)
-        except Customer.DoesNotExist:
+        if not Customer.objects.filter(id=customer_id).exists():
             return render(request, 'profile.html', {'orders': [], 'error': 'Customer not found.'})
 
-        orders = Order.objects.filter(customer=customer).order_by('-date_ordered')
-        return render(request, 'profile.html', {'orders': orders})
\ No newline at end of file
+        before = _positive_int(request.GET.get('before'))
+        page = order_service.order_history(customer_id, before)
+        return render(request, 'profile.html', {
+            'orders': page['orders'],
+            'next_cursor': page['next_cursor'],
+            'is_first_page': before is None,
+            'status_counts': order_service.status_counts(customer_id),
+        })
+
@@ -0,0 +1,29 @@
+from django.http import FileResponse, Http404, JsonResponse
+from django.views import View
+from store.models.receipt import Receipt
+
+class ReceiptDownload(View):
+    """Serves a rendered receipt PDF, or its status while the worker renders it"""
+
+    def get(self, request, receipt_id):
+        customer_id = request.session.get('customer')
+        try:
+            receipt = Receipt.objects.get(id=receipt_id, customer_id=customer_id)
+        except Receipt.DoesNotExist:
+            raise Http404("Receipt not found")
+
+        if receipt.status == Receipt.READY:
+            return FileResponse(
+                receipt.file.open('rb'),
+                as_attachment=True,
+                filename='smart_computers_receipt.pdf',
+                content_type='application/pdf'
+            )
+
+        if receipt.status == Receipt.FAILED:
+            return JsonResponse({'status': 'failed', 'receipt': receipt.id}, status=500)
+
+        # Still queued or rendering; 202 tells clients to poll again
+        response = JsonResponse({'status': 'pending', 'receipt': receipt.id}, status=202)
+        response['Retry-After'] = '2'
+        return response
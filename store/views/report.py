@@ -1,149 +1,233 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
 from django.views import View
-from django.db.models import Sum, F, DecimalField
+from django.views.decorators.http import condition
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
-from store.models.report import ReportOrder, ReportProduct, OrderItem
-from django.http import HttpResponse
+from store.services import exports, sales
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
 from reportlab.platypus import Table, TableStyle
+import csv
+import hashlib
 import io
+import itertools
+import json
 import logging
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+def report_context(params):
+    """Build the report figures for the requested period; raises ValueError on bad input."""
+    start, end, group = sales.parse_period(params)
+    context = sales.summary(start, end, group)
+    context.update({
+        'start_date': start or 'All Time',
+        'end_date': end or timezone.now().date(),
+        'group': group,
+    })
+    return context
+
 class SalesReportView(View):
     def get(self, request):
-        # Fetch all completed orders
-        orders = ReportOrder.objects.filter(is_completed=True)
-        logger.info(f"Found {orders.count()} completed orders")
-
-        # Log customer associations
-        customer_orders = orders.values('customer__email').annotate(total=Sum('total'))
-        logger.info(f"Customer order breakdown: {list(customer_orders)}")
-
-        # Calculate metrics
-        total_revenue = orders.aggregate(total=Sum('total'))['total'] or 0
-        total_orders = orders.count()
-
-        # Top products by quantity sold
-        top_products = OrderItem.objects.filter(
-            order__is_completed=True,
-            product__isnull=False
-        ).values('product__name').annotate(
-            total_quantity=Sum('quantity'),
-            total_revenue=Sum(F('price') * F('quantity'), output_field=DecimalField())
-        ).order_by('-total_quantity')[:5]
-        logger.info(f"Top products: {list(top_products)}")
-
-        context = {
-            'total_revenue': total_revenue,
-            'total_orders': total_orders,
-            'top_products': top_products,
-            'start_date': 'All Time',
-            'end_date': timezone.now().date(),
-        }
+        try:
+            context = report_context(request.GET)
+        except ValueError as e:
+            context = report_context({})
+            context['error'] = str(e)
+        context['query'] = request.GET.urlencode()
+        logger.info(f"Found {context['total_orders']} completed orders")
         logger.debug(f"Context: {context}")
 
         return render(request, 'sales_report.html', context)
 
-class SalesReportPDFView(View):
-    def get(self, request):
-        # Fetch all completed orders
-        orders = ReportOrder.objects.filter(is_completed=True)
-        total_revenue = orders.aggregate(total=Sum('total'))['total'] or 0
-        total_orders = orders.count()
-        top_products = OrderItem.objects.filter(
-            order__is_completed=True,
-            product__isnull=False
-        ).values('product__name').annotate(
-            total_quantity=Sum('quantity'),
-            total_revenue=Sum(F('price') * F('quantity'), output_field=DecimalField())
-        ).order_by('-total_quantity')[:5]
-
-        # Create PDF
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-
-        # Header
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(50, height - 50, "Smart Computers")
-        p.setFont("Helvetica", 12)
-        p.drawString(50, height - 70, "Sales Report")
-        p.setFont("Helvetica", 10)
-        p.drawString(50, height - 90, f"Period: All Time to {timezone.now().date()}")
-        p.line(50, height - 100, width - 50, height - 100)
-
-        # Overview
-        y = height - 130
+def report_pdf_key(request):
+    """
+    Cache key for the report PDF: the period parameters plus the order watermark.
+
+    Returns None for malformed parameters. Without an end date the report runs
+    to today, so the date is part of the key. Memoised on the request, as both
+    condition() and the view need it.
+    """
+    if not hasattr(request, '_report_pdf_key'):
+        try:
+            start, end, group = sales.parse_period(request.GET)
+        except ValueError:
+            request._report_pdf_key = None
+        else:
+            parts = [start, end or timezone.localdate(), group, sales.watermark()]
+            request._report_pdf_key = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return request._report_pdf_key
+
+
+def render_report_pdf(context):
+    """Draw the sales report with ReportLab and return the PDF bytes."""
+    total_revenue = context['total_revenue']
+    total_orders = context['total_orders']
+    top_products = context['top_products']
+    series = context['series']
+
+    # Create PDF
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    # Header
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, height - 50, "Smart Computers")
+    p.setFont("Helvetica", 12)
+    p.drawString(50, height - 70, "Sales Report")
+    p.setFont("Helvetica", 10)
+    p.drawString(50, height - 90, f"Period: {context['start_date']} to {context['end_date']} (by {context['group']})")
+    p.line(50, height - 100, width - 50, height - 100)
+
+    # Overview
+    y = height - 130
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "Overview")
+    y -= 20
+    p.setFont("Helvetica", 11)
+    p.drawString(50, y, f"Total Revenue: KES {total_revenue:.2f}")
+    y -= 20
+    p.drawString(50, y, f"Total Orders: {total_orders}")
+    if total_orders == 0:
+        y -= 20
+        p.setFillColor(colors.red)
+        p.drawString(50, y, "No completed sales recorded.")
+        p.setFillColor(colors.black)
+    y -= 30
+
+    # Top Products Table
+    if top_products:
         p.setFont("Helvetica-Bold", 12)
-        p.drawString(50, y, "Overview")
+        p.drawString(50, y, "Top Products")
         y -= 20
+
+        # Table data
+        data = [["Product", "Quantity Sold", "Revenue (KES)"]]
+        for product in top_products:
+            data.append([
+                product['product__name'][:30],  # Truncate long names
+                str(product['total_quantity']),
+                f"{product['total_revenue']:.2f}"
+            ])
+
+        # Create table
+        table = Table(data)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+
+        # Draw table
+        table_width = width - 100
+        table.wrapOn(p, table_width, 400)
+        table.drawOn(p, 50, y - len(data) * 20)
+        y -= (len(data) * 20 + 20)
+    else:
         p.setFont("Helvetica", 11)
-        p.drawString(50, y, f"Total Revenue: KES {total_revenue:.2f}")
-        y -= 20
-        p.drawString(50, y, f"Total Orders: {total_orders}")
-        if total_orders == 0:
-            y -= 20
-            p.setFillColor(colors.red)
-            p.drawString(50, y, "No completed sales recorded.")
-            p.setFillColor(colors.black)
+        p.setFillColor(colors.red)
+        p.drawString(50, y, "No products sold.")
+        p.setFillColor(colors.black)
         y -= 30
 
-        # Top Products Table
-        if top_products:
-            p.setFont("Helvetica-Bold", 12)
-            p.drawString(50, y, "Top Products")
-            y -= 20
-
-            # Table data
-            data = [["Product", "Quantity Sold", "Revenue (KES)"]]
-            for product in top_products:
-                data.append([
-                    product['product__name'][:30],  # Truncate long names
-                    str(product['total_quantity']),
-                    f"{product['total_revenue']:.2f}"
-                ])
-
-            # Create table
-            table = Table(data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
-
-            # Draw table
-            table_width = width - 100
-            table.wrapOn(p, table_width, 400)
-            table.drawOn(p, 50, y - len(data) * 20)
-            y -= (len(data) * 20 + 20)
-        else:
-            p.setFont("Helvetica", 11)
-            p.setFillColor(colors.red)
-            p.drawString(50, y, "No products sold.")
-            p.setFillColor(colors.black)
-
-        # Footer
-        p.setFont("Helvetica", 9)
-        p.drawString(50, 30, "Smart Computers | support@smartcomputers.com | +254 797 469 560")
+    # Time Series Table (latest periods that fit on the page)
+    if series:
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(50, y, f"Sales by {context['group'].title()}")
+        y -= 20
 
-        # Finalize PDF
-        p.showPage()
-        p.save()
-        buffer.seek(0)
+        data = [["Period", "Orders", "Revenue (KES)"]]
+        for row in series[-12:]:
+            data.append([str(row['period']), str(row['orders']), f"{row['revenue']:.2f}"])
+
+        table = Table(data)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]))
+        table.wrapOn(p, width - 100, 400)
+        table.drawOn(p, 50, y - len(data) * 20)
+
+    # Footer
+    p.setFont("Helvetica", 9)
+    p.drawString(50, 30, "Smart Computers | support@smartcomputers.com | +254 797 469 560")
+
+    # Finalize PDF
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+@method_decorator(condition(etag_func=report_pdf_key), name='get')
+class SalesReportPDFView(View):
+    def get(self, request):
+        key = report_pdf_key(request)
+        if key is None:
+            try:
+                sales.parse_period(request.GET)
+            except ValueError as e:
+                return HttpResponseBadRequest(str(e))
+
+        # Until a new order completes, every download is the same document
+        pdf = cache.get(f"reports:pdf:{key}")
+        if pdf is None:
+            pdf = render_report_pdf(report_context(request.GET))
+            cache.set(f"reports:pdf:{key}", pdf, settings.REPORT_PDF_CACHE_TIMEOUT)
+            logger.info("Generated sales report PDF")
 
         # Return PDF response
-        response = HttpResponse(buffer, content_type='application/pdf')
+        response = HttpResponse(pdf, content_type='application/pdf')
         response['Content-Disposition'] = 'attachment; filename="smart_computers_sales_report.pdf"'
-        logger.info("Generated sales report PDF")
-        return response
\ No newline at end of file
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+class Echo:
+    """Pseudo-buffer that returns what csv.writer writes instead of storing it."""
+    def write(self, value):
+        return value
+
+@method_decorator(staff_member_required, name='dispatch')
+class SalesExportView(View):
+    """Streams order lines as CSV or NDJSON without building the file in memory; staff only, as rows carry customer details"""
+
+    def get(self, request, fmt):
+        dataset = request.GET.get('dataset', 'orders')
+        if dataset not in exports.DATASETS:
+            return HttpResponseBadRequest(f"Unknown dataset '{dataset}'")
+        try:
+            start, end, _ = sales.parse_period(request.GET)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+
+        columns, rows = exports.export_rows(dataset, start, end)
+        if fmt == 'csv':
+            writer = csv.writer(Echo())
+            content = itertools.chain([writer.writerow(columns)], (writer.writerow(row) for row in rows))
+            content_type = 'text/csv'
+        else:
+            content = (json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n' for row in rows)
+            content_type = 'application/x-ndjson'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="smart_computers_{dataset}.{fmt}"'
+        logger.info(f"Streaming {dataset} export as {fmt}")
+        return response
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.urls import reverse
+from django.views import View
+from store.services import catalog, search
+
+
+class Search(View):
+    """Ranked product search; ``?format=json`` returns compact rows for typeahead"""
+
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        maximum = getattr(settings, 'SEARCH_RESULTS', 20)
+        limit = catalog.get_page_size(request.GET.get('limit') or maximum)
+        products = search.search(query, min(limit, maximum))
+
+        if request.GET.get('format') == 'json':
+            return JsonResponse({
+                'query': query,
+                'results': [
+                    {
+                        'id': product.id,
+                        'name': product.name,
+                        'brand': product.brand,
+                        'price': product.price,
+                        'url': reverse('product_display', args=[product.id]),
+                    }
+                    for product in products
+                ],
+            })
+
+        return render(request, 'index.html', {
+            'products': products,
+            'categories': catalog.get_categories(),
+            'query': query,
+            'next_cursor': None,
+            'is_first_page': True,
+        })
@@ -1,6 +1,9 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
 from store.models.customer import Customer
+from store.services import throttle
+from store.views.login import throttled
 from django.views import View
 
 class Signup(View):
@@ -16,6 +19,10 @@ class Signup(View):
             postData.get('email'),
             postData.get('password')
         )
+        # Before the email check and the deliberately slow password hash
+        wait = throttle.check(request, 'signup', email)
+        if wait:
+            return throttled(request, 'signup.html', wait)
 
         error_message = None
         customer = Customer(
@@ -30,7 +37,13 @@ class Signup(View):
             error_message = 'Email Address Already Registered..'
 
         if not error_message:
-            customer.save()  # Save the new user
-            return redirect('login')  # Redirect to login after signup
+            try:
+                with transaction.atomic():
+                    customer.save()  # Save the new user
+            except IntegrityError:
+                # Another signup took the address between the check and the insert
+                error_message = 'Email Address Already Registered..'
+            else:
+                return redirect('login')  # Redirect to login after signup
 
         return render(request, 'signup.html', {'error': error_message})